@@ -5,23 +5,64 @@ CreateDay: 20250604
 Author: HongfengAi
 History:
 20250604    HongfengAi  第一版
+20261018    HongfengAi  新增批量翻译：多个元素打包成一个JSON数组请求，校验失败的元素再逐个翻译
+20261018    HongfengAi  竞赛关键词和批量翻译改为结构化输出（pydantic校验 + 失败时针对性修正）
+20261018    HongfengAi  LLM调用改走LLMClient，记录TTFT、耗时和token用量
+20261018    HongfengAi  关键词超过4个时截断而不是判为校验失败
 """
 import json
 import argparse
 from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel, Field, field_validator
 
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import OUTPUT_ROOT_PATH, COMP_EXPRESS_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import set_proxy, unset_proxy, init_llm, safe_title_func, format_json_block
+from utils import safe_title_func, estimate_tokens
+from llm_client import LLMClient
+from structured_output import invoke_structured, StructuredOutputError
+
+
+class CompKeywords(BaseModel):
+    """竞赛类型的技术关键词"""
+    keywords: List[str] = Field(description="关于该比赛类型的核心技术关键词，不超过4个", min_length=1)
+
+    @field_validator('keywords')
+    @classmethod
+    def truncate_keywords(cls, keywords: List[str]) -> List[str]:
+        # 关键词多于4个时截断，不判为校验失败
+        return keywords[:4]
+
+
+class TranslatedElement(BaseModel):
+    """批量翻译中的单个元素"""
+    id: int = Field(description="与输入一致的元素id")
+    type: str = Field(description="与输入一致的元素类型")
+    content: str = Field(description="中文翻译", min_length=1)
+
+
+class TranslationBatch(BaseModel):
+    """批量翻译结果"""
+    items: List[TranslatedElement]
 
 class OverviewSummarizer:
-    def __init__(self):
+    def __init__(self, batch_translate: bool = True, batch_token_budget: int = 2000, batch_max_items: int = 30):
+        """
+        Args:
+            batch_translate: 是否把多个待翻译元素打包成一个请求
+            batch_token_budget: 每个batch待翻译内容的token上限（输出的中文翻译也会占用相近的token）
+            batch_max_items: 每个batch最多包含的元素数
+        """
         # 初始化llm
-        self.llm = init_llm(temperature=0.15)
+        self.llm_client = LLMClient("overview_summarizer", temperature=0.15)
         self.data_root_path = OUTPUT_ROOT_PATH
         self.comp_express_root_path = COMP_EXPRESS_ROOT_PATH
+        self.batch_translate = batch_translate
+        self.batch_token_budget = batch_token_budget
+        self.batch_max_items = batch_max_items
 
     def convert_time_to_chinese(self, time_str: str) -> str:
         """
@@ -44,25 +85,17 @@ class OverviewSummarizer:
         except:
             return time_str
 
-    def translate_diff_type_elements(self, elements:list):
+    def build_element_prompt(self, item: dict):
         """
-        翻译不同类型的元素
+        构造单个元素的翻译prompt
+        Returns:
+            str or None: 不需要翻译的元素（表格、图片、代码、标题、行间公式）返回None
         """
-        # 由于description可能包含多种类型的元素，因此需要分别翻译
-        # 若遇到type为table，则直接输出table内容，不用翻译它
-        translate_elements = []
-        for item in elements:
-            if item.get("type") == "table":
-                translate_elements.append({"type": "table", "content": item.get("content", "")})
-            
-            elif item.get("type") == "image":
-                translate_elements.append({"type": "image", "content": item.get("content", "")})
-            
-            elif item.get("type") == "pre": # 代码
-                translate_elements.append({"type": "pre", "content": item.get("content", "")})
+        if item.get("type") in ("table", "image", "pre", "h1", "h2"):
+            return None
 
-            elif item.get("type") == "ul":
-                prompt = f"""
+        if item.get("type") == "ul":
+            prompt = f"""
                 请将专业地中文翻译出以下Kaggle比赛Overview中的有序列表，并输出：
 
                 {item.get("content", "")}
@@ -74,10 +107,10 @@ class OverviewSummarizer:
                 - 对于$$包括的数学latex公式，请原封不动保留其$数据公式$的样式，不需要翻译它且不要删除$符号。
                 - 翻译结果请保留输入的原始无序列表符号，即● 。
                 """
-                translate_elements.append({"type": "ul", "content": self.llm.invoke(prompt).content.strip()})   
+            return prompt
 
-            elif item.get("type") == "ol":
-                prompt = f"""
+        if item.get("type") == "ol":
+            prompt = f"""
                 请将专业地中文翻译出以下Kaggle比赛Overview中的无序列表，并输出：
 
                 {item.get("content", "")}
@@ -89,17 +122,13 @@ class OverviewSummarizer:
                 - 对于$$包括的数学latex公式，请原封不动保留其$数据公式$的样式，不需要翻译它且不要删除$符号。
                 - 翻译结果请保留输入的原始有序列表符号，如1. 2. 3. 等。
                 """
-                translate_elements.append({"type": "ol", "content": self.llm.invoke(prompt).content.strip()})  
+            return prompt
 
-            elif item.get("type") == "h2" or item.get("type") == "h1":
-                translate_elements.append({"type": item.get("type"), "content": item.get("content", "")})
-                
-            else:
-                # 若为行间公式，即整个item的content是一个$$包围的公式,然后中间没有$，则不需要翻译
-                if item.get("content", "").startswith("$") and item.get("content", "").endswith("$") and "$" not in item.get("content", "")[1:-1]:
-                    translate_elements.append({"type": item.get("type"), "content": item.get("content", "")})
-                else:
-                    prompt = f"""
+        # 若为行间公式，即整个item的content是一个$$包围的公式,然后中间没有$，则不需要翻译
+        if item.get("content", "").startswith("$") and item.get("content", "").endswith("$") and "$" not in item.get("content", "")[1:-1]:
+            return None
+
+        prompt = f"""
                     请将专业地中文翻译出以下Kaggle比赛Overview中的段落，并输出：
 
                     {item.get("content", "")}
@@ -110,7 +139,127 @@ class OverviewSummarizer:
                     - 若存在专业英文术语，请保留该英文术语，可以不用将该英文术语翻译成中文。
                     - 对于$$包围的数学latex公式，请原封不动保留其$数据公式$的样式内容，不需要翻译它且不要删除$符号。
                     """
-                    translate_elements.append({"type": item.get("type"), "content": self.llm.invoke(prompt).content.strip()})   
+        return prompt
+
+    def translate_element(self, item: dict) -> dict:
+        """逐个元素翻译（批量翻译校验失败时的兜底）"""
+        prompt = self.build_element_prompt(item)
+        if prompt is None:
+            return {"type": item.get("type"), "content": item.get("content", "")}
+        return {"type": item.get("type"), "content": self.llm_client.invoke(prompt, call_site="translate_element").content.strip()}
+
+    def pack_translate_batches(self, indexed_items: list) -> list:
+        """
+        按token预算把待翻译元素打包成多个batch
+        Args:
+            indexed_items: [(元素下标, 元素), ...]
+        Returns:
+            list: [[(元素下标, 元素), ...], ...]
+        """
+        batches, batch, batch_tokens = [], [], 0
+        for index, item in indexed_items:
+            item_tokens = estimate_tokens(item.get("content", ""))
+            if batch and (batch_tokens + item_tokens > self.batch_token_budget or len(batch) >= self.batch_max_items):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append((index, item))
+            batch_tokens += item_tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def translate_batch(self, batch: list) -> dict:
+        """
+        一次请求翻译一个batch，校验返回的元素数量、id和type
+        Args:
+            batch: [(元素下标, 元素), ...]
+        Returns:
+            dict: 元素下标 -> 翻译后的元素，只包含校验通过的元素
+        """
+        payload = [{"id": i, "type": item.get("type"), "content": item.get("content", "")}
+                   for i, (_, item) in enumerate(batch)]
+        prompt = f"""
+        请将专业地中文翻译出以下Kaggle比赛Overview中的各个元素。输入为JSON数组，每个元素包含id、type和content：
+        - type为p：段落
+        - type为ul：无序列表，翻译结果请保留原始无序列表符号，即● 
+        - type为ol：有序列表，翻译结果请保留原始有序列表符号，如1. 2. 3. 等
+
+        {json.dumps(payload, ensure_ascii=False, indent=2)}
+
+        注意：
+        - 只翻译content，id和type原样保留，输出元素数量和顺序必须与输入一致，不要合并或拆分元素。
+        - 禁止编造内容。
+        - 若存在专业英文术语，请保留该英文术语，可以不用将该英文术语翻译成中文。
+        - 对于$$包围的数学latex公式，请原封不动保留其$数据公式$的样式内容，不需要翻译它且不要删除$符号。
+        - 输出格式：{{"items": [{{"id": 0, "type": "p", "content": "中文翻译"}}, ...]}}
+        """
+        def validate_batch(result: TranslationBatch):
+            """校验元素数量、id和type与输入一致，返回针对性的错误描述"""
+            errors = []
+            out_ids = [out.id for out in result.items]
+            missing = [i for i in range(len(batch)) if i not in out_ids]
+            if missing:
+                errors.append(f"缺少id为{missing}的元素")
+            extra = [i for i in out_ids if not 0 <= i < len(batch)]
+            if extra:
+                errors.append(f"不存在id为{extra}的输入元素")
+            for out in result.items:
+                if 0 <= out.id < len(batch) and out.type != batch[out.id][1].get("type"):
+                    errors.append(f"id为{out.id}的元素type应为{batch[out.id][1].get('type')}")
+            return "；".join(errors) or None
+
+        try:
+            result = invoke_structured(self.llm_client.for_site("translate_batch"), prompt, TranslationBatch, validator=validate_batch)
+        except StructuredOutputError as e:
+            # 修正后仍未完全通过校验，只采用其中合法的元素，其余逐个翻译
+            print(f"批量翻译校验失败: {e}")
+            result = e.parsed
+            if result is None:
+                return {}
+
+        translated = {}
+        for out in result.items:
+            if not 0 <= out.id < len(batch):
+                continue
+            index, item = batch[out.id]
+            if out.type != item.get("type") or not out.content.strip():
+                continue
+            translated[index] = {"type": item.get("type"), "content": out.content.strip()}
+        return translated
+
+    def translate_diff_type_elements(self, elements:list, batch: bool = None):
+        """
+        翻译不同类型的元素
+        Args:
+            elements: 元素列表
+            batch: 是否批量翻译（多个元素打包成一个请求），None表示使用self.batch_translate
+        """
+        # 由于description可能包含多种类型的元素，因此需要分别翻译
+        # 若遇到type为table/image/pre/标题/行间公式，则直接输出原内容，不用翻译它
+        if batch is None:
+            batch = self.batch_translate
+
+        translate_elements = [None] * len(elements)
+        pending = []
+        for index, item in enumerate(elements):
+            if self.build_element_prompt(item) is None:
+                translate_elements[index] = {"type": item.get("type"), "content": item.get("content", "")}
+            else:
+                pending.append((index, item))
+
+        if batch and pending:
+            batches = self.pack_translate_batches(pending)
+            print(f"批量翻译: {len(pending)}个元素打包为{len(batches)}个请求")
+            for translate_batch in batches:
+                for index, translated in self.translate_batch(translate_batch).items():
+                    translate_elements[index] = translated
+            pending = [(index, item) for index, item in pending if translate_elements[index] is None]
+            if pending:
+                print(f"{len(pending)}个元素批量翻译校验失败，逐个翻译")
+
+        # 逐个翻译（非批量模式，或批量翻译校验失败的元素）
+        for index, item in pending:
+            translate_elements[index] = self.translate_element(item)
 
         return translate_elements
     
@@ -120,8 +269,6 @@ class OverviewSummarizer:
         Args:
             comp_name: 比赛名称（完整）
         """
-        # 设置代理
-        set_proxy()
 
         print(f"正在处理比赛: {comp_name}")
         print(f"数据根目录: {self.data_root_path}")
@@ -165,14 +312,18 @@ class OverviewSummarizer:
         {comp_details.get("evaluation", "暂无评估指标")}
 
         注意：
-        1. 输出格式为列表，列表中每个元素为技术关键词，不要用"机器学习"、"深度学习"等通用且过于泛化的词汇；
+        1. 输出格式为JSON对象，keywords字段为技术关键词列表，不要用"机器学习"、"深度学习"等通用且过于泛化的词汇；
         2. 关于该比赛类型的技术关键词数量不能超过4个;
         3. 用中文输出。
 
-        输出示例：['图像识别', '目标检测']
+        输出示例：{{"keywords": ["图像识别", "目标检测"]}}
         """
-        comp_type_keywords = self.llm.invoke(prompt).content.strip()
-        comp_type_keywords = format_json_block(comp_type_keywords)
+        try:
+            keywords = invoke_structured(self.llm_client.for_site("comp_keywords"), prompt, CompKeywords).keywords
+        except StructuredOutputError as e:
+            keywords = e.parsed.keywords[:4] if e.parsed else []
+        # 保持历史数据格式，如 "['图像识别', '目标检测']"（下游按字符串截取）
+        comp_type_keywords = str(keywords)
         print("comp_type_keywords:", comp_type_keywords)
 
         
@@ -207,7 +358,7 @@ class OverviewSummarizer:
             - 不要编造内容，只基于给定信息进行总结
             - 保留专业术语的英文原文
             """
-            overview_summary = self.llm.invoke(summary_prompt).content.strip()
+            overview_summary = self.llm_client.invoke(summary_prompt, call_site="summarize_overview").content.strip()
             comp_details["overview"] = [{"type": "p", "content": overview_summary}]
             
         elif len(original_overview) > 1:
@@ -229,7 +380,7 @@ class OverviewSummarizer:
             - 不要编造内容，只基于给定信息进行总结
             - 保留专业术语的英文原文
             """
-            overview_summary = self.llm.invoke(summary_prompt).content.strip()
+            overview_summary = self.llm_client.invoke(summary_prompt, call_site="summarize_overview").content.strip()
             comp_details["overview"] = [{"type": "p", "content": overview_summary}]
             
         elif len(original_overview) == 0 and len(original_description) > 0:
@@ -251,7 +402,7 @@ class OverviewSummarizer:
             - 不要编造内容，只基于给定信息进行总结
             - 保留专业术语的英文原文
             """
-            overview_summary = self.llm.invoke(summary_prompt).content.strip()
+            overview_summary = self.llm_client.invoke(summary_prompt, call_site="summarize_overview").content.strip()
             comp_details["overview"] = [{"type": "p", "content": overview_summary}]
         
         # 生成竞赛目标 (overview) - 翻译处理后的overview
@@ -318,8 +469,6 @@ class OverviewSummarizer:
 
         print(f"\n概览信息已保存到: {output_path}")
 
-        # 取消代理
-        unset_proxy()
 
 
 if __name__ == "__main__":
@@ -331,7 +480,8 @@ if __name__ == "__main__":
         default="DRW - Crypto Market Prediction",
         help="比赛名称 (完整名称)"
     )
+    parser.add_argument("--no_batch", action="store_true", help="逐个元素翻译，不打包成批量请求")
     args = parser.parse_args()
 
-    overview_summarizer = OverviewSummarizer()
+    overview_summarizer = OverviewSummarizer(batch_translate=not args.no_batch)
     overview_summarizer.overview_summarizer(args.comp_name)  
\ No newline at end of file
@@ -7,68 +7,101 @@ Author: HongfengAi
 History:
 20250610    HongfengAi  第一版
 20250617    HongfengAi  第二版 支持自动化制作封面图和上传草稿至公众号平台
+20261018    HongfengAi  改为声明式阶段图，按内容哈希跳过未变化的阶段；比赛通过--comp_name指定，无需人工交互
+20261018    HongfengAi  --comp_name支持多个比赛批量处理，共享浏览器池和LLM客户端
+20261018    HongfengAi  各阶段依赖的模块改为阶段执行时才导入，缩短启动时间
 """
 
 import sys, os
 import re
 import json
 import time
+import argparse
 # 添加项目根目录到系统路径
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from crawler import (
-    CompListCrawler,
-    CompOverviewCrawler,        
-)
-from comp_express.overview_summarizer import OverviewSummarizer
-from comp_express.overview_template_fill import OverviewTemplateFiller
-from wechat_utils.ppt_to_image import PPTToImage
-from wechat_utils.upload_material import WeChatPermanentMaterialUploader
-from wechat_utils.create_draft import WeChatDraftCreator
-
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import OUTPUT_ROOT_PATH, COMP_EXPRESS_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import safe_title_func
-
-
-if __name__ == '__main__':
-    ############################
-    # 1、爬取比赛列表 并 过滤
-    ############################
-    print("="*60)
-    print("比赛列表爬取")
-    print("="*60)
-    user_input = input("是否需要重新爬取比赛列表: (y/N): ").strip().lower()
-    if user_input not in ['y', 'yes']:
-        with open(f'{OUTPUT_ROOT_PATH}/kaggle_competitions_list.json', 'r', encoding='utf-8') as f:
-            all_comp_list = json.load(f)
-    else:
-        page_limit = input("请输入要爬取的页数: ")
-        stime = time.time()
-        cl_crawler = CompListCrawler()
-        all_comp_list = cl_crawler.parse_page(page_limit=page_limit)
-        etime = time.time()
-        print(f'爬取完成，共获取 {len(all_comp_list)} 个比赛信息，耗时 {etime-stime} 秒')
-
-    # 筛选出leave_time包含"to go"且comp_reward包含"$"的比赛
-    filtered_comp_list = []
-    for comp in all_comp_list:
-        # 检查筛选条件
-        if 'to go' in comp['leave_time'] and '$' in comp['comp_reward']:
-            filtered_comp_list.append(comp)
-    print(f'筛选条件：leave_time包含"to go"且comp_reward包含"$"')
+# 爬虫（selenium）、LLM（langchain）和封面（pptx/win32com）相关模块都较重，
+# 在各阶段函数内按需导入：阶段全部命中时不会加载这些库
+from utils import safe_title_func, report_llm_stats
+from pipeline_runner import Stage, PipelineRunner, SharedRuntime, run_batch, STATUS_FAILED
+
+
+COMP_LIST_FILE = f'{OUTPUT_ROOT_PATH}/kaggle_competitions_list.json'
+
+
+def add_runner_args(parser: argparse.ArgumentParser):
+    """竞赛速递和竞赛复盘共用的命令行参数"""
+    parser.add_argument('--comp_name', type=str, nargs='*', default=[], help='要处理的比赛名称或链接中的slug，可指定多个批量处理；不指定时只列出候选比赛')
+    parser.add_argument('--list_pages', type=int, default=10, help='爬取比赛列表的页数')
+    parser.add_argument('--refresh_llm_cache', action='store_true', help='不读取LLM响应缓存，强制重新请求')
+    parser.add_argument('--max_parallel', type=int, default=2, help='同时执行的阶段数上限')
+    parser.add_argument('--force', nargs='*', default=[], help='强制重新执行的阶段，如 list translate，all表示全部')
+    parser.add_argument('--dry_run', action='store_true', help='只打印各阶段是否需要执行，不实际执行')
+    parser.add_argument('--max_items', type=int, default=2, help='批量模式同时处理的比赛数')
+    parser.add_argument('--max_stages', type=int, default=None, help='批量模式所有比赛合计同时执行的阶段数上限')
+
+
+def load_comp_list(args) -> list:
+    """比赛列表也作为一个阶段：页数或爬虫代码变化时才重新爬取，--force list 可强制刷新"""
+    def crawl_list():
+        from crawler.comp_list_crawler import CompListCrawler
+        all_comp_list = CompListCrawler().parse_page(page_limit=args.list_pages)
+        print(f'[比赛列表] ✓ 爬取完成，共获取 {len(all_comp_list)} 个比赛信息')
+
+    runner = PipelineRunner(name="比赛列表",
+                            state_path=f'{OUTPUT_ROOT_PATH}/.pipeline_state.json',
+                            force=args.force,
+                            dry_run=args.dry_run)
+    runner.add(Stage('list', crawl_list,
+                     outputs=[COMP_LIST_FILE],
+                     code=['crawler.comp_list_crawler'],
+                     config={'list_pages': args.list_pages}))
+    results = runner.run()
+    if results['list'] == STATUS_FAILED or not os.path.exists(COMP_LIST_FILE):
+        return []
+    with open(COMP_LIST_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def match_competition(comp: dict, key: str) -> bool:
+    """按比赛名称（大小写不敏感）、安全标题或链接中的slug匹配比赛"""
+    key = key.strip().lower()
+    slug = comp['link'].rstrip('/').split('/')[-1].lower()
+    return key in (comp['name'].lower(), safe_title_func(comp['name']), slug)
+
+
+def select_competitions(all_comp_list: list, comp_names: list, leave_time_keyword: str) -> list:
+    """
+    按leave_time关键词和奖金筛选比赛，再按名称或slug选中比赛
+
+    Args:
+        all_comp_list: 比赛列表
+        comp_names: 比赛名称或slug列表，为空时只打印候选比赛
+        leave_time_keyword: 进行中的比赛用"to go"，已结束的比赛用"ago"
+    Returns:
+        list: 选中的比赛，顺序与comp_names一致
+    """
+    filtered_comp_list = [comp for comp in all_comp_list
+                          if leave_time_keyword in comp['leave_time'] and '$' in comp['comp_reward']]
+    print(f'筛选条件：leave_time包含"{leave_time_keyword}"且comp_reward包含"$"')
     print(f'[比赛列表] 原始比赛数量: {len(all_comp_list)}')
     print(f'[比赛列表] 筛选后比赛数量: {len(filtered_comp_list)}')
 
-    # 用户输入选择哪些游戏
-    if not filtered_comp_list:
-        print("[比赛列表] 没有找到符合条件的比赛，程序结束。")
-        exit()
-    
+    selected_comps = []
+    for comp_name in comp_names:
+        comp = next((comp for comp in filtered_comp_list if match_competition(comp, comp_name)), None)
+        if comp is None:
+            print(f"[比赛列表] ❌ 没有找到比赛: {comp_name}")
+        elif comp not in selected_comps:
+            print(f"选中比赛：{comp['name']}")
+            selected_comps.append(comp)
+    if selected_comps:
+        return selected_comps
+
     print("\n" + "="*60)
-    print("[比赛列表] 筛选后的比赛列表：")
+    print("[比赛列表] 候选比赛（通过 --comp_name 指定）：")
     print("="*60)
-    
     for i, comp in enumerate(filtered_comp_list, 1):
         print(f"{i}. {comp['name']}")
         print(f"   奖金: {comp['comp_reward']}")
@@ -77,197 +110,140 @@ if __name__ == '__main__':
         print(f"   参与队伍: {comp['team_number']}")
         print(f"   链接: {comp['link']}")
         print("-" * 50)
-    
-    print(f"\n请选择要进一步处理的比赛：")
-    print(f"输入格式：")
-    print(f"  - 单个选择：输入数字 (如: 1)")
-    print(f"  - 退出程序：输入 'exit' 或 'q'")
-    
-    while True:
-        try:
-            user_input = input(f"\n请输入您的选择 (1-{len(filtered_comp_list)}): ").strip()
-            
-            if user_input.lower() in ['exit', 'q']:
-                print("程序已退出。")
-                exit()
-            
-            # 解析用户输入的数字
-            indices = []
-            for item in user_input.split(','):
-                index = int(item.strip())
-                if 1 <= index <= len(filtered_comp_list):
-                    indices.append(index)
-                else:
-                    print(f"错误：索引 {index} 超出范围 (1-{len(filtered_comp_list)})")
-                    raise ValueError()
-            
-            if not indices:
-                print("请至少选择一个比赛。")
-                continue
-            
-            # 获取选中的比赛
-            selected_indice = indices[0]
-            selected_comp = filtered_comp_list[selected_indice-1]
-            break
-            
-        except ValueError:
-            print("输入格式错误，请重新输入。")
-            continue
-        except KeyboardInterrupt:
-            print("\n程序已被中断。")
-            exit()
-    
-    print(f"\n您选择了比赛：[{selected_indice}] {selected_comp['name']}")
+    return []
+
+
+def add_overview_stages(runner: PipelineRunner, comp: dict, runtime: SharedRuntime) -> str:
+    """
+    添加 overview -> translate 两个阶段，竞赛复盘也复用
+
+    Returns:
+        str: 中文比赛速览文件路径
+    """
+    safe_title = safe_title_func(comp['name'])
+    overview_file = f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/comp_overview.json'
+    zh_comp_overview_file = f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/zh_comp_overview.json'
+
+    def crawl_overview():
+        from crawler.comp_overview_crawler import CompOverviewCrawler
+        CompOverviewCrawler().parse_page(comp['link'])
+
+    def translate():
+        from comp_express.overview_summarizer import OverviewSummarizer
+        runtime.get('overview_summarizer', OverviewSummarizer).overview_summarizer(comp['name'])
+
+    runner.add(Stage('overview', crawl_overview,
+                     outputs=[overview_file],
+                     code=['crawler.comp_overview_crawler'],
+                     config={'link': comp['link']}))
+    runner.add(Stage('translate', translate,
+                     inputs=[overview_file],
+                     outputs=[zh_comp_overview_file],
+                     code=['comp_express.overview_summarizer'],
+                     config={'comp': comp}))
+    return zh_comp_overview_file
+
+
+def make_cover(comp_type: str, zh_comp_overview_file: str):
+    """根据中文比赛速览中的名称、组织者和关键词制作封面图"""
+    from wechat_utils.ppt_to_image import PPTToImage
+    with open(zh_comp_overview_file, 'r', encoding='utf-8') as f:
+        zh_comp_overview = json.load(f)
+
+    keywords = zh_comp_overview['竞赛关键词'][1:-1].replace("'", "").replace(", ", "、").replace(" ", "")
+    PPTToImage().main(comp_type=comp_type,
+                      title=zh_comp_overview['竞赛名称'],
+                      host=zh_comp_overview['组织者'],
+                      keywords=keywords)
+
+
+def upload_cover(cover_image_file: str):
+    from wechat_utils.upload_material import WeChatPermanentMaterialUploader
+    upload_result = WeChatPermanentMaterialUploader().upload_specific_file(cover_image_file)
+    if not upload_result.get('success'):
+        raise RuntimeError(f"封面图上传失败: {upload_result.get('error', '未知错误')}")
+
+
+def create_draft(comp_type: str, title: str):
+    from wechat_utils.create_draft import WeChatDraftCreator
+    result = WeChatDraftCreator().create_draft(comp_type=comp_type, title=title)
+    if 'errcode' in result:
+        raise RuntimeError(f"草稿创建失败: {result.get('errcode')}: {result.get('errmsg')}")
+
+
+def build_pipeline(comp: dict, args, runtime: SharedRuntime) -> PipelineRunner:
+    """
+    构建某个比赛竞赛速递的阶段图
+    overview -> translate -> template -> draft，translate -> cover -> upload -> draft
+    """
+    safe_title = safe_title_func(comp['name'])
+    data_dir = f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}'
+    html_file = f'{data_dir}/zh_comp_overview.html'
+    cover_image_file = f'{data_dir}/cover/cover.png'
+    cover_result_file = f'{data_dir}/cover/cover.json'
+
+    runner = PipelineRunner(name=f"竞赛速递 {safe_title}",
+                            state_path=f'{data_dir}/.pipeline_state.json',
+                            max_workers=args.max_parallel,
+                            force=args.force,
+                            dry_run=args.dry_run)
+    def fill_template():
+        from comp_express.overview_template_fill import OverviewTemplateFiller
+        OverviewTemplateFiller().overview_template_fill(comp['name'])
+
+    zh_comp_overview_file = add_overview_stages(runner, comp, runtime)
+    runner.add(Stage('template', fill_template,
+                     inputs=[zh_comp_overview_file],
+                     outputs=[html_file],
+                     code=['comp_express.overview_template_fill']))
+    runner.add(Stage('cover', lambda: make_cover("comp_express", zh_comp_overview_file),
+                     inputs=[zh_comp_overview_file],
+                     outputs=[cover_image_file],
+                     code=['wechat_utils.ppt_to_image'],
+                     resource='wps'))
+    runner.add(Stage('upload', lambda: upload_cover(cover_image_file),
+                     inputs=[cover_image_file],
+                     outputs=[cover_result_file]))
+    runner.add(Stage('draft', lambda: create_draft("comp_express", comp['name']),
+                     inputs=[html_file, cover_result_file],
+                     config={'title': comp['name']}))
+    return runner
 
 
-    ############################
-    # 2、爬取选中比赛的Overview信息
-    ############################
-    print("\n" + "="*60)
-    print("比赛Overview爬取")
-    print("="*60)
-
-    # 检查是否已存在概览数据文件
-    safe_title = safe_title_func(selected_comp['name'])
-    overview_file_path = f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/comp_overview.json'
-    if os.path.exists(overview_file_path):
-        print(f"发现已存在的概览数据: {overview_file_path}")
-        user_input = input(f"是否需要重新爬取 '{selected_comp['name']}' 的概览信息？(y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[比赛概览] ✓ 跳过: {selected_comp['name']} (使用现有数据)")
-        else:
-            # 爬取比赛概览信息
-            stime = time.time()
-            overview_crawler = CompOverviewCrawler()
-            comp_overview = overview_crawler.parse_page(selected_comp['link'])
-            etime = time.time()
-            print(f"[比赛概览] ✓ 完成: {selected_comp['name']}，耗时 {etime-stime} 秒")
-    else:
-        # 爬取比赛概览信息
-        stime = time.time()
-        overview_crawler = CompOverviewCrawler()
-        comp_overview = overview_crawler.parse_page(selected_comp['link'])
-        etime = time.time()
-        print(f"[比赛概览] ✓ 完成: {selected_comp['name']}，耗时 {etime-stime} 秒")
-
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='竞赛速递Pipeline')
+    add_runner_args(parser)
+    args = parser.parse_args()
+    if args.refresh_llm_cache:
+        from llm_cache import get_llm_cache_store
+        get_llm_cache_store().bypass = True
 
     ############################
-    # 3、用中文翻译比赛速览
+    # 1、爬取比赛列表 并 选择比赛
     ############################
-    print("\n" + "="*60)
-    print("比赛Overview翻译")
     print("="*60)
-
-    # 检查是否已存在翻译数据文件
-    zh_comp_overview_file_path = f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/zh_comp_overview.json'
-    if os.path.exists(zh_comp_overview_file_path):
-        print(f"发现已存在的翻译数据: {zh_comp_overview_file_path}")
-        user_input = input(f"是否需要重新翻译 '{selected_comp['name']}' 的概览信息？(y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[比赛速览] ✓ 跳过: {selected_comp['name']} (使用现有数据)")
-        else:
-            stime = time.time()
-            overview_summarizer = OverviewSummarizer()
-            overview_summarizer.overview_summarizer(selected_comp['name'])
-            etime = time.time()
-            print(f"[比赛速览] ✓ 翻译完成: {selected_comp['name']}，耗时 {etime-stime} 秒")
-    else:
-        stime = time.time()
-        overview_summarizer = OverviewSummarizer()
-        overview_summarizer.overview_summarizer(selected_comp['name'])
-        etime = time.time()
-        print(f"[比赛速览] ✓ 翻译完成: {selected_comp['name']}，耗时 {etime-stime} 秒")
-        
-        
-    ############################
-    # 4、填充竞赛速览HTML模版
-    ############################        
-    print("\n" + "="*60)
-    print("填充竞赛速递的HTML模板")
+    print("比赛列表爬取")
     print("="*60)
-
-    # 检查是否已存在填充数据文件
-    zh_comp_overview_html_file_path = f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/zh_comp_overview.html'
-    if os.path.exists(zh_comp_overview_html_file_path):
-        print(f"发现已存在的填充数据: {zh_comp_overview_html_file_path}")
-        user_input = input(f"是否需要重新填充 '{selected_comp['name']}' 的竞赛速览HTML模板？(y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[比赛速览] ✓ 跳过: {selected_comp['name']} (使用现有数据)")
-        else:
-            overview_template_filler = OverviewTemplateFiller()
-            overview_template_filler.overview_template_fill(selected_comp['name'])
-            print(f"[比赛速览] ✓ 填充完成: {selected_comp['name']}")
-    else:
-        overview_template_filler = OverviewTemplateFiller()
-        overview_template_filler.overview_template_fill(selected_comp['name'])
-        print(f"[比赛速览] ✓ 填充完成: {selected_comp['name']}")
-
+    all_comp_list = load_comp_list(args)
+    selected_comps = select_competitions(all_comp_list, args.comp_name, leave_time_keyword='to go')
+    if not selected_comps:
+        print("[比赛列表] 未选中比赛，程序结束。")
+        sys.exit(1 if args.comp_name else 0)
 
     ############################
-    # 5、制作封面图
+    # 2、执行竞赛速递的阶段图（多个比赛共享一个运行时）
     ############################
-    print("\n" + "="*60)
-    print("制作封面图")
-    print("="*60)
-
-    # 检查是否已存在封面图文件
-    cover_image_file_path = f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/cover/cover.png'
-    if os.path.exists(cover_image_file_path):
-        print(f"发现已存在的封面图: {cover_image_file_path}")
-        user_input = input(f"是否需要重新制作封面图？(y/N): ").strip().lower()
-
-        if user_input not in ['y', 'yes']:
-            print(f"[封面图] ✓ 跳过: {selected_comp['name']} (使用现有数据)")
+    runtime = SharedRuntime(keep_warm=len(selected_comps) > 1)
+    try:
+        runners = [build_pipeline(comp, args, runtime) for comp in selected_comps]
+        if len(runners) == 1:
+            all_results = [runners[0].run()]
         else:
+            all_results = list(run_batch(runners, max_items=args.max_items, max_stages=args.max_stages).values())
+    finally:
+        runtime.close()
 
-            with open(f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/zh_comp_overview.json', 'r', encoding='utf-8') as f:
-                zh_comp_overview = json.load(f)
-
-            keywords = zh_comp_overview['竞赛关键词'][1:-1].replace("'", "").replace(", ", "、").replace(" ", "")
-            ppt_to_image = PPTToImage()
-            ppt_to_image.main(comp_type="comp_express",
-                              title=zh_comp_overview['竞赛名称'],
-                              host=zh_comp_overview['组织者'],
-                              keywords=keywords)
-            print(f"[封面图] ✓ 制作完成: {selected_comp['name']}")
-    else:
-        with open(f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/zh_comp_overview.json', 'r', encoding='utf-8') as f:
-            zh_comp_overview = json.load(f)
-
-        keywords = zh_comp_overview['竞赛关键词'][1:-1].replace("'", "").replace(", ", "、").replace(" ", "")
-        ppt_to_image = PPTToImage()
-        ppt_to_image.main(comp_type="comp_express",
-                          title=zh_comp_overview['竞赛名称'],
-                          host=zh_comp_overview['组织者'],
-                          keywords=keywords)
-        print(f"[封面图] ✓ 制作完成: {selected_comp['name']}")
-
-
-    ############################
-    # 6、上传封面图至公众号平台
-    ############################
-    print("\n" + "="*60)
-    print("上传封面图至公众号平台")
-    print("="*60)
-
-    # 检查是否已存在封面图文件
-    cover_image_file_path = f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/cover/cover.png'
-    wechat_uploader = WeChatPermanentMaterialUploader()
-    upload_result= wechat_uploader.upload_specific_file(cover_image_file_path)
-    print(f"[封面图] ✓ 上传完成: {selected_comp['name']}")
-
-
-    ############################
-    # 7、创建草稿至公众号平台
-    ############################
-    print("\n" + "="*60)
-    print("创建草稿至公众号平台")
-    print("="*60)
+    report_llm_stats()
 
-    wechat_draft_creator = WeChatDraftCreator()
-    wechat_draft_creator.create_draft(comp_type="comp_express",
-                                      title=selected_comp['name'])
-    print(f"[草稿] ✓ 创建完成: {selected_comp['name']}")
+    if any(STATUS_FAILED in results.values() for results in all_results):
+        sys.exit(1)
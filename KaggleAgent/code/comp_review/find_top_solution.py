@@ -5,6 +5,7 @@ CreateDay: 20250611
 Author: HongfengAi
 History:
 20250611    HongfengAi  第一版
+20261018    HongfengAi  改为从产物库按排名查询，不再遍历目录逐个解析markdown
 """
 import re
 import json
@@ -13,59 +14,66 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 from configs import COMP_REVIEW_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import safe_title_func
+from artifact_store import get_artifact_store
 
 class FindTopSolution():
     def __init__(self):
-        pass
+        self.store = get_artifact_store()
 
-    def find_top_solution(self, comp_name:str, top_k:int=50):
-        """找到高分方案"""
-        # 读取给定comp_name下discussion_detail下的帖子名称和md文件
-        safe_comp_name = safe_title_func(comp_name)
+    def index_legacy_discussions(self, safe_comp_name:str) -> int:
+        """
+        将产物库启用前爬取的讨论帖（只有markdown文件）解析后登记到产物库，已登记的不再解析
+
+        Returns:
+            int: 登记的讨论帖数
+        """
         discussion_detail_dir = f'{COMP_REVIEW_ROOT_PATH}/{safe_comp_name}/discussion_details/'
-        discussion_detail_files = os.listdir(discussion_detail_dir)
+        if not os.path.isdir(discussion_detail_dir):
+            return 0
 
-        disussion_name2rank = {}
-        disussion_name2url = {}
-        for file in discussion_detail_files:
-            with open(os.path.join(discussion_detail_dir, f"{file}/discussion_content.md"), 'r', encoding='utf-8') as f:
+        indexed = 0
+        registered = self.store.discussion_names(safe_comp_name)
+        for discussion_name in os.listdir(discussion_detail_dir):
+            if discussion_name in registered:
+                continue
+            content_path = os.path.join(discussion_detail_dir, f"{discussion_name}/discussion_content.md")
+            if not os.path.exists(content_path):
+                continue
+            with open(content_path, 'r', encoding='utf-8') as f:
                 discussion_detail = f.read()
-                # 获取帖子名称
-                discussion_name = file
-
-                # 获取帖子排名，用正则匹配的方式获取，**作者比赛排名**: 8TH，提取出8
-                discussion_rank = re.search(r'\*\*Author Rank\*\*: (\d+)(?:TH|RD|ST|ND)', discussion_detail)
-                if discussion_rank:
-                    discussion_rank = discussion_rank.group(1)
-                    disussion_name2rank[discussion_name] = int(discussion_rank)
-
-                # 获取帖子链接
-                discussion_url = re.search(r'\*\*Link\*\*: (https://www\.kaggle\.com/competitions/[\w-]+/discussion/\d+)', discussion_detail)
-                if discussion_url:
-                    discussion_url = discussion_url.group(1)
-                    disussion_name2url[discussion_name] = discussion_url
-
-        # 对disussion_name2rank进行排序，按照排名升序
-        disussion_name2rank = sorted(disussion_name2rank.items(), key=lambda x: int(x[1]))
 
-        print(f"==========disussion_name2rank==========")
-        for name, rank in disussion_name2rank:
-            print(f"{name}: {rank}")
-        print("\n\n")
+            # 获取帖子排名和链接，如 **Author Rank**: 8TH，提取出8
+            discussion_rank = re.search(r'\*\*Author Rank\*\*: (\d+)(?:TH|RD|ST|ND)', discussion_detail)
+            discussion_url = re.search(r'\*\*Link\*\*: (https://www\.kaggle\.com/competitions/[\w-]+/discussion/\d+)', discussion_detail)
+            if not discussion_url:
+                continue
+            self.store.put_discussion_detail(safe_comp_name, discussion_url.group(1), discussion_name,
+                                             int(discussion_rank.group(1)) if discussion_rank else None,
+                                             content_path)
+            indexed += 1
+        print(f"已将 {indexed} 条历史讨论帖登记到产物库")
+        return indexed
 
-        print(f"==========disussion_name2url==========")
-        for name, url in disussion_name2url.items():
-            print(f"{name}: {url}")
+    def find_top_solution(self, comp_name:str, top_k:int=50):
+        """找到高分方案"""
+        safe_comp_name = safe_title_func(comp_name)
+        # 只比较目录数，有未登记的讨论帖时才解析markdown
+        discussion_detail_dir = f'{COMP_REVIEW_ROOT_PATH}/{safe_comp_name}/discussion_details/'
+        if os.path.isdir(discussion_detail_dir) and \
+                len(os.listdir(discussion_detail_dir)) > self.store.count_discussion_details(safe_comp_name):
+            self.index_legacy_discussions(safe_comp_name)
 
-        # 按rank，获取排名前top_k的帖子（注意会有相同top_k的帖子，都保留，而不是直接选择top_k）
+        # 按rank升序查询排名前top_k的帖子（注意会有相同top_k的帖子，都保留，而不是直接选择top_k）
         top_k_disussion_name2rank = {}
         top_k_disussion_name2url = {}
-        for i, (name, rank) in enumerate(disussion_name2rank):
-            if rank <= top_k:
-                top_k_disussion_name2rank[name] = rank
-                top_k_disussion_name2url[name] = disussion_name2url[name]
-            else:
-                break
+        for name, rank, url in self.store.top_discussions(safe_comp_name, top_k):
+            top_k_disussion_name2rank[name] = rank
+            top_k_disussion_name2url[name] = url
+
+        print(f"==========top_k_disussion_name2rank==========")
+        for name, rank in top_k_disussion_name2rank.items():
+            print(f"{name}: {rank} | {top_k_disussion_name2url[name]}")
+        print("\n\n")
 
         # 将top_k结果保存
         with open(f'{COMP_REVIEW_ROOT_PATH}/{safe_comp_name}/top_k_disussion_name2rank.json', 'w', encoding='utf-8') as f:
@@ -6,448 +6,227 @@ CreateDay: 20250603
 Author: HongfengAi
 History:
 20250603    HongfengAi  第一版
+20261018    HongfengAi  讨论详情支持多worker并发爬取
+20261018    HongfengAi  改为声明式阶段图，按内容哈希跳过未变化的阶段；比赛、页数和TOP Solution均通过命令行指定，无需人工交互
+20261018    HongfengAi  --comp_name支持多个比赛批量处理，共享浏览器池和LLM客户端
+20261018    HongfengAi  各阶段依赖的模块改为阶段执行时才导入，缩短启动时间
+20261018    HongfengAi  方案总结按条记录进度，中断后重跑从断点继续
+20261018    HongfengAi  讨论帖列表改为从产物库查询
+20261018    HongfengAi  有方案总结失败时summarize阶段记为失败，下次运行时重试
+20261018    HongfengAi  讨论帖列表优先读取阶段输入文件
+20261018    HongfengAi  有讨论帖爬取失败时dis_details阶段记为失败，下次运行时重试
 """
 import sys, os
 import re
 import json
 import time
+import argparse
 # 添加项目根目录到系统路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from crawler import (
-    CompListCrawler,
-    CompOverviewCrawler,        
-    CompDisListCrawler,
-    CompDisDetailsCrawler,
+from comp_express.pipeline import (
+    add_runner_args,
+    load_comp_list,
+    select_competitions,
+    add_overview_stages,
+    make_cover,
+    upload_cover,
+    create_draft,
 )
-from comp_express.overview_summarizer import OverviewSummarizer
-from comp_review.find_top_solution import FindTopSolution
-from comp_review.solution_summarizer import SolutionSummarizer
-from comp_review.summary_template_fill import SummaryTemplateFiller
-from wechat_utils.ppt_to_image import PPTToImage
-from wechat_utils.upload_material import WeChatPermanentMaterialUploader
-from wechat_utils.create_draft import WeChatDraftCreator
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import OUTPUT_ROOT_PATH, COMP_EXPRESS_ROOT_PATH, COMP_REVIEW_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import safe_title_func
-
-
-if __name__ == '__main__':
-    ############################
-    # 1、爬取比赛列表 并 过滤
-    ############################
-    print("="*60)
-    print("比赛列表爬取")
-    print("="*60)
-    user_input = input("是否需要重新爬取比赛列表: (y/N): ").strip().lower()
-    if user_input not in ['y', 'yes']:
-        with open(f'{OUTPUT_ROOT_PATH}/kaggle_competitions_list.json', 'r', encoding='utf-8') as f:
-            all_comp_list = json.load(f)
-    else:
-        page_limit = input("请输入要爬取的页数: ")
-        stime = time.time()
-        cl_crawler = CompListCrawler()
-        all_comp_list = cl_crawler.parse_page(page_limit=page_limit)
-        etime = time.time()
-        print(f'爬取完成，共获取 {len(all_comp_list)} 个比赛信息，耗时 {etime-stime} 秒')
-
-    # 筛选出leave_time包含"ago"且comp_reward包含"$"的比赛
-    filtered_comp_list = []
-    for comp in all_comp_list:
-        # 检查筛选条件
-        if 'ago' in comp['leave_time'] and '$' in comp['comp_reward']:
-            filtered_comp_list.append(comp)
-    print(f'筛选条件：leave_time包含"ago"且comp_reward包含"$"')
-    print(f'[比赛列表] 原始比赛数量: {len(all_comp_list)}')
-    print(f'[比赛列表] 筛选后比赛数量: {len(filtered_comp_list)}')
-
-    # 用户输入选择哪些游戏
-    if not filtered_comp_list:
-        print("[比赛列表] 没有找到符合条件的比赛，程序结束。")
-        exit()
-    
-    print("\n" + "="*60)
-    print("[比赛列表] 筛选后的比赛列表：")
-    print("="*60)
-    
-    for i, comp in enumerate(filtered_comp_list, 1):
-        print(f"{i}. {comp['name']}")
-        print(f"   奖金: {comp['comp_reward']}")
-        print(f"   剩余时间: {comp['leave_time']}")
-        print(f"   类型: {comp['comp_type']}")
-        print(f"   参与队伍: {comp['team_number']}")
-        print(f"   链接: {comp['link']}")
-        print("-" * 50)
-    
-    print(f"\n请选择要进一步处理的比赛：")
-    print(f"输入格式：")
-    print(f"  - 单个选择：输入数字 (如: 1)")
-    print(f"  - 退出程序：输入 'exit' 或 'q'")
-    
-    while True:
-        try:
-            user_input = input(f"\n请输入您的选择 (1-{len(filtered_comp_list)}): ").strip()
-            
-            if user_input.lower() in ['exit', 'q']:
-                print("程序已退出。")
-                exit()
-            
-            # 解析用户输入的数字
-            indices = []
-            for item in user_input.split(','):
-                index = int(item.strip())
-                if 1 <= index <= len(filtered_comp_list):
-                    indices.append(index)
-                else:
-                    print(f"错误：索引 {index} 超出范围 (1-{len(filtered_comp_list)})")
-                    raise ValueError()
-            
-            if not indices:
-                print("请至少选择一个比赛。")
-                continue
-            
-            # 获取选中的比赛
-            selected_indice = indices[0]
-            selected_comp = filtered_comp_list[selected_indice-1]
-            break
-            
-        except ValueError:
-            print("输入格式错误，请重新输入。")
-            continue
-        except KeyboardInterrupt:
-            print("\n程序已被中断。")
-            exit()
-    
-    print(f"\n您选择了比赛：[{selected_indice}] {selected_comp['name']}")
-
-
-    ############################
-    # 2、爬取选中比赛的Overview信息
-    ############################
-    print("\n" + "="*60)
-    print("比赛Overview爬取")
-    print("="*60)
-
-    # 检查是否已存在概览数据文件
-    safe_title = safe_title_func(selected_comp['name'])
-    overview_file_path = f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/comp_overview.json'
-    if os.path.exists(overview_file_path):
-        print(f"发现已存在的概览数据: {overview_file_path}")
-        user_input = input(f"是否需要重新爬取 '{selected_comp['name']}' 的概览信息？(y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[比赛概览] ✓ 跳过: {selected_comp['name']} (使用现有数据)")
-        else:
-            # 爬取比赛概览信息
-            stime = time.time()
-            overview_crawler = CompOverviewCrawler()
-            comp_overview = overview_crawler.parse_page(selected_comp['link'])
-            etime = time.time()
-            print(f"[比赛概览] ✓ 完成: {selected_comp['name']}，耗时 {etime-stime} 秒")
-    else:
-        # 爬取比赛概览信息
-        stime = time.time()
-        overview_crawler = CompOverviewCrawler()
-        comp_overview = overview_crawler.parse_page(selected_comp['link'])
-        etime = time.time()
-        print(f"[比赛概览] ✓ 完成: {selected_comp['name']}，耗时 {etime-stime} 秒")
-
-
-    ############################
-    # 3、用中文翻译比赛速览
-    ############################
-    print("\n" + "="*60)
-    print("比赛Overview翻译")
-    print("="*60)
-
-    # 检查是否已存在翻译数据文件
-    zh_comp_overview_file_path = f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/zh_comp_overview.json'
-    if os.path.exists(zh_comp_overview_file_path):
-        print(f"发现已存在的翻译数据: {zh_comp_overview_file_path}")
-        user_input = input(f"是否需要重新翻译 '{selected_comp['name']}' 的概览信息？(y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[比赛速览] ✓ 跳过: {selected_comp['name']} (使用现有数据)")
-        else:
-            stime = time.time()
-            overview_summarizer = OverviewSummarizer()
-            overview_summarizer.overview_summarizer(selected_comp['name'])
-            etime = time.time()
-            print(f"[比赛速览] ✓ 翻译完成: {selected_comp['name']}，耗时 {etime-stime} 秒")
-    else:
-        stime = time.time()
-        overview_summarizer = OverviewSummarizer()
-        overview_summarizer.overview_summarizer(selected_comp['name'])
-        etime = time.time()
-        print(f"[比赛速览] ✓ 翻译完成: {selected_comp['name']}，耗时 {etime-stime} 秒")
-
-
-    ############################
-    # 4、爬取比赛讨论列表
-    ############################
-    print("\n" + "="*60)
-    print("比赛讨论帖列表爬取")
-    print("="*60)
-    
-    dis_list_file_path = f'{COMP_REVIEW_ROOT_PATH}/{safe_title}/comp_dis_list.json'
-    if os.path.exists(dis_list_file_path):
-        print(f"发现已存在的讨论列表数据: {dis_list_file_path}")
-        user_input = input(f"是否需要重新爬取 '{selected_comp['name']}' 的讨论列表？(y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[讨论列表] ✓ 跳过: {selected_comp['name']} (使用现有数据)")
-        else:
-            crawl_page = int(input("请输入每个比赛要爬取的讨论页数 (默认: 5): ").strip() or "5")
-            stime = time.time()
-            discussion_crawler = CompDisListCrawler()
-            comp_discussions = discussion_crawler.parse_page(url=selected_comp['link'],
-                                                            page_limit=crawl_page)
-            etime = time.time()
-            print(f"[讨论列表] ✓ 完成: {selected_comp['name']}，耗时 {etime-stime} 秒")
-    else:
-        crawl_page = int(input("请输入每个比赛要爬取的讨论页数 (默认: 5): ").strip() or "5")
-        stime = time.time()
-        discussion_crawler = CompDisListCrawler()
-        comp_discussions = discussion_crawler.parse_page(url=selected_comp['link'],
-                                                        page_limit=crawl_page)
-        etime = time.time()
-        print(f"[讨论列表] ✓ 完成: {selected_comp['name']}，耗时 {etime-stime} 秒")
-
-
-    ############################
-    # 5、爬取讨论详情
-    ############################
-    print("\n" + "="*60)
-    print("讨论帖正文内容爬取")
-    print("="*60)
-    
-    user_input = input(f"是否需要爬取讨论贴正文内容的？(y/N): ").strip().lower()
-    if user_input not in ['y', 'yes']:
-        print(f"[讨论列表] ✓ 跳过所有讨论贴正文内容的爬取 (使用现有数据)")
-
-    else:
-        # 读取讨论列表
-        with open(dis_list_file_path, 'r', encoding='utf-8') as f:
-            comp_discussions = json.load(f)
-
-        crawl_details_num = int(input("请输入每个比赛要爬取多少条讨论详情 (默认: 30): ").strip() or "30")
-        crawl_details_num = min(crawl_details_num, len(comp_discussions))
-
-        # 遍历讨论列表中每个讨论帖，然后依次爬取其正文内容
-        stime = time.time()
-        details_crawler = CompDisDetailsCrawler()
-        for i in range(1, crawl_details_num+1):
-            comp_dis = comp_discussions[i-1]
-            print(f"[讨论详情] 正在处理（{i}/{crawl_details_num}）: {comp_dis['title']}")
-            
-            # 检查是否已存在讨论详情文件
-            safe_discussion_title = safe_title_func(comp_dis['title'])
-            detail_file_path = f'{COMP_REVIEW_ROOT_PATH}/{safe_title}/discussion_details/{safe_discussion_title}/discussion_content.md'
-            if os.path.exists(detail_file_path):
-                skip_existing = input(f"    现已存在的详情文件: {detail_file_path}，是否重复爬取？(Y/n): ").strip().lower()
-                
-                if skip_existing not in ['y', 'yes']:
-                    print(f"    ✓ 跳过: {comp_dis['title']} (使用现有数据)")
-                    continue
-                
-            detail_content = details_crawler.parse_page(url=comp_dis['link'])
-            print(f"[讨论详情] ✓ 完成: {comp_dis['title']}")
-
-        etime = time.time()
-        print(f"[讨论详情] ✓ 完成: {selected_comp['name']}，耗时 {etime-stime} 秒")
-
-    ############################
-    # 6、找出TOP Solution
-    ############################
-    print("\n" + "="*60)
-    print("TOP Solution寻找")
-    print("="*60)
-
-    user_input = input(f"是否需要找出TOP Solution？(y/N): ").strip().lower()
-    if user_input not in ['y', 'yes']:
-        print(f"[TOP Solution] ✓ 跳过所有TOP Solution的寻找 (使用现有数据)")
-
-    else:
-        top_k_disussion_name2rank_file_path = f'{COMP_REVIEW_ROOT_PATH}/{safe_title}/top_k_disussion_name2rank.json'
-        top_k_disussion_name2url_file_path = f'{COMP_REVIEW_ROOT_PATH}/{safe_title}/top_k_disussion_name2url.json'
-        if os.path.exists(top_k_disussion_name2rank_file_path) and os.path.exists(top_k_disussion_name2url_file_path):
-            print(f"发现已存在的TOP Solution数据: {top_k_disussion_name2rank_file_path} 和 {top_k_disussion_name2url_file_path}")
-            user_input = input(f"是否需要重新找出TOP Solution？(y/N): ").strip().lower()
-            
-            if user_input not in ['y', 'yes']:
-                print(f"[TOP Solution] ✓ 跳过: {selected_comp['name']} (使用现有数据)")
-                top_k_disussion_name2rank = json.load(open(top_k_disussion_name2rank_file_path, 'r', encoding='utf-8'))
-                top_k_disussion_name2url = json.load(open(top_k_disussion_name2url_file_path, 'r', encoding='utf-8'))
-            else:
-                top_k = int(input("请输入要找出多少个TOP Solution (默认: 100): ").strip() or "100")
-                find_top_solution = FindTopSolution()
-                top_k_disussion_name2rank, top_k_disussion_name2url = find_top_solution.find_top_solution(safe_title, top_k=top_k)
-                print(f"[TOP Solution] ✓ 完成: {selected_comp['name']}")
-        else:
-            top_k = int(input("请输入要找出多少个TOP Solution (默认: 100): ").strip() or "100")
-            find_top_solution = FindTopSolution()
-            top_k_disussion_name2rank, top_k_disussion_name2url = find_top_solution.find_top_solution(safe_title, top_k=top_k)
-            print(f"[TOP Solution] ✓ 完成: {selected_comp['name']}")
-
-        # 打印TOP Solution
-        print(f"\n[TOP Solution] 找到的TOP Solution:")
-        for i, (name, rank) in enumerate(top_k_disussion_name2rank.items(), 1):
-            print(f"{i}. {name} - 排名: {rank}")
-            print(f"   链接: {top_k_disussion_name2url[name]}")
-            print("-" * 50)
-
-        # 请选择你想要的TOP Solution
-        print(f"\n请选择你想要的TOP Solution:")
-        print(f"输入格式：")
-        print(f"  - 多个选择：输入数字 (如: 1,2,3)")
-        print(f"  - 退出程序：输入 'exit' 或 'q'")
-        
-        # 用户输入选择哪些游戏
-        user_input = input(f"\n请输入您的选择 (1-{len(top_k_disussion_name2rank)}): ").strip()
-
-        if user_input.lower() in ['exit', 'q']:
-            print("程序已退出。")
-            exit() 
-            
-        # 修改top_k_disussion_name2rank/url，只保留选择后的讨论帖的名称
-        selected_dis_names = [list(top_k_disussion_name2rank.keys())[int(i)-1] for i in user_input.split(',')]
+# 爬虫（selenium）、LLM（langchain）和封面（pptx/win32com）相关模块都较重，
+# 在各阶段函数内按需导入：阶段全部命中时不会加载这些库
+from utils import safe_title_func, report_llm_stats
+from pipeline_runner import Stage, PipelineRunner, SharedRuntime, run_batch, STATUS_FAILED
+
+
+def select_solutions(top_k_disussion_name2rank: dict, top_k_disussion_name2url: dict, solutions: str):
+    """
+    按序号保留指定的TOP Solution
+
+    Args:
+        solutions: 序号，如 "1,2,3"（从1开始，对应按排名排序后的顺序），None表示全部保留
+    """
+    if solutions:
+        names = list(top_k_disussion_name2rank.keys())
+        selected_dis_names = [names[int(i)-1] for i in solutions.split(',') if 1 <= int(i) <= len(names)]
         top_k_disussion_name2rank = {k: v for k, v in top_k_disussion_name2rank.items() if k in selected_dis_names}
         top_k_disussion_name2url = {k: v for k, v in top_k_disussion_name2url.items() if k in selected_dis_names}
+    return top_k_disussion_name2rank, top_k_disussion_name2url
+
+
+def build_pipeline(comp: dict, args, runtime: SharedRuntime) -> PipelineRunner:
+    """
+    构建某个比赛竞赛复盘的阶段图
+    overview -> translate -> cover -> upload -> draft，
+    dis_list -> dis_details -> top_solution -> summarize -> template -> draft，
+    两条链互不依赖，并发执行
+    """
+    safe_title = safe_title_func(comp['name'])
+    data_dir = f'{COMP_REVIEW_ROOT_PATH}/{safe_title}'
+    dis_list_file = f'{data_dir}/comp_dis_list.json'
+    dis_details_dir = f'{data_dir}/discussion_details'
+    name2rank_file = f'{data_dir}/top_k_disussion_name2rank.json'
+    name2url_file = f'{data_dir}/top_k_disussion_name2url.json'
+    summarys_file = f'{data_dir}/top_solution_summarys.json'
+    html_file = f'{data_dir}/zh_solution_summary.html'
+    cover_image_file = f'{data_dir}/cover/cover.png'
+    cover_result_file = f'{data_dir}/cover/cover.json'
+    recrawl_details = 'all' in args.force or 'dis_details' in args.force
+    # 已总结的方案记录在进度日志中，默认复用；--force summarize 时全部重新总结
+    resume_summarize = not ('all' in args.force or 'summarize' in args.force)
+
+    def crawl_dis_list():
+        from crawler.comp_dis_list_crawler import CompDisListCrawler
+        CompDisListCrawler().parse_page(url=comp['link'], page_limit=args.dis_pages)
+
+    def crawl_dis_details():
+        from crawler.comp_dis_details_crawler import CompDisDetailsCrawler
+        from artifact_store import get_artifact_store
+        # 讨论帖列表以阶段输入文件为准（按内容哈希），文件不存在时从产物库查询
+        if os.path.exists(dis_list_file):
+            with open(dis_list_file, 'r', encoding='utf-8') as f:
+                comp_discussions = json.load(f)
+        else:
+            comp_discussions = get_artifact_store().list_discussions(safe_title)
 
-        # 将top_k_disussion_name2rank/url保存到文件
-        with open(top_k_disussion_name2rank_file_path, 'w', encoding='utf-8') as f:
+        # 已爬取过的讨论帖默认不再重复爬取，--force dis_details 时全部重新爬取
+        crawl_discussions = []
+        for comp_dis in comp_discussions[:args.details_num]:
+            safe_discussion_title = safe_title_func(comp_dis['title'])
+            detail_file_path = f'{dis_details_dir}/{safe_discussion_title}/discussion_content.md'
+            if os.path.exists(detail_file_path) and not recrawl_details:
+                continue
+            crawl_discussions.append(comp_dis)
+
+        print(f"[讨论详情] 共需爬取 {len(crawl_discussions)} 条讨论，worker数: {args.workers}")
+        details_crawler = runtime.get('dis_details_crawler', CompDisDetailsCrawler)
+        crawl_urls = [comp_dis['link'] for comp_dis in crawl_discussions]
+        results = details_crawler.parse_pages(crawl_urls, workers=args.workers)
+        # 有讨论帖爬取失败时阶段记为失败，下次运行时重跑本阶段（已爬取的讨论帖不再重复爬取）
+        failed_urls = [url for url, result in zip(crawl_urls, results) if result is None]
+        if failed_urls:
+            raise RuntimeError(f"{len(failed_urls)} 条讨论帖爬取失败: {failed_urls}")
+
+    def find_top_solution():
+        from comp_review.find_top_solution import FindTopSolution
+        top_k_disussion_name2rank, top_k_disussion_name2url = FindTopSolution().find_top_solution(safe_title, top_k=args.top_k)
+        top_k_disussion_name2rank, top_k_disussion_name2url = select_solutions(top_k_disussion_name2rank,
+                                                                               top_k_disussion_name2url,
+                                                                               args.solutions)
+        with open(name2rank_file, 'w', encoding='utf-8') as f:
             json.dump(top_k_disussion_name2rank, f, ensure_ascii=False, indent=4)
-        with open(top_k_disussion_name2url_file_path, 'w', encoding='utf-8') as f:
+        with open(name2url_file, 'w', encoding='utf-8') as f:
             json.dump(top_k_disussion_name2url, f, ensure_ascii=False, indent=4)
 
-        # 打印top结果
         print(f"\n[TOP Solution] 选择后的TOP Solution:")
         for i, (name, rank) in enumerate(top_k_disussion_name2rank.items(), 1):
             print(f"{i}. {name} - 排名: {rank}")
             print(f"   链接: {top_k_disussion_name2url[name]}")
             print("-" * 50)
 
+    def summarize():
+        from comp_review.solution_summarizer import SolutionSummarizer
+        with open(name2rank_file, 'r', encoding='utf-8') as f:
+            top_k_disussion_name2rank = json.load(f)
+        with open(name2url_file, 'r', encoding='utf-8') as f:
+            top_k_disussion_name2url = json.load(f)
+        solution_summarizer = runtime.get('solution_summarizer', SolutionSummarizer)
+        pending_names = solution_summarizer.summarize_solution(safe_title,
+                                                               top_k_disussion_name2rank,
+                                                               top_k_disussion_name2url,
+                                                               resume=resume_summarize)
+        # 有方案未总结成功时阶段记为失败，下次运行时重跑本阶段（已总结的方案从进度日志复用）
+        if pending_names:
+            raise RuntimeError(f"{len(pending_names)} 条方案总结失败: {pending_names}")
+
+    def fill_template():
+        from comp_review.summary_template_fill import SummaryTemplateFiller
+        SummaryTemplateFiller().solution_template_fill(safe_title)
+
+    runner = PipelineRunner(name=f"竞赛复盘 {safe_title}",
+                            state_path=f'{data_dir}/.pipeline_state.json',
+                            max_workers=args.max_parallel,
+                            force=args.force,
+                            dry_run=args.dry_run)
+    zh_comp_overview_file = add_overview_stages(runner, comp, runtime)
+    runner.add(Stage('dis_list', crawl_dis_list,
+                     outputs=[dis_list_file],
+                     code=['crawler.comp_dis_list_crawler'],
+                     config={'link': comp['link'], 'dis_pages': args.dis_pages}))
+    runner.add(Stage('dis_details', crawl_dis_details,
+                     inputs=[dis_list_file],
+                     outputs=[dis_details_dir],
+                     code=['crawler.comp_dis_details_crawler'],
+                     config={'details_num': args.details_num}))
+    runner.add(Stage('top_solution', find_top_solution,
+                     inputs=[dis_details_dir],
+                     outputs=[name2rank_file, name2url_file],
+                     code=['comp_review.find_top_solution'],
+                     config={'top_k': args.top_k, 'solutions': args.solutions}))
+    runner.add(Stage('summarize', summarize,
+                     inputs=[name2rank_file, name2url_file],
+                     outputs=[summarys_file],
+                     code=['comp_review.solution_summarizer']))
+    runner.add(Stage('template', fill_template,
+                     inputs=[zh_comp_overview_file, summarys_file],
+                     outputs=[html_file],
+                     code=['comp_review.summary_template_fill']))
+    runner.add(Stage('cover', lambda: make_cover("comp_review", zh_comp_overview_file),
+                     inputs=[zh_comp_overview_file],
+                     outputs=[cover_image_file],
+                     code=['wechat_utils.ppt_to_image'],
+                     resource='wps'))
+    runner.add(Stage('upload', lambda: upload_cover(cover_image_file),
+                     inputs=[cover_image_file],
+                     outputs=[cover_result_file]))
+    runner.add(Stage('draft', lambda: create_draft("comp_review", comp['name']),
+                     inputs=[html_file, cover_result_file, zh_comp_overview_file],
+                     config={'title': comp['name']}))
+    return runner
 
-    ############################
-    # 7、总结TOP Solution
-    ############################    
-    print("\n" + "="*60)
-    print("TOP Solution总结")
-    print("="*60)
-
-    stime = time.time()
-    discussion_summarys_file_path = f'{COMP_REVIEW_ROOT_PATH}/{safe_title}/top_solution_summarys.json'
-    if os.path.exists(discussion_summarys_file_path):
-        print(f"发现已存在的TOP Solution总结数据: {discussion_summarys_file_path}")
-        user_input = input(f"是否需要重新总结TOP Solution？(y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[TOP Solution] ✓ 跳过: {selected_comp['name']} (使用现有数据)")
-        
-        else:
-            solution_summarizer = SolutionSummarizer()
-            solution_summarizer.summarize_solution(safe_title, 
-                                                top_k_disussion_name2rank, 
-                                                top_k_disussion_name2url)
-            print(f"[TOP Solution] ✓ 完成: {selected_comp['name']}")
-    else:
-        solution_summarizer = SolutionSummarizer()
-        solution_summarizer.summarize_solution(safe_title, 
-                                            top_k_disussion_name2rank, 
-                                            top_k_disussion_name2url)
-        print(f"[TOP Solution] ✓ 完成: {selected_comp['name']}")
-
-    etime = time.time()
-    print(f"\n[TOP Solution] 总结TOP Solution完成，耗时 {etime-stime} 秒")
-    
-    
-    ############################
-    # 8、填充竞赛复盘模版
-    ############################ 
-    print("\n" + "="*60)
-    print("竞赛复盘模版填充")
-    print("="*60)
-
-    solution_summary_file_path = f'{COMP_REVIEW_ROOT_PATH}/{safe_title}/solution_summary.html'
-    if os.path.exists(solution_summary_file_path):
-        print(f"发现已存在的竞赛复盘模版填充数据: {solution_summary_file_path}")
-        user_input = input(f"是否需要重新填充竞赛复盘模版？(y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[竞赛复盘模版] ✓ 跳过: {selected_comp['name']} (使用现有数据)")
-        else:
-            summary_template_filler = SummaryTemplateFiller()
-            summary_template_filler.solution_template_fill(safe_title)
-            print(f"[竞赛复盘模版] ✓ 填充完成")
-    else:
-        summary_template_filler = SummaryTemplateFiller()
-        summary_template_filler.solution_template_fill(safe_title)
-        print(f"[竞赛复盘模版] ✓ 填充完成")
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='竞赛复盘Pipeline')
+    add_runner_args(parser)
+    parser.add_argument('--dis_pages', type=int, default=5, help='每个比赛要爬取的讨论页数')
+    parser.add_argument('--details_num', type=int, default=30, help='每个比赛要爬取多少条讨论详情')
+    parser.add_argument('--workers', type=int, default=1, help='并发爬取讨论详情的worker数')
+    parser.add_argument('--top_k', type=int, default=100, help='保留排名前top_k的Solution')
+    parser.add_argument('--solutions', type=str, default=None, help='要总结的TOP Solution序号，如 1,2,3，默认全部')
+    args = parser.parse_args()
+    if args.refresh_llm_cache:
+        from llm_cache import get_llm_cache_store
+        get_llm_cache_store().bypass = True
 
     ############################
-    # 9、制作封面图
+    # 1、爬取比赛列表 并 选择比赛
     ############################
-    print("\n" + "="*60)
-    print("制作封面图")
     print("="*60)
-
-    # 检查是否已存在封面图文件
-    cover_image_file_path = f'{COMP_REVIEW_ROOT_PATH}/{safe_title}/cover/cover.png'
-    if os.path.exists(cover_image_file_path):
-        print(f"发现已存在的封面图: {cover_image_file_path}")
-        user_input = input(f"是否需要重新制作封面图？(y/N): ").strip().lower()
-
-        if user_input not in ['y', 'yes']:
-            print(f"[封面图] ✓ 跳过: {selected_comp['name']} (使用现有数据)")
-        else:
-
-            with open(f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/zh_comp_overview.json', 'r', encoding='utf-8') as f:
-                zh_comp_overview = json.load(f)
-
-            keywords = zh_comp_overview['竞赛关键词'][1:-1].replace("'", "").replace(", ", "、").replace(" ", "")
-            ppt_to_image = PPTToImage()
-            ppt_to_image.main(comp_type="comp_review",
-                              title=zh_comp_overview['竞赛名称'],
-                              host=zh_comp_overview['组织者'],
-                              keywords=keywords)
-            print(f"[封面图] ✓ 制作完成: {selected_comp['name']}")
-    else:
-        with open(f'{COMP_EXPRESS_ROOT_PATH}/{safe_title}/zh_comp_overview.json', 'r', encoding='utf-8') as f:
-            zh_comp_overview = json.load(f)
-
-        keywords = zh_comp_overview['竞赛关键词'][1:-1].replace("'", "").replace(", ", "、").replace(" ", "")
-        ppt_to_image = PPTToImage()
-        ppt_to_image.main(comp_type="comp_review",
-                          title=zh_comp_overview['竞赛名称'],
-                          host=zh_comp_overview['组织者'],
-                          keywords=keywords)
-        print(f"[封面图] ✓ 制作完成: {selected_comp['name']}")
-
-
-    ############################
-    # 10、上传封面图至公众号平台
-    ############################
-    print("\n" + "="*60)
-    print("上传封面图至公众号平台")
+    print("比赛列表爬取")
     print("="*60)
-
-    # 检查是否已存在封面图文件
-    cover_image_file_path = f'{COMP_REVIEW_ROOT_PATH}/{safe_title}/cover/cover.png'
-    wechat_uploader = WeChatPermanentMaterialUploader()
-    upload_result= wechat_uploader.upload_specific_file(cover_image_file_path)
-    print(f"[封面图] ✓ 上传完成: {selected_comp['name']}")
-
+    all_comp_list = load_comp_list(args)
+    selected_comps = select_competitions(all_comp_list, args.comp_name, leave_time_keyword='ago')
+    if not selected_comps:
+        print("[比赛列表] 未选中比赛，程序结束。")
+        sys.exit(1 if args.comp_name else 0)
 
     ############################
-    # 11、创建草稿至公众号平台
+    # 2、执行竞赛复盘的阶段图（多个比赛共享一个运行时）
     ############################
-    print("\n" + "="*60)
-    print("创建草稿至公众号平台")
-    print("="*60)
+    runtime = SharedRuntime(keep_warm=len(selected_comps) > 1)
+    try:
+        runners = [build_pipeline(comp, args, runtime) for comp in selected_comps]
+        if len(runners) == 1:
+            all_results = [runners[0].run()]
+        else:
+            all_results = list(run_batch(runners, max_items=args.max_items, max_stages=args.max_stages).values())
+    finally:
+        runtime.close()
+
+    report_llm_stats()
 
-    wechat_draft_creator = WeChatDraftCreator()
-    wechat_draft_creator.create_draft(comp_type="comp_review",
-                                      title=selected_comp['name'])
-    print(f"[草稿] ✓ 创建完成: {selected_comp['name']}")
+    if any(STATUS_FAILED in results.values() for results in all_results):
+        sys.exit(1)
@@ -8,55 +8,126 @@ CreateDay: 20250611
 Author: HongfengAi
 History:
 20250611    HongfengAi  第一版
+20261018    HongfengAi  新增token预估和长文map-reduce总结：超出预算的方案按标题切块并行提炼要点后再合并总结
+20261018    HongfengAi  方案总结改为结构化输出（pydantic校验 + 失败时针对性修正）
+20261018    HongfengAi  LLM调用改走LLMClient，记录TTFT、耗时和token用量
+20261018    HongfengAi  逐条写入进度日志，中断后重跑只总结未完成的方案
+20261018    HongfengAi  方案总结写入产物库，JSON由产物库导出
+20261018    HongfengAi  结构化输出校验失败的方案不再记入进度日志，返回待重试的方案
+20261018    HongfengAi  核心技术点超过5个时截断而不是判为校验失败
 """
+import re
 import json
+from typing import List
+
+from pydantic import BaseModel, Field, field_validator
 
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import COMP_REVIEW_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import set_proxy, unset_proxy, init_llm, safe_title_func, parse_llm_json_output
+from utils import safe_title_func, count_tokens
+from llm_client import LLMClient
+from structured_output import invoke_structured, StructuredOutputError
+from item_journal import ItemJournal, content_digest
+from artifact_store import get_artifact_store
+
+
+# markdown标题行，如 "## Model"
+HEADING_PATTERN = re.compile(r'^#{1,6}\s+\S')
+
+
+class CoreTechnique(BaseModel):
+    """核心技术点"""
+    core_technique: str = Field(description="核心技术点名称", min_length=1)
+    core_technique_description: str = Field(description="核心技术点描述，150-500字", min_length=1)
+
+
+class SolutionSummary(BaseModel):
+    """Top Solution总结"""
+    solution_description: str = Field(description="解决方案描述，150-300字", min_length=1)
+    core_techniques: List[CoreTechnique] = Field(description="核心技术点，不超过5个", min_length=1)
+    solution_summary: str = Field(description="解决方案总结，150-500字", min_length=1)
+
+    @field_validator('core_techniques')
+    @classmethod
+    def truncate_core_techniques(cls, core_techniques: List[CoreTechnique]) -> List[CoreTechnique]:
+        # 核心技术点多于5个时截断，不判为校验失败
+        return core_techniques[:5]
 
 
 class SolutionSummarizer():
-    def __init__(self):
-        set_proxy()
+    def __init__(self,
+                 max_prompt_tokens: int = 16000,
+                 chunk_tokens: int = 6000,
+                 map_concurrency: int = 4):
+        """
+        Args:
+            max_prompt_tokens: 方案全文的token上限，超出时改用map-reduce总结
+            chunk_tokens: map阶段每个分块的token上限
+            map_concurrency: map阶段并行请求数
+        """
         # 初始化llm
-        self.llm = init_llm(temperature=0.7)
+        self.llm_client = LLMClient("solution_summarizer", temperature=0.7)
         self.comp_review_root_path = COMP_REVIEW_ROOT_PATH
+        self.max_prompt_tokens = max_prompt_tokens
+        self.chunk_tokens = chunk_tokens
+        self.map_concurrency = map_concurrency
 
-    def summarize_solution(self, comp_name:str, 
-                           top_k_disussion_name2rank:dict,
-                           top_k_disussion_name2url:dict):
-        """总结top solution的复盘"""
-        # 设置代理
-        set_proxy()
-        safe_comp_name = safe_title_func(comp_name)
+    def split_sections(self, markdown: str) -> list:
+        """按markdown标题切分章节，代码块内以#开头的注释行不作为标题"""
+        sections, current = [], []
+        in_code_block = False
+        for line in markdown.splitlines(keepends=True):
+            if line.lstrip().startswith("```"):
+                in_code_block = not in_code_block
+            if not in_code_block and HEADING_PATTERN.match(line) and current:
+                sections.append("".join(current))
+                current = []
+            current.append(line)
+        if current:
+            sections.append("".join(current))
+        return sections
 
-        # 根据top_k_disussion_name2rank，获
-        # 取data/{comp_name}/discussion_details/{name}下的md文件，
-        # 并使用llm生成top solution的复盘
-        discussion_summarys = []
-        total_len = len(top_k_disussion_name2rank)
-        i = 0
-        for name, rank in top_k_disussion_name2rank.items():
-            i += 1
-            print(f"=========={i}/{total_len}==========")
-            print(f"Summary Discussion | {name} | {top_k_disussion_name2url[name]} (rank: {rank})...")
-            discussion_summary = {}
-            discussion_summary['title'] = name
-            discussion_summary['rank'] = rank
-            discussion_summary['url'] = top_k_disussion_name2url[name]
-            
-            with open(f'{self.comp_review_root_path}/{safe_comp_name}/discussion_details/{name}/discussion_content.md', 'r', encoding='utf-8') as f:
-                discussion_detail = f.read()
-                discussion_summary['discussion_content'] = discussion_detail
+    def split_by_heading(self, markdown: str) -> list:
+        """
+        把长文按标题切块，相邻的小章节合并，每块不超过chunk_tokens；
+        单个章节超出时再按段落（空行）切分
+        """
+        pieces = []
+        for section in self.split_sections(markdown):
+            if count_tokens(section) <= self.chunk_tokens:
+                pieces.append(section)
+            else:
+                pieces.extend(paragraph + "\n\n" for paragraph in re.split(r'\n\s*\n', section) if paragraph.strip())
 
-            # 调用大模型生成总结
-            prompt = f"""
+        chunks, chunk, chunk_tokens = [], "", 0
+        for piece in pieces:
+            piece_tokens = count_tokens(piece)
+            if chunk and chunk_tokens + piece_tokens > self.chunk_tokens:
+                chunks.append(chunk)
+                chunk, chunk_tokens = "", 0
+            chunk += piece
+            chunk_tokens += piece_tokens
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def build_summary_prompt(self, discussion_detail: str, is_notes: bool = False) -> str:
+        """
+        构造方案总结prompt
+        Args:
+            discussion_detail: 方案全文，或map阶段提炼出的分段要点
+            is_notes: discussion_detail是否为分段要点
+        """
+        if is_notes:
+            content_title = "该方案篇幅较长，以下是按章节顺序分段提炼的方案要点："
+        else:
+            content_title = "具体解决方案全文如下："
+        prompt = f"""
             您是一个Kaggle专家，擅长将Kaggle Discussion内的获奖方案进行总结。 
 
-            具体解决方案全文如下： 
+            {content_title} 
             {discussion_detail}
 
             请帮我对以上给定的方案进行总结，总结格式要求如下json格式：
@@ -80,28 +151,110 @@ class SolutionSummarizer():
 
             注意：json内给字段下的内容都请中文，但在对方案总结过程中，如果遇到一些AI领域或业务领域的专有名词，请保留对应词的英文表述。请不要使用**来强调任何内容。
             """
-            set_proxy()
-            llm_output = self.llm.invoke(prompt).content.strip()
-            print(f"LLM Raw Output: \n{llm_output}")
+        return prompt
+
+    def build_map_prompt(self, chunk: str, index: int, total: int) -> str:
+        """构造map阶段的分块要点提炼prompt"""
+        prompt = f"""
+            您是一个Kaggle专家。以下是某个Kaggle获奖方案全文的第{index}/{total}部分：
+
+            {chunk}
+
+            请提炼这一部分中的方案要点，包括数据处理、特征工程、模型结构、训练技巧、后处理、集成方式、实验结论以及作者给出的原因解释等。
+
+            注意：
+            - 用中文分点输出，AI领域或业务领域的专有名词请保留英文表述；
+            - 尽量保留关键的技术细节和数值（如超参数、分数提升），禁止编造内容；
+            - 若这一部分没有与方案相关的内容，输出"无"；
+            - 直接输出要点，不要输出任何其他无关内容，不要使用**来强调任何内容。
+            """
+        return prompt
+
+    def reduce_to_notes(self, discussion_detail: str) -> str:
+        """map阶段：切块并行提炼要点，合并后仍超预算时对要点再做一轮提炼"""
+        content = discussion_detail
+        for round_no in range(1, 4):
+            chunks = self.split_by_heading(content)
+            print(f"方案全文约 {count_tokens(content)} tokens，超出预算，第{round_no}轮切分为 {len(chunks)} 块并行提炼要点...")
+            prompts = [self.build_map_prompt(chunk, i + 1, len(chunks)) for i, chunk in enumerate(chunks)]
+            outputs = self.llm_client.batch(prompts, call_site="map_notes", max_concurrency=self.map_concurrency)
+            notes = [output.content.strip() for output in outputs]
+            content = "\n\n".join(f"## 第{i + 1}部分要点\n{note}" for i, note in enumerate(notes) if note and note != "无")
+            if count_tokens(content) <= self.max_prompt_tokens or len(chunks) <= 1:
+                break
+        return content
+
+    def summarize_solution(self, comp_name:str, 
+                           top_k_disussion_name2rank:dict,
+                           top_k_disussion_name2url:dict,
+                           resume:bool=True):
+        """
+        总结top solution的复盘
+
+        Args:
+            resume: 是否复用进度日志中已完成的总结（方案全文未变化时），False时全部重新总结
+        Returns:
+            list: 总结失败、留待下次重试的方案名称
+        """
+        safe_comp_name = safe_title_func(comp_name)
+
+        # 每条方案总结完成后立即记入日志，中途崩溃重跑时只总结剩余方案
+        journal = ItemJournal(f'{self.comp_review_root_path}/{safe_comp_name}/top_solution_summarys.journal.jsonl',
+                              resume=resume)
+
+        # 根据top_k_disussion_name2rank，获
+        # 取data/{comp_name}/discussion_details/{name}下的md文件，
+        # 并使用llm生成top solution的复盘
+        total_len = len(top_k_disussion_name2rank)
+        pending_names = []
+        i = 0
+        for name, rank in top_k_disussion_name2rank.items():
+            i += 1
+            print(f"=========={i}/{total_len}==========")
+            print(f"Summary Discussion | {name} | {top_k_disussion_name2url[name]} (rank: {rank})...")
             
-            # 解析LLM输出的JSON
-            parsed_summary = parse_llm_json_output(llm_output)
-            if parsed_summary:
+            with open(f'{self.comp_review_root_path}/{safe_comp_name}/discussion_details/{name}/discussion_content.md', 'r', encoding='utf-8') as f:
+                discussion_detail = f.read()
+
+            # 方案全文重新爬取且内容变化后，日志中的旧总结失效
+            digest = content_digest(rank, top_k_disussion_name2url[name], discussion_detail)
+            if journal.get(name, digest) is not None:
+                print(f"已总结过，跳过: {name}\n\n")
+                continue
+
+            discussion_summary = {}
+            discussion_summary['title'] = name
+            discussion_summary['rank'] = rank
+            discussion_summary['url'] = top_k_disussion_name2url[name]
+            discussion_summary['discussion_content'] = discussion_detail
+
+            # 调用大模型生成总结，全文超出token预算时先分块提炼要点（map）再合并总结（reduce）
+            if count_tokens(discussion_detail) > self.max_prompt_tokens:
+                prompt = self.build_summary_prompt(self.reduce_to_notes(discussion_detail), is_notes=True)
+            else:
+                prompt = self.build_summary_prompt(discussion_detail)
+            try:
+                parsed_summary = invoke_structured(self.llm_client.for_site("summarize_solution"), prompt, SolutionSummary).model_dump()
                 discussion_summary['summary'] = parsed_summary
                 print(f"Parsed Summary: \n{parsed_summary}")
-            else:
-                # 如果解析失败，保留原始输出
-                discussion_summary['summary'] = llm_output
-                print(f"Failed to parse JSON, using raw output")
-                
-            discussion_summarys.append(discussion_summary)
-            print('\n\n')
+            except StructuredOutputError as e:
+                # 修正后仍未通过校验，不记入日志，下次运行时重新总结
+                pending_names.append(name)
+                print(f"Failed to parse JSON, 下次运行时重试: {e}\n\n")
+                continue
 
-        with open(f'{self.comp_review_root_path}/{safe_comp_name}/top_solution_summarys.json', 'w', encoding='utf-8') as f:
-            json.dump(discussion_summarys, f, ensure_ascii=False, indent=4)
+            journal.append(name, discussion_summary, digest)
+            print('\n\n')
 
-        # 取消代理
-        unset_proxy()            
+        # 汇总结果由日志生成，按排名顺序排列；写入产物库，并导出旧版JSON供模板填充使用
+        discussion_summarys = journal.results(list(top_k_disussion_name2rank.keys()))
+        store = get_artifact_store()
+        store.put_summaries('solution', safe_comp_name, discussion_summarys, key_field='title')
+        store.export_json(discussion_summarys, f'{self.comp_review_root_path}/{safe_comp_name}/top_solution_summarys.json',
+                          indent=4)
+        if pending_names:
+            print(f"⚠️ {len(pending_names)} 条方案总结失败，下次运行时重试: {pending_names}")
+        return pending_names
 
 
 
@@ -5,6 +5,7 @@ CreateDay: 20250612
 Author: HongfengAi
 History:
 20250612    HongfengAi  第一版
+20261018    HongfengAi  方案图片从产物库读取，上传后的素材URL写回产物库
 """
 
 import json
@@ -15,6 +16,7 @@ from configs import OUTPUT_ROOT_PATH, COMP_REVIEW_ROOT_PATH, COMP_EXPRESS_ROOT_P
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import safe_title_func
 from wechat_utils.upload_material import WeChatPermanentMaterialUploader
+from artifact_store import get_artifact_store
 
 
 class SummaryTemplateFiller():
@@ -23,6 +25,7 @@ class SummaryTemplateFiller():
         self.review_data_root_path = COMP_REVIEW_ROOT_PATH
         self.template_path = "./code/comp_review/wechat_html_template/solution_summary_template.html"
         self.img_uploader = WeChatPermanentMaterialUploader()
+        self.store = get_artifact_store()
 
     def load_json_file(self, file_path):
         """加载JSON文件"""
@@ -327,13 +330,16 @@ class SummaryTemplateFiller():
     </p>
             </section>"""
 
-            # 读取该方案的图片来源
+            # 从产物库读取该方案的图片来源，库中没有时（产物库启用前爬取的讨论帖）读取img_name2scr_dict.json
             safe_dis_title = safe_title_func(solution_title)
-            img_name2scr_dict_file_path = f'{COMP_REVIEW_ROOT_PATH}/{safe_comp_name}/discussion_details/{safe_dis_title}/img_name2scr_dict.json'
-            with open(img_name2scr_dict_file_path, 'r', encoding='utf-8') as f:
-                img_name2scr_dict = json.load(f)
+            media_owner = f'{safe_comp_name}/{safe_dis_title}'
+            images = self.store.list_media('discussion', media_owner)
+            if images is None:
+                img_name2scr_dict_file_path = f'{COMP_REVIEW_ROOT_PATH}/{safe_comp_name}/discussion_details/{safe_dis_title}/img_name2scr_dict.json'
+                with open(img_name2scr_dict_file_path, 'r', encoding='utf-8') as f:
+                    images = [{'local_path': img_scr} for img_scr in json.load(f).values()]
             
-            if img_name2scr_dict == {}:
+            if not images:
                 solution_img_html = ""
             else:
                 solution_img_html = f"""<section
@@ -343,10 +349,11 @@ class SummaryTemplateFiller():
     <section style="display: inline-block;width: 100%;vertical-align: top;overflow-x: auto;box-sizing: border-box;">
       <section style="overflow: hidden;width: 500%;max-width: 500% !important;box-sizing: border-box;">"""
 
-                for i, (_, img_scr) in enumerate(img_name2scr_dict.items()):
+                for image in images:
                     # 将图片上传到微信公众号永久素材号
-                    img_upload_result = self.img_uploader.upload_specific_file(img_scr)
+                    img_upload_result = self.img_uploader.upload_specific_file(image['local_path'])
                     img_scr = img_upload_result.get('url', '')
+                    image['upload_url'] = img_scr
                     if img_scr:
                         solution_img_html += f"""<section style="display: inline-block;width: 20%;vertical-align: middle;box-sizing: border-box;">
           <section style="text-align: center;margin: 0px;line-height: 0;position: static;box-sizing: border-box;">
@@ -360,6 +367,8 @@ class SummaryTemplateFiller():
             </section>
           </section>
         </section>"""
+                # 上传后的素材URL写回产物库
+                self.store.put_media('discussion', media_owner, images)
                 solution_img_html += f"""      </section>
     </section>
   </section>
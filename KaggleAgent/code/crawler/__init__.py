@@ -1,4 +1,16 @@
-from .comp_list_crawler import CompListCrawler
-from .comp_overview_crawler import CompOverviewCrawler
-from .comp_dis_list_crawler import CompDisListCrawler
-from .comp_dis_details_crawler import CompDisDetailsCrawler
\ No newline at end of file
+# 各爬虫依赖selenium等较重的库，首次访问对应类时才导入子模块
+_LAZY_IMPORTS = {
+    'CompListCrawler': '.comp_list_crawler',
+    'CompOverviewCrawler': '.comp_overview_crawler',
+    'CompDisListCrawler': '.comp_dis_list_crawler',
+    'CompDisDetailsCrawler': '.comp_dis_details_crawler',
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        import importlib
+        return getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,8 +5,16 @@ CreateDay: 20250602
 Author: HongfengAi
 History:
 20250602    HongfengAi  第一版
+20261018    HongfengAi  固定等待改为页面就绪等待
+20261018    HongfengAi  新增多worker并发爬取
+20261018    HongfengAi  正文内容改为一次性导出后离线转换markdown
+20261018    HongfengAi  讨论帖排名、正文路径和图片写入产物库，不再单独保存img_name2scr_dict.json
+20261018    HongfengAi  parse_pages区分跳过（空字符串）和爬取失败（None）
+20261018    HongfengAi  新增compare_extract_modes，对比一次性导出与逐元素WebDriver两种方式的差异
+20261018    HongfengAi  并发数受Kaggle访问上限限制时打印实际并发数
 """
 import re
+import copy
 import json
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -19,29 +27,105 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning) # 禁用SSL
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 sys.path.append("D:/KaggleAgent/code")
-from crawler.crawler_utils import open_browser
+from crawler.crawler_utils import get_browser_pool, wait_page_ready, get_host_throttle, run_workers
 from configs import COMP_REVIEW_ROOT_PATH, USER_AGENT
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import safe_title_func
+from http_client import get_http_client
+from artifact_store import get_artifact_store
+
+
+# 按文档顺序导出内容区内需要转换的子元素，字段与CompDisDetailsCrawler.describe_element一致；
+# img的src取解析后的绝对地址（与get_attribute('src')一致）。
+# 注意：文本取自innerText，与WebDriver的element.text（W3C可见文本算法）并不完全相同，
+# 空白折叠、隐藏节点、pre/td中的<br>处理可能有差异，可用compare_extract_modes在实际讨论帖上对比
+SNAPSHOT_CONTENT_SCRIPT = """
+const root = arguments[0];
+const pick = el => ({html: el.innerHTML, text: el.innerText});
+const nodes = [];
+for (const el of root.querySelectorAll('*')) {
+    const tag = el.tagName.toLowerCase();
+    if (['p', 'h1', 'h2', 'h3', 'blockquote', 'pre'].includes(tag)) {
+        nodes.push(Object.assign({tag: tag}, pick(el)));
+    } else if (tag === 'ul' || tag === 'ol') {
+        nodes.push({tag: tag, items: Array.from(el.getElementsByTagName('li')).map(pick)});
+    } else if (tag === 'table') {
+        nodes.push({
+            tag: tag,
+            headers: Array.from(el.getElementsByTagName('th')).map(th => th.innerText),
+            rows: Array.from(el.getElementsByTagName('tr')).map(
+                tr => Array.from(tr.getElementsByTagName('td')).map(td => td.innerText))
+        });
+    } else if (tag === 'img') {
+        nodes.push({tag: tag, alt: el.getAttribute('alt'),
+                    src: el.getAttribute('src') === null ? null : el.src});
+    }
+}
+return nodes;
+"""
 
 
 class CompDisDetailsCrawler():
-    def __init__(self):
-        pass
+    def __init__(self, bulk_extract=True):
+        self.browser = None
+        self.wait = None
+        # True: 用一次execute_script导出内容区再离线转换；False: 逐元素调用WebDriver（旧方式）
+        self.bulk_extract = bulk_extract
         
     def open_browser(self):
-        self.browser, self.wait = open_browser()   
+        """从浏览器池租用浏览器"""
+        self.browser, self.wait = get_browser_pool().acquire()
+
+    def close_browser(self, broken=False):
+        """将浏览器归还浏览器池，broken=True表示浏览器出错需重建"""
+        if self.browser:
+            get_browser_pool().release(self.browser, broken=broken)
+            self.browser = None
+            self.wait = None
     
     def parse_page(self, url):
         self.url = url
-        # 打开模拟浏览器
+        # 从浏览器池租用浏览器（复用已启动的Chrome）
         self.open_browser()
+        try:
+            full_markdown = self.parse_opened_page()
+        except Exception:
+            self.close_browser(broken=True)
+            raise
+        # 归还浏览器
+        self.close_browser()
+        return full_markdown
+
+    def parse_pages(self, urls, workers=1):
+        """
+        爬取多个讨论帖，每个worker使用独立的浏览器，每个讨论帖爬完即保存
+
+        Args:
+            urls: 讨论帖链接列表
+            workers: 并发爬取的worker数，1表示逐个爬取
+        Returns:
+            list: 与urls顺序一致的markdown内容，无排名或排名过低而跳过的为空字符串，爬取失败的为None
+        """
+        def crawl_one(i, url):
+            # 每个worker使用独立的爬虫副本，浏览器互不干扰
+            worker = copy.copy(self)
+            worker.browser = None
+            worker.wait = None
+            # 遵守Kaggle站点的访问频率限制
+            with get_host_throttle().slot(url):
+                full_markdown = worker.parse_page(url)
+            return full_markdown if full_markdown is not None else ""
+
+        return run_workers(urls, crawl_one, workers=workers, url_of=lambda url: url)
+
+    def parse_opened_page(self):
+        """在已租用的浏览器中爬取self.url对应的讨论帖"""
         # 进入点击进入Competitions详细列表网页
         self.browser.get(self.url)
-        time.sleep(8)  # 等待页面加载
-        # 下拉到最低，保证页面完整加载
-        self.browser.execute_script("window.scrollTo(0, document.body.scrollHeight)")
-        time.sleep(4)  # 等待页面加载
+        # 等待讨论帖标题出现并下拉直到页面高度稳定，保证页面完整加载
+        wait_page_ready(self.browser, self.wait, "kaggle",
+                        ready_locator=(By.XPATH, '//*[@id="site-content"]/div[2]/div/div/div[6]/div/div/div[1]/div[1]/h3'),
+                        scroll=True, label="discussion详情")
 
         # 提取比赛标题
         # comp_title = self.browser.find_element(By.XPATH, '//*[@id="site-content"]/div[2]/div/div/div[2]/div[2]/div[1]/h1').text
@@ -57,15 +141,13 @@ class CompDisDetailsCrawler():
         # 若没有排名，超级极大概率不是高分方案，可以直接跳过爬取
         if author_rank == "未知":
             print(f"讨论帖：{title} 不存在排名，已跳过。")
-            self.browser.quit()
             return None
         
         author_rank_no = re.search(r'(\d+)(?:TH|RD|ST|ND)', author_rank)
         if author_rank_no:
-            author_rank_no = author_rank_no.group(1)
-            if int(author_rank_no) > 100:
+            author_rank_no = int(author_rank_no.group(1))
+            if author_rank_no > 100:
                 print(f"讨论帖：{title} 排名{author_rank_no} > 100，已跳过。")
-                self.browser.quit()
                 return None
         
         # 提取主要内容
@@ -102,34 +184,112 @@ class CompDisDetailsCrawler():
             f.write(full_markdown)
             
         print(f'内容已保存到: {file_path}')
-        self.browser.quit()
+
+        # 记录到产物库，TOP Solution阶段按排名直接查询，无需遍历目录解析markdown
+        get_artifact_store().put_discussion_detail(comp_safe_title, self.url, dis_safe_title,
+                                                   author_rank_no, file_path)
         return full_markdown
             
             
+    def snapshot_content(self, element):
+        """
+        用一次execute_script导出内容区内所有需要转换的子元素（按文档顺序），
+        避免对每个子元素分别调用tag_name/get_attribute/find_elements产生大量WebDriver往返
+
+        Returns:
+            list: 每个子元素的描述 {'tag', 'html', 'text', 'items', 'headers', 'rows', 'alt', 'src'}
+        """
+        return self.browser.execute_script(SNAPSHOT_CONTENT_SCRIPT, element)
+
+    def describe_element(self, child):
+        """逐元素调用WebDriver获取子元素描述（与SNAPSHOT_CONTENT_SCRIPT的输出格式一致）"""
+        tag_name = child.tag_name
+        node = {'tag': tag_name}
+        if tag_name in ('p', 'h1', 'h2', 'h3', 'blockquote', 'pre'):
+            node['html'] = child.get_attribute('innerHTML')
+            node['text'] = child.text
+        elif tag_name in ('ul', 'ol'):
+            node['items'] = [{'html': item.get_attribute('innerHTML'), 'text': item.text}
+                             for item in child.find_elements(By.TAG_NAME, 'li')]
+        elif tag_name == 'table':
+            node['headers'] = [h.text for h in child.find_elements(By.TAG_NAME, 'th')]
+            node['rows'] = [[cell.text for cell in row.find_elements(By.TAG_NAME, 'td')]
+                            for row in child.find_elements(By.TAG_NAME, 'tr')]
+        elif tag_name == 'img':
+            node['alt'] = child.get_attribute('alt')
+            node['src'] = child.get_attribute('src')
+        return node
+
+    def compare_extract_modes(self, url):
+        """
+        在同一页面上分别用一次性导出（snapshot_content）和逐元素WebDriver（describe_element）获取子元素描述，
+        打印字段不一致的元素，用于核对bulk_extract=True的输出与旧方式的差异（不下载图片、不保存文件）
+
+        Returns:
+            list: 不一致的元素 [(序号, 标签, {字段: (一次性导出的值, 逐元素的值)})]
+        """
+        self.url = url
+        self.open_browser()
+        try:
+            self.browser.get(url)
+            wait_page_ready(self.browser, self.wait, "kaggle",
+                            ready_locator=(By.XPATH, '//*[@id="site-content"]/div[2]/div/div/div[6]/div/div/div[1]/div[1]/h3'),
+                            scroll=True, label="discussion详情对比")
+            content_div = self.browser.find_element(By.XPATH, '//*[@id="site-content"]/div[2]/div/div/div[6]/div/div/div[1]/div[1]/div[3]/div/div')
+            bulk_nodes = self.snapshot_content(content_div)
+            driver_nodes = [self.describe_element(child) for child in content_div.find_elements(By.XPATH, './/*')]
+        except Exception:
+            self.close_browser(broken=True)
+            raise
+        self.close_browser()
+
+        # 逐元素方式会包含不参与转换的标签（只有tag字段），对比前去掉
+        driver_nodes = [node for node in driver_nodes if len(node) > 1]
+        if len(bulk_nodes) != len(driver_nodes):
+            print(f"⚠️ 元素数量不一致: 一次性导出 {len(bulk_nodes)}，逐元素 {len(driver_nodes)}")
+
+        diffs = []
+        for i, (bulk_node, driver_node) in enumerate(zip(bulk_nodes, driver_nodes)):
+            fields = {key: (bulk_node.get(key), driver_node.get(key))
+                      for key in set(bulk_node) | set(driver_node) if bulk_node.get(key) != driver_node.get(key)}
+            if fields:
+                diffs.append((i, bulk_node['tag'], fields))
+                print(f"第{i}个元素 <{bulk_node['tag']}> 不一致: {fields}")
+        print(f"对比完成: {url}，共 {len(bulk_nodes)} 个元素，{len(diffs)} 个不一致")
+        return diffs
+
     def convert_to_markdown(self, element, comp_safe_title, dis_safe_title):
         """将HTML元素转换为markdown格式"""
+        if self.bulk_extract:
+            nodes = self.snapshot_content(element)
+        else:
+            nodes = [self.describe_element(child) for child in element.find_elements(By.XPATH, './/*')]
+        return self.convert_nodes_to_markdown(nodes, comp_safe_title, dis_safe_title)
+
+    def convert_nodes_to_markdown(self, nodes, comp_safe_title, dis_safe_title):
+        """将子元素描述列表离线转换为markdown格式（不再访问浏览器）"""
         markdown = ""
         img_no = 1
-        img_name2scr_dict = {}
+        images = []
 
         # 处理所有子元素
-        for child in element.find_elements(By.XPATH, './/*'):
-            tag_name = child.tag_name
+        for child in nodes:
+            tag_name = child['tag']
             
             if tag_name == 'p':
                 # 处理段落，包括段落内的链接
-                paragraph_text = self.process_element_with_links(child)
+                paragraph_text = self.process_html_with_links(child['html'], child['text'])
                 if paragraph_text.strip():
                     markdown += paragraph_text + "\n\n"
                 
             elif tag_name == 'h1':
-                heading_text = self.process_element_with_links(child)
+                heading_text = self.process_html_with_links(child['html'], child['text'])
                 markdown += f"# {heading_text}\n\n"
             elif tag_name == 'h2':
-                heading_text = self.process_element_with_links(child)
+                heading_text = self.process_html_with_links(child['html'], child['text'])
                 markdown += f"## {heading_text}\n\n"
             elif tag_name == 'h3':
-                heading_text = self.process_element_with_links(child)
+                heading_text = self.process_html_with_links(child['html'], child['text'])
                 markdown += f"### {heading_text}\n\n"
             
             # elif tag_name == 'a':
@@ -145,44 +305,43 @@ class CompDisDetailsCrawler():
             
             elif tag_name == 'ul':
                 # 处理无序列表
-                items = child.find_elements(By.TAG_NAME, 'li')
+                items = child['items']
                 for item in items:
-                    item_text = self.process_element_with_links(item)
+                    item_text = self.process_html_with_links(item['html'], item['text'])
                     markdown += f"- {item_text}\n"
                 markdown += "\n"
                 
             elif tag_name == 'ol':
                 # 处理有序列表
-                items = child.find_elements(By.TAG_NAME, 'li')
+                items = child['items']
                 for i, item in enumerate(items, 1):
-                    item_text = self.process_element_with_links(item)
+                    item_text = self.process_html_with_links(item['html'], item['text'])
                     markdown += f"{i}. {item_text}\n"
                 markdown += "\n"
                 
             elif tag_name == 'table':
                 # 处理表格
                 # 获取表头
-                headers = child.find_elements(By.TAG_NAME, 'th')
+                headers = child['headers']
                 # markdown += '<table>\n'
                 if headers:
-                    header_row = "| " + " | ".join([h.text for h in headers]) + " |"
+                    header_row = "| " + " | ".join(headers) + " |"
                     separator = "| " + " | ".join(["---" for _ in headers]) + " |"
                     markdown += header_row + "\n" + separator + "\n"
                 
                 # 获取表格内容
-                rows = child.find_elements(By.TAG_NAME, 'tr')
-                for row in rows:
-                    cells = row.find_elements(By.TAG_NAME, 'td')
+                rows = child['rows']
+                for cells in rows:
                     if cells:
-                        row_text = "| " + " | ".join([cell.text for cell in cells]) + " |"
+                        row_text = "| " + " | ".join(cells) + " |"
                         markdown += row_text + "\n"
                 # markdown += '\n</table>'
                 markdown += "\n"
                 
             elif tag_name == 'img':
                 # 处理图片
-                alt_text = child.get_attribute('alt')
-                src = child.get_attribute('src')
+                alt_text = child['alt']
+                src = child['src']
                 # 创建图片保存目录到对应的title文件夹下
                 image_dir = f'{COMP_REVIEW_ROOT_PATH}/{comp_safe_title}/discussion_details/{dis_safe_title}/images'
                 if not os.path.exists(image_dir):
@@ -191,20 +350,15 @@ class CompDisDetailsCrawler():
                 # 完整的保存路径
                 file_name = f"image_{img_no}.png"  # 默认使用png格式
                 save_path = os.path.join(image_dir, file_name)
-                img_name2scr_dict[file_name] = save_path
+                images.append({'local_path': save_path, 'source_url': src})
 
                 try:
-                    # 使用requests直接下载图片内容到指定的images文件夹
-                    # 禁用代理以避免代理连接问题
-                    proxies = {
-                        'http': 'http://127.0.0.1:7890',
-                        'https': 'http://127.0.0.1:7890'
-                    }
-                    response = requests.get(
+                    # 使用共享HTTP客户端下载图片内容到指定的images文件夹（走代理）
+                    response = get_http_client().get(
                         src, 
+                        proxy=True,  # 使用代理
                         headers={'User-Agent': USER_AGENT}, 
                         timeout=30,  # 增加超时时间
-                        proxies=proxies,  # 使用代理
                         verify=False  # 忽略SSL证书验证
                     )
                     if response.status_code == 200:
@@ -225,12 +379,12 @@ class CompDisDetailsCrawler():
                 
             elif tag_name == 'blockquote':
                 # 处理引用
-                quote_text = self.process_element_with_links(child)
+                quote_text = self.process_html_with_links(child['html'], child['text'])
                 markdown += f"> {quote_text}\n\n"
                 
             elif tag_name == 'pre':
                 # 处理代码块
-                code_text = child.text.strip()
+                code_text = child['text'].strip()
                 if code_text:
                     markdown += f"```\n{code_text}\n```\n\n"
                 
@@ -239,20 +393,26 @@ class CompDisDetailsCrawler():
             #     code_text = child.text.strip()
             #     if code_text:
             #         markdown += f"`{code_text}`\n\n"
-        # 保存图片来源
-        img_name2scr_dict_file_path = f'{COMP_REVIEW_ROOT_PATH}/{comp_safe_title}/discussion_details/{dis_safe_title}/img_name2scr_dict.json'
-        with open(img_name2scr_dict_file_path, 'w', encoding='utf-8') as f:
-            json.dump(img_name2scr_dict, f, ensure_ascii=False, indent=4)
+        # 图片来源记录到产物库
+        get_artifact_store().put_media('discussion', f'{comp_safe_title}/{dis_safe_title}', images)
 
         return markdown.strip()
 
     def process_element_with_links(self, element):
         """处理包含链接和代码的元素，将链接和代码转换为markdown格式"""
+        return self.process_html_with_links(element.get_attribute('innerHTML'), element.text)
+
+    def process_html_with_links(self, html_content, text):
+        """
+        将元素的innerHTML中的链接和代码转换为markdown格式
+
+        Args:
+            html_content: 元素的innerHTML
+            text: 元素的可见文本，innerHTML为空或处理出错时使用
+        """
         try:
-            # 获取元素的HTML内容
-            html_content = element.get_attribute('innerHTML')
             if not html_content:
-                return element.text or ""
+                return text or ""
             
             # 使用正则表达式查找链接
             import re
@@ -290,7 +450,7 @@ class CompDisDetailsCrawler():
             
         except Exception as e:
             print(f"处理元素链接和代码时出错: {e}")
-            return element.text or ""
+            return text or ""
 
     def extract_author_and_time(self):
         """智能提取作者排名和发布时间"""
@@ -334,7 +494,16 @@ class CompDisDetailsCrawler():
 
 if __name__ == '__main__':
     # 执行爬虫并显示结果
+    import argparse
+    parser = argparse.ArgumentParser(description="爬取讨论帖详情")
+    parser.add_argument("--url", type=str, default="https://www.kaggle.com/competitions/image-matching-challenge-2025/discussion/583401", help="讨论帖URL")
+    parser.add_argument("--compare", action="store_true", help="只对比一次性导出与逐元素两种方式的差异，不保存")
+    args = parser.parse_args()
+
     clspider = CompDisDetailsCrawler()
-    result = clspider.parse_page(url = "https://www.kaggle.com/competitions/image-matching-challenge-2025/discussion/583401")  # 替换为实际的讨论帖URL
-    print(f'爬取完成')
+    if args.compare:
+        clspider.compare_extract_modes(args.url)
+    else:
+        result = clspider.parse_page(url=args.url)
+        print(f'爬取完成')
 
@@ -5,6 +5,9 @@ CreateDay: 20250525
 Author: HongfengAi
 History:
 20250525    HongfengAi  第一版
+20261018    HongfengAi  固定等待改为页面就绪等待
+20261018    HongfengAi  讨论帖列表写入产物库，JSON由产物库导出
+20261018    HongfengAi  页面爬取出错时也归还浏览器（标记为损坏），避免浏览器池租约泄漏
 """
 import json
 import time
@@ -12,23 +15,57 @@ from selenium.webdriver.common.by import By
 
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from crawler.crawler_utils import open_browser
+from crawler.crawler_utils import get_browser_pool, wait_page_ready
 from configs import COMP_REVIEW_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import safe_title_func
+from artifact_store import get_artifact_store
 
 
 class CompDisListCrawler():
     def __init__(self):
-        pass
+        self.browser = None
+        self.wait = None
         
     def open_browser(self):
-        self.browser, self.wait = open_browser()
+        """从浏览器池租用浏览器"""
+        self.browser, self.wait = get_browser_pool().acquire()
+
+    def close_browser(self, broken=False):
+        """将浏览器归还浏览器池，broken=True表示浏览器出错需重建"""
+        if self.browser:
+            get_browser_pool().release(self.browser, broken=broken)
+            self.browser = None
+            self.wait = None
        
     def parse_page(self, url, page_limit=5):
         self.url = url + "/discussion?sort=published"
-        # 打开模拟浏览器
+        # 从浏览器池租用浏览器，出错时标记为损坏后归还，避免租约泄漏
         self.open_browser()
+        try:
+            title, topics = self.parse_opened_pages(page_limit)
+        except Exception:
+            self.close_browser(broken=True)
+            raise
+        # 归还浏览器
+        self.close_browser()
+        
+        # 将结果保存为JSON文件到比赛名称文件夹下
+        if len(topics) > 0:
+            safe_title = safe_title_func(title)
+            folder_path = f'{COMP_REVIEW_ROOT_PATH}/{safe_title}'
+
+            # 写入产物库（保留已爬取详情的排名信息），并导出旧版JSON到对应文件夹
+            store = get_artifact_store()
+            store.put_discussions(safe_title, topics)
+            save_path = store.export_json(topics, f'{folder_path}/comp_dis_list.json', indent=4)
+            print(f'数据已保存到 {save_path}，共获取 {len(topics)} 条讨论')
+        
+        return topics
+
+    def parse_opened_pages(self, page_limit):
+        """在已租用的浏览器中逐页爬取讨论帖列表，返回(比赛标题, 讨论帖列表)"""
+        title = None
         topics = []
         page_num = 1
         
@@ -36,11 +73,8 @@ class CompDisListCrawler():
             print(f"正在爬取第 {page_num} 页...")
             # 进入点击进入Competitions详细列表网页
             self.browser.get(f"{self.url}&page={page_num}")
-            time.sleep(5)  # 等待页面加载
-
-            # 下拉到最低，保证页面完整加载
-            self.browser.execute_script("window.scrollTo(0, document.body.scrollHeight)")
-            time.sleep(3)  # 等待页面加载
+            # 等待网络空闲并下拉直到页面高度稳定（空页面没有列表元素，因此不等待特定元素）
+            wait_page_ready(self.browser, self.wait, "kaggle", scroll=True, label=f"discussion列表第{page_num}页")
             
             # 若该页没东西直接跳过
             try:
@@ -97,24 +131,8 @@ class CompDisListCrawler():
                         continue
             
             page_num += 1
-        
-        # 关闭浏览器
-        self.browser.quit()
-        
-        # 将结果保存为JSON文件到比赛名称文件夹下
-        if len(topics) > 0:
-            safe_title = safe_title_func(title)
-            folder_path = f'{COMP_REVIEW_ROOT_PATH}/{safe_title}'
-            os.makedirs(folder_path, exist_ok=True)
-            
-            # 保存JSON文件到对应文件夹
-            save_path = f'{folder_path}/comp_dis_list.json'
-            
-            with open(save_path, 'w', encoding='utf-8') as f:
-                json.dump(topics, f, ensure_ascii=False, indent=4)
-            print(f'数据已保存到 {save_path}，共获取 {len(topics)} 条讨论')
-        
-        return topics
+
+        return title, topics
     
 
 if __name__ == '__main__':
@@ -5,6 +5,9 @@ CreateDay: 20250525
 Author: HongfengAi
 History:
 20250525    HongfengAi  第一版
+20261018    HongfengAi  固定等待改为页面就绪等待
+20261018    HongfengAi  比赛列表写入产物库，JSON由产物库导出
+20261018    HongfengAi  页面爬取出错时也归还浏览器（标记为损坏），避免浏览器池租约泄漏
 """
 import selenium
 from selenium.webdriver.support import expected_conditions as EC
@@ -17,22 +20,53 @@ import json
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import OUTPUT_ROOT_PATH
-from crawler.crawler_utils import open_browser
+from crawler.crawler_utils import get_browser_pool, wait_page_ready
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from artifact_store import get_artifact_store, export_legacy_json
 
 
 class CompListCrawler():
     def __init__(self):
         self.url = "https://www.kaggle.com/competitions"
+        self.browser = None
+        self.wait = None
         
     def open_browser(self):
-        """打开浏览器"""
-        self.browser, self.wait = open_browser()
+        """从浏览器池租用浏览器"""
+        self.browser, self.wait = get_browser_pool().acquire()
+
+    def close_browser(self, broken=False):
+        """将浏览器归还浏览器池，broken=True表示浏览器出错需重建"""
+        if self.browser:
+            get_browser_pool().release(self.browser, broken=broken)
+            self.browser = None
+            self.wait = None
 
     def parse_page(self, page_limit=10):
         """解析页面"""
         self.page_limit = int(page_limit)  # 确保page_limit是整数类型
-        # 打开模拟浏览器
+        # 从浏览器池租用浏览器，出错时标记为损坏后归还，避免租约泄漏
         self.open_browser()
+        try:
+            all_competitions = self.parse_opened_pages()
+        except Exception:
+            self.close_browser(broken=True)
+            raise
+        # 归还浏览器
+        self.close_browser()
+
+        # 将结果保存为JSON文件
+        if all_competitions:
+            # 写入产物库，并导出旧版JSON（kaggle_competitions_list.json）
+            store = get_artifact_store()
+            store.put_competitions(all_competitions)
+            json_file_path = export_legacy_json(store=store)[0]
+            print(f'数据已保存到 {json_file_path}，共 {len(all_competitions)} 条记录')
+        
+        return all_competitions
+
+    def parse_opened_pages(self):
+        """在已租用的浏览器中逐页爬取比赛列表"""
         # 进入点击进入Competitions详细列表网页
         self.browser.get(self.url)
         button = self.browser.find_element(By.XPATH,
@@ -46,9 +80,10 @@ class CompListCrawler():
         
         while True:
             try:
-                # 下拉到最低，保证页面完整加载
-                self.browser.execute_script("window.scrollTo(0, document.body.scrollHeight)")
-                time.sleep(5)  # 等待页面加载
+                # 等待比赛列表出现并下拉直到页面高度稳定，保证页面完整加载
+                wait_page_ready(self.browser, self.wait, "kaggle",
+                                ready_locator=(By.XPATH, '//*[@id="site-content"]/div[2]/div/div[5]/div/div/div/ul[1]/li/div'),
+                                scroll=True, label=f"比赛列表第{page}页")
 
                 competitions = self.wait.until(EC.presence_of_all_elements_located(
                     (By.XPATH, '//*[@id="site-content"]/div[2]/div/div[5]/div/div/div/ul[1]/li/div')))
@@ -113,7 +148,7 @@ class CompListCrawler():
                     if page > self.page_limit:
                         print(f'已达到页数爬取上限 {self.page_limit}')
                         break
-                    time.sleep(5)  # 等待新页面加载
+                    # 新页面的就绪等待在下一轮循环开头进行
                 except Exception as e:
                     print('没有找到下一页按钮或已到达最后一页, e:', e)
                     break
@@ -132,18 +167,7 @@ class CompListCrawler():
             except Exception as e:
                 print(f'发生错误: {e}')
                 break
-        
-        # 将结果保存为JSON文件
-        if all_competitions:
-            # 保存为JSON格式
-            json_file_path = os.path.join(OUTPUT_ROOT_PATH, 'kaggle_competitions_list.json')
-            with open(json_file_path, 'w', encoding='utf-8') as f:
-                json.dump(all_competitions, f, ensure_ascii=False, indent=4)
-            print(f'数据已保存到 {json_file_path}，共 {len(all_competitions)} 条记录')
-            
-        # 关闭浏览器
-        self.browser.quit()
-        
+
         return all_competitions
 
 
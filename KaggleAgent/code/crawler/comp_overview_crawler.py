@@ -5,27 +5,42 @@ CreateDay: 20250525
 Author: HongfengAi
 History:
 20250525    HongfengAi  第一版
+20261018    HongfengAi  固定等待改为页面就绪等待
+20261018    HongfengAi  图片下载和上传改为后台并发
+20261018    HongfengAi  页面爬取出错时也归还浏览器（标记为损坏），避免浏览器池租约泄漏
 """
 import json
 import time
 import selenium
+from concurrent.futures import Future
 from selenium.webdriver.common.by import By
 import requests
 
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import COMP_EXPRESS_ROOT_PATH
-from crawler.crawler_utils import open_browser
+from crawler.crawler_utils import get_browser_pool, wait_page_ready
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import safe_title_func, set_proxy, unset_proxy
+from utils import safe_title_func
+from wechat_utils.media_pipeline import get_media_pipeline
 from wechat_utils.upload_material import WeChatPermanentMaterialUploader
 
 class CompOverviewCrawler():
     def __init__(self):
         self.img_uploader = WeChatPermanentMaterialUploader()
+        self.browser = None
+        self.wait = None
         
     def open_browser(self):
-        self.browser, self.wait = open_browser()
+        """从浏览器池租用浏览器"""
+        self.browser, self.wait = get_browser_pool().acquire()
+
+    def close_browser(self, broken=False):
+        """将浏览器归还浏览器池，broken=True表示浏览器出错需重建"""
+        if self.browser:
+            get_browser_pool().release(self.browser, broken=broken)
+            self.browser = None
+            self.wait = None
 
     def parse_p_with_math(self, element):
         """处理包含数学公式的p标签，将数学公式用$包围并按顺序拼接"""
@@ -78,7 +93,6 @@ class CompOverviewCrawler():
         
         # 收集不同类型的元素
         content = []
-        img_count = 0
         for element in elements:
             try:
                 # 获取元素的标签名
@@ -97,39 +111,22 @@ class CompOverviewCrawler():
                         for img in img_elements:
                             img_src = img.get_attribute('src')
                         if img_src:
-                            # 将其下载到本地
-                            # 创建使用代理的session
-                            set_proxy()
-                            session = requests.Session()
-                            session.trust_env = True  # 禁用环境变量中的代理设置
-                            
-                            # 设置超时和重试
-                            session.mount('https://', requests.adapters.HTTPAdapter(max_retries=3))
-                            session.mount('http://', requests.adapters.HTTPAdapter(max_retries=3))
-                            
-                            # 下载图片
-                            img_name = f'{img_count}.png'
+                            # 提交到媒体流水线，后台下载到本地并上传到永久素材库；
+                            # 此处先放入Future占位，parse_page结束前替换为素材URL
+                            # 图片编号在整个页面内递增，避免不同板块的图片文件互相覆盖
+                            img_name = f'{self.img_count}.png'
                             img_path = f'{COMP_EXPRESS_ROOT_PATH}/{self.safe_title}/images'
-                            os.makedirs(img_path, exist_ok=True)
+                            self.img_count += 1
                             
                             # 添加请求头，模拟浏览器
                             headers = {
                                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
                             }
                             
-                            response = session.get(img_src, headers=headers, timeout=10)
-                            response.raise_for_status()  # 检查HTTP错误
-                            
-                            with open(f'{img_path}/{img_name}', 'wb') as f:
-                                f.write(response.content)
-                            img_count += 1
-                            unset_proxy()
-
-                            # 将其上传到永久素材库
-                            img_upload_result = self.img_uploader.upload_specific_file(f'{img_path}/{img_name}')
-                            if img_upload_result:
-                                img_url = img_upload_result['url']
-                                content.append({'type': 'image', 'content': img_url})
+                            img_future = get_media_pipeline().submit(img_src, f'{img_path}/{img_name}',
+                                                                     self.img_uploader.upload_specific_file,
+                                                                     keep_file=True, proxy=True, headers=headers)
+                            content.append({'type': 'image', 'content': img_future})
                     
                 # 有序列表
                 elif tag_name == 'ol':
@@ -168,18 +165,58 @@ class CompOverviewCrawler():
         
         return content      
     
+    @staticmethod
+    def resolve_images(content):
+        """等待媒体流水线完成，将图片占位替换为素材URL，上传失败的图片被移除"""
+        resolved = []
+        for item in content:
+            if item['type'] == 'image' and isinstance(item['content'], Future):
+                img_url = item['content'].result()
+                if not img_url:
+                    continue
+                item = {'type': 'image', 'content': img_url}
+            resolved.append(item)
+        return resolved
       
     def parse_page(self, url):
         self.url = url
-        # 打开模拟浏览器
+        self.img_count = 0
+        # 从浏览器池租用浏览器，出错时标记为损坏后归还，避免租约泄漏
         self.open_browser()
+        try:
+            comp_overview = self.parse_opened_page()
+        except Exception:
+            self.close_browser(broken=True)
+            raise
+        # 归还浏览器
+        self.close_browser()
+
+        # 浏览器归还后再等待图片下载/上传完成，按原顺序填回素材URL
+        for key in ('overview', 'description', 'evaluation', 'timeline', 'prize'):
+            if key in comp_overview:
+                comp_overview[key] = self.resolve_images(comp_overview[key])
+
+        # 将结果保存为JSON文件
+        if comp_overview:
+            save_path = f'{COMP_EXPRESS_ROOT_PATH}/{self.safe_title}'
+            os.makedirs(save_path, exist_ok=True)
+            save_fpath = f'{save_path}/comp_overview.json'
+            
+            with open(save_fpath, 'w', encoding='utf-8') as f:
+                json.dump(comp_overview, f, ensure_ascii=False, indent=4)
+            print(f'数据已保存到 {save_fpath}')
         
+        return comp_overview
+
+    def parse_opened_page(self):
+        """在已租用的浏览器中爬取self.url对应的比赛总览，返回未填回素材URL的结果"""
         # 进入点击进入Competitions详细列表网页
         self.browser.get(self.url)
         
-        # 下拉到最低，保证页面完整加载
-        self.browser.execute_script("window.scrollTo(0, document.body.scrollHeight)")
-        time.sleep(3)  # 等待页面加载   
+        # 等待比赛标题出现并下拉直到页面高度稳定，保证页面完整加载
+        wait_page_ready(self.browser, self.wait, "kaggle",
+                        ready_locator=(By.XPATH, '//*[@id="site-content"]/div[2]/div/div/div[2]/div[2]/div[1]/h1'),
+                        scroll=True, label="比赛总览")
              
         comp_overview = {}
         try:
@@ -264,20 +301,7 @@ class CompOverviewCrawler():
             
         except Exception as e:
             print(f'发生错误: {e}')
-        
-        # 将结果保存为JSON文件
-        if comp_overview:
-            save_path = f'{COMP_EXPRESS_ROOT_PATH}/{self.safe_title}'
-            os.makedirs(save_path, exist_ok=True)
-            save_fpath = f'{save_path}/comp_overview.json'
-            
-            with open(save_fpath, 'w', encoding='utf-8') as f:
-                json.dump(comp_overview, f, ensure_ascii=False, indent=4)
-            print(f'数据已保存到 {save_fpath}')
-        
-        # 关闭浏览器
-        self.browser.quit()
-        
+
         return comp_overview
     
 
@@ -0,0 +1,103 @@
+"""
+Function: 共享HTTP客户端
+所有下载/上传请求共用连接池（keep-alive），按host限制连接数，失败时按指数退避重试；
+需要代理的请求通过proxy=True显式走PROXY_URL，不再修改os.environ
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs import USER_AGENT, PROXY_URL
+
+
+class HttpClient:
+    """
+    共享HTTP客户端，内部维护直连和代理两个Session
+    - max_per_host: 每个host最多同时占用的连接数，连接用完时请求阻塞等待
+    - retries/backoff_factor: 连接错误、429和5xx时的重试次数与退避系数（只对GET/HEAD等幂等请求重试）
+    """
+
+    def __init__(self,
+                 max_per_host: int = 8,
+                 max_hosts: int = 32,
+                 retries: int = 3,
+                 backoff_factor: float = 0.5,
+                 timeout: float = 30):
+        self.max_per_host = max_per_host
+        self.max_hosts = max_hosts
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self._direct = self._build_session(proxy_url=None)
+        self._proxied = self._build_session(proxy_url=PROXY_URL)
+
+    def _build_session(self, proxy_url: str = None) -> requests.Session:
+        session = requests.Session()
+        # 代理只由proxy参数决定，不读取环境变量
+        session.trust_env = False
+        session.headers.update({'User-Agent': USER_AGENT})
+        if proxy_url:
+            session.proxies = {'http': proxy_url, 'https': proxy_url}
+
+        retry = Retry(total=self.retries,
+                      connect=self.retries,
+                      read=self.retries,
+                      backoff_factor=self.backoff_factor,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      respect_retry_after_header=True,
+                      raise_on_status=False)
+        # pool_block=True：同一host的连接数达到max_per_host后阻塞等待，起到按host限流的作用
+        adapter = HTTPAdapter(pool_connections=self.max_hosts,
+                              pool_maxsize=self.max_per_host,
+                              pool_block=True,
+                              max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def request(self, method: str, url: str, proxy: bool = False, **kwargs) -> requests.Response:
+        """
+        发送请求
+
+        Args:
+            method: GET/POST等
+            url: 请求地址
+            proxy: 是否通过PROXY_URL代理访问
+            **kwargs: 透传给requests，如headers、params、files、stream、verify
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        session = self._proxied if proxy and PROXY_URL else self._direct
+        return session.request(method, url, **kwargs)
+
+    def get(self, url: str, proxy: bool = False, **kwargs) -> requests.Response:
+        return self.request('GET', url, proxy=proxy, **kwargs)
+
+    def post(self, url: str, proxy: bool = False, **kwargs) -> requests.Response:
+        return self.request('POST', url, proxy=proxy, **kwargs)
+
+    def close(self):
+        self._direct.close()
+        self._proxied.close()
+
+
+_HTTP_CLIENT = None
+_HTTP_CLIENT_LOCK = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """获取进程内共享的HTTP客户端"""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        with _HTTP_CLIENT_LOCK:
+            if _HTTP_CLIENT is None:
+                _HTTP_CLIENT = HttpClient()
+    return _HTTP_CLIENT
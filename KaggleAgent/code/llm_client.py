@@ -0,0 +1,212 @@
+"""
+Function: 带调用指标的LLM客户端薄封装
+按调用点（如 paper_summarizer.translate_abstract）记录首token耗时（TTFT）、总耗时、prompt/completion token数和吞吐，
+每次运行写入一个JSONL指标文件，便于找出最耗token和最耗时的prompt
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+20261018    HongfengAi  命中缓存的调用不计入token用量和吞吐，单独记为缓存token
+"""
+import json
+import time
+import threading
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs import OUTPUT_ROOT_PATH, LLM_REPLAY_RECORD
+from utils import init_llm
+from llm_replay import get_replay_recorder
+
+
+# 每次运行一个指标文件
+LLM_METRICS_DIR = os.path.join(OUTPUT_ROOT_PATH, "llm_metrics")
+
+
+class LLMMetricsRecorder(BaseCallbackHandler):
+    """LangChain回调：流式模式下记录每次LLM调用的TTFT、耗时和token用量"""
+
+    def __init__(self, metrics_path: str = None):
+        run_tag = time.strftime("%Y%m%d_%H%M%S") + f"_{os.getpid()}"
+        self.metrics_path = metrics_path or os.path.join(LLM_METRICS_DIR, f"llm_metrics_{run_tag}.jsonl")
+        self.records = []
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, name: str = None, **kwargs):
+        invocation_params = kwargs.get('invocation_params') or {}
+        with self._lock:
+            self._runs[run_id] = {
+                'call_site': name or "unknown",
+                'model': invocation_params.get('model') or invocation_params.get('model_name', ""),
+                'start': time.perf_counter(),
+                'first_token': None,
+            }
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and run['first_token'] is None:
+            run['first_token'] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+
+        prompt_tokens, completion_tokens = self.extract_usage(response)
+        latency = time.perf_counter() - run['start']
+        ttft = run['first_token'] - run['start'] if run['first_token'] is not None else None
+        # 未收到任何流式token说明命中了LLM响应缓存：缓存里保存的是原始调用的用量，
+        # 本次没有消耗token，单独记为缓存token，不计入用量和吞吐
+        cached = run['first_token'] is None
+        cached_prompt_tokens, cached_completion_tokens = (prompt_tokens, completion_tokens) if cached else (0, 0)
+        if cached:
+            prompt_tokens = completion_tokens = 0
+        # 吞吐按首token之后的生成阶段计算
+        generation_time = latency - ttft if ttft is not None else latency
+        self.write_record({
+            'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'call_site': run['call_site'],
+            'model': run['model'],
+            'ttft': round(ttft, 3) if ttft is not None else None,
+            'latency': round(latency, 3),
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cached_prompt_tokens': cached_prompt_tokens,
+            'cached_completion_tokens': cached_completion_tokens,
+            'tokens_per_s': round(completion_tokens / generation_time, 1) if completion_tokens and generation_time > 0 else None,
+            'cached': cached,
+            'ok': True,
+        })
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        self.write_record({
+            'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'call_site': run['call_site'],
+            'model': run['model'],
+            'latency': round(time.perf_counter() - run['start'], 3),
+            'ok': False,
+            'error': str(error)[:200],
+        })
+
+    @staticmethod
+    def extract_usage(response):
+        """从LLMResult中取token用量（需init_llm开启stream_usage）"""
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+                if usage:
+                    prompt_tokens += usage.get('input_tokens', 0)
+                    completion_tokens += usage.get('output_tokens', 0)
+        if not prompt_tokens and not completion_tokens and response.llm_output:
+            token_usage = response.llm_output.get('token_usage') or {}
+            prompt_tokens = token_usage.get('prompt_tokens', 0)
+            completion_tokens = token_usage.get('completion_tokens', 0)
+        return prompt_tokens, completion_tokens
+
+    def write_record(self, record: dict):
+        with self._lock:
+            self.records.append(record)
+            try:
+                os.makedirs(os.path.dirname(self.metrics_path), exist_ok=True)
+                with open(self.metrics_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except Exception as e:
+                print(f"写入LLM指标失败: {e}")
+
+    def summary(self) -> dict:
+        """按调用点汇总：调用次数、总耗时、token数（不含命中缓存的调用）、平均TTFT"""
+        sites = {}
+        for record in self.records:
+            site = sites.setdefault(record['call_site'], {
+                'calls': 0, 'cached': 0, 'errors': 0, 'latency': 0.0,
+                'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0, 'ttft_list': []
+            })
+            site['calls'] += 1
+            site['latency'] += record['latency']
+            if not record['ok']:
+                site['errors'] += 1
+                continue
+            site['cached'] += int(record['cached'])
+            site['prompt_tokens'] += record['prompt_tokens']
+            site['completion_tokens'] += record['completion_tokens']
+            site['cached_tokens'] += record['cached_prompt_tokens'] + record['cached_completion_tokens']
+            if record['ttft'] is not None:
+                site['ttft_list'].append(record['ttft'])
+        for site in sites.values():
+            ttft_list = site.pop('ttft_list')
+            site['avg_ttft'] = round(sum(ttft_list) / len(ttft_list), 3) if ttft_list else None
+            site['latency'] = round(site['latency'], 3)
+        return sites
+
+
+_RECORDER = None
+_RECORDER_LOCK = threading.Lock()
+
+
+def get_llm_metrics_recorder() -> LLMMetricsRecorder:
+    """获取进程内共享的指标记录器（一次运行一个指标文件）"""
+    global _RECORDER
+    if _RECORDER is None:
+        with _RECORDER_LOCK:
+            if _RECORDER is None:
+                _RECORDER = LLMMetricsRecorder()
+    return _RECORDER
+
+
+class LLMClient:
+    """
+    LLM客户端薄封装，按调用点打标签并记录指标
+    Example:
+        client = LLMClient("paper_summarizer", temperature=0.15)
+        client.invoke(prompt, call_site="translate_abstract")
+    """
+
+    def __init__(self, component: str, **llm_kwargs):
+        """
+        Args:
+            component: 组件名，作为调用点的前缀
+            llm_kwargs: 透传给init_llm的参数
+        """
+        self.component = component
+        self.llm = init_llm(**llm_kwargs)
+        self.recorder = get_llm_metrics_recorder()
+
+    def for_site(self, call_site: str):
+        """返回绑定了调用点和指标回调的llm，可继续.bind()/传给invoke_structured"""
+        callbacks = [self.recorder]
+        if LLM_REPLAY_RECORD:
+            callbacks.append(get_replay_recorder())
+        return self.llm.with_config(run_name=f"{self.component}.{call_site}", callbacks=callbacks)
+
+    def invoke(self, prompt, call_site: str):
+        return self.for_site(call_site).invoke(prompt)
+
+    async def ainvoke(self, prompt, call_site: str):
+        return await self.for_site(call_site).ainvoke(prompt)
+
+    def batch(self, prompts: list, call_site: str, max_concurrency: int = None):
+        return self.for_site(call_site).batch(prompts, config={"max_concurrency": max_concurrency})
+
+
+def report_llm_metrics():
+    """打印本次运行各调用点的LLM指标汇总"""
+    if _RECORDER is None or not _RECORDER.records:
+        return
+    print(f"📊 LLM调用指标（明细见 {_RECORDER.metrics_path}）:")
+    sites = sorted(_RECORDER.summary().items(), key=lambda kv: kv[1]['latency'], reverse=True)
+    for call_site, site in sites:
+        avg_ttft = f"{site['avg_ttft']:.2f}s" if site['avg_ttft'] is not None else "-"
+        print(f"  {call_site}: {site['calls']}次（缓存{site['cached']}，失败{site['errors']}），"
+              f"总耗时 {site['latency']:.1f}s，平均TTFT {avg_ttft}，"
+              f"tokens {site['prompt_tokens']} + {site['completion_tokens']}（缓存节省 {site['cached_tokens']}）")
@@ -1,13 +1,13 @@
 import re
+import ast
 import os
 import json
-
-from langchain_openai import ChatOpenAI
+from urllib.parse import urlparse
 
 import sys
 # 添加项目根目录到系统路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from configs import OPENAI_API_KEY
+from configs import OPENAI_API_KEY, PROXY_URL, LLM_CACHE_ENABLED, LLM_BASE_URL
 
 
 def safe_title_func(title):
@@ -24,10 +24,15 @@ def safe_title_func(title):
 
 
 def set_proxy():
-    """设置proxy"""
-    os.environ["http_proxy"] = "http://127.0.0.1:7890"
-    os.environ["https_proxy"] = "http://127.0.0.1:7890"
-    os.environ["all_proxy"] = "socks5://127.0.0.1:7890"
+    """
+    设置proxy（修改进程环境变量，仅用于只能读取环境变量代理的第三方库，如HuggingFace模型下载）
+    HTTP请求请使用http_client.get_http_client()的proxy参数，LLM请求由init_llm显式配置代理
+    """
+    if not PROXY_URL:
+        return
+    os.environ["http_proxy"] = PROXY_URL
+    os.environ["https_proxy"] = PROXY_URL
+    os.environ["all_proxy"] = PROXY_URL.replace("http://", "socks5://")
 
 
 def unset_proxy():
@@ -42,21 +47,74 @@ def init_llm(model:str="gpt-4o",
              max_tokens:int=8192,
              streaming:bool=True,
              timeout:int=None,
-             max_retries:int=2):
-    """初始化llm"""
-    set_proxy()
+             max_retries:int=2,
+             use_cache:bool=LLM_CACHE_ENABLED,
+             cache_bypass:bool=False,
+             base_url:str=LLM_BASE_URL):
+    """
+    初始化llm（通过openai_proxy显式走代理，不修改环境变量）
+    use_cache: 是否使用持久化的LLM响应缓存
+    cache_bypass: 不读缓存、强制重新请求（新响应仍写入缓存）
+    base_url: OpenAI兼容服务地址，指向本机（如llm_replay回放服务）时不走代理
+    """
+    # langchain较重，首次初始化llm时才导入，不拖慢pipeline启动
+    from langchain_openai import ChatOpenAI
+    from llm_cache import LLMCache, get_llm_cache_store
+
+    local_service = bool(base_url) and urlparse(base_url).hostname in ("127.0.0.1", "localhost")
+    api_key = OPENAI_API_KEY
+    if local_service and not api_key:
+        # 本地服务不校验key，但客户端要求非空
+        api_key = "sk-local"
     llm = ChatOpenAI(
-        api_key=OPENAI_API_KEY,
+        api_key=api_key,
+        base_url=base_url,
+        openai_proxy=None if local_service else PROXY_URL,
         model=model,
         temperature=temperature,
         max_tokens=max_tokens,
         streaming=streaming,
+        # 流式输出时也返回token用量，供llm_client统计
+        stream_usage=True,
         timeout=timeout,
-        max_retries=max_retries
+        max_retries=max_retries,
+        cache=LLMCache(get_llm_cache_store(), model, temperature, bypass=cache_bypass) if use_cache else False
     )
     return llm
 
 
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的token数（中日韩字符按1个token计，其余按4个字符1个token计），用于打包prompt时控制预算
+    """
+    if not text:
+        return 0
+    cjk_count = len(re.findall(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]', text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+_TOKEN_ENCODERS = {}
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    统计文本的token数，安装了tiktoken时精确计算，否则退化为estimate_tokens的离线估算
+    """
+    if not text:
+        return 0
+    if model not in _TOKEN_ENCODERS:
+        try:
+            import tiktoken  # pip install tiktoken
+            _TOKEN_ENCODERS[model] = tiktoken.encoding_for_model(model)
+        except Exception:
+            # 未安装tiktoken或无法下载编码表时使用估算
+            _TOKEN_ENCODERS[model] = None
+    encoder = _TOKEN_ENCODERS[model]
+    if encoder is None:
+        return estimate_tokens(text)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
 def format_json_block(json_str: str) -> str:
     """
     处理JSON格式块，清理并格式化JSON字符串
@@ -71,6 +129,28 @@ def format_json_block(json_str: str) -> str:
     return json_str.strip()
 
 
+def parse_keywords(value) -> list:
+    """
+    解析关键词字段，不使用eval
+    支持列表、JSON列表字符串，以及历史数据中的Python列表字符串（如 "['图像识别', '目标检测']"）
+    """
+    if isinstance(value, (list, tuple)):
+        return [str(k) for k in value]
+    if not value:
+        return []
+    value = format_json_block(value)
+    try:
+        parsed = json.loads(value)
+    except json.JSONDecodeError:
+        try:
+            parsed = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return [k.strip(" '\"") for k in re.split(r'[,，、]', value.strip('[]')) if k.strip(" '\"")]
+    if isinstance(parsed, (list, tuple)):
+        return [str(k) for k in parsed]
+    return [str(parsed)]
+
+
 def parse_llm_json_output(llm_output: str):
     """解析LLM输出的JSON，支持多种格式"""
     try:
@@ -115,4 +195,14 @@ def parse_llm_json_output(llm_output: str):
         
     except Exception as e:
         print(f"Error parsing LLM JSON output: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def report_llm_stats():
+    """汇报本次运行的LLM缓存、结构化输出和调用指标；本次没有加载过对应模块（没有调用LLM）时跳过，避免为打印统计而导入langchain"""
+    for module_name, report_name in (('llm_cache', 'report_llm_cache_stats'),
+                                     ('structured_output', 'report_structured_stats'),
+                                     ('llm_client', 'report_llm_metrics')):
+        module = sys.modules.get(module_name)
+        if module is not None:
+            getattr(module, report_name)()
@@ -0,0 +1,89 @@
+"""
+Function: 图片下载+上传微信素材库的并发流水线
+解析页面时把图片URL提交到流水线，下载和上传在后台线程中并发进行，解析结束后按提交顺序取回素材URL
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+"""
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_client import get_http_client
+
+
+class MediaPipeline:
+    """
+    媒体流水线
+    - max_workers: 同时处理（下载+上传）的图片数
+    - max_uploads: 同时上传到微信的图片数，避免触发接口频率限制
+    """
+
+    def __init__(self, max_workers: int = 6, max_uploads: int = 3):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="media")
+        self._upload_slots = threading.Semaphore(max_uploads)
+
+    def _process(self, media_url: str, save_path: str, upload_fn, keep_file: bool, proxy: bool, headers: dict):
+        try:
+            response = get_http_client().get(media_url, proxy=proxy, headers=headers, timeout=60)
+            response.raise_for_status()
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            with open(save_path, 'wb') as f:
+                f.write(response.content)
+            print(f"图片下载成功: {save_path}")
+
+            with self._upload_slots:
+                result = upload_fn(save_path)
+            if result and result.get('success') and result.get('url'):
+                return result['url']
+            print(f"图片上传失败: {media_url}")
+            return None
+        except Exception as e:
+            print(f"图片下载/上传失败: {e}，URL: {media_url}")
+            return None
+        finally:
+            if not keep_file and os.path.exists(save_path):
+                os.remove(save_path)
+
+    def submit(self, media_url: str, save_path: str, upload_fn, keep_file: bool = True,
+               proxy: bool = False, headers: dict = None):
+        """
+        提交一张图片
+
+        Args:
+            media_url: 图片链接
+            save_path: 本地保存路径
+            upload_fn: 上传函数 upload_fn(local_path) -> dict，如 uploader.upload_specific_file
+            keep_file: 上传后是否保留本地文件
+            proxy: 下载时是否走代理
+            headers: 下载时的请求头
+        Returns:
+            Future: 结果为素材URL，失败时为None
+        """
+        return self._executor.submit(self._process, media_url, save_path, upload_fn, keep_file, proxy, headers)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def collect_media_results(futures: list) -> list:
+    """按提交顺序等待所有图片处理完成，返回成功的素材URL列表"""
+    return [url for url in (future.result() for future in futures) if url]
+
+
+_MEDIA_PIPELINE = None
+_MEDIA_PIPELINE_LOCK = threading.Lock()
+
+
+def get_media_pipeline() -> MediaPipeline:
+    """获取进程内共享的媒体流水线"""
+    global _MEDIA_PIPELINE
+    if _MEDIA_PIPELINE is None:
+        with _MEDIA_PIPELINE_LOCK:
+            if _MEDIA_PIPELINE is None:
+                _MEDIA_PIPELINE = MediaPipeline()
+    return _MEDIA_PIPELINE
@@ -16,6 +16,14 @@ import argparse
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import WECHAT_APP_ID, WECHAT_APP_SECRET
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_client import get_http_client
+from wechat_utils.access_token import get_access_token_provider, TOKEN_INVALID_ERRCODES
+from wechat_utils.upload_index import get_upload_index, file_sha256
+
+
+# 上传索引与素材库核对的间隔（秒）
+UPLOAD_INDEX_SYNC_INTERVAL = 24 * 3600
 
 
 class WeChatPermanentMaterialUploader:
@@ -24,35 +32,29 @@ class WeChatPermanentMaterialUploader:
     def __init__(self):
         self.appid = WECHAT_APP_ID
         self.secret = WECHAT_APP_SECRET
-        self.access_token = ""
-
-        token_result = self.get_access_token(self.appid, self.secret)
-        if token_result['success']:
-            self.access_token = token_result['access_token']
-
+        # access_token由进程内共享的提供者管理，首次访问时获取，过期前自动刷新
         if not self.access_token:
             print("警告: 未提供access_token，请确保已配置")
+
+        # 按文件内容去重的上传索引
+        self.upload_index = get_upload_index()
     
 
+    @property
+    def access_token(self) -> str:
+        """当前有效的access_token（共享缓存，不会每次都向微信申请新token）"""
+        return get_access_token_provider(self.appid, self.secret).get_token()
+
     def get_access_token(self, appid: str, appsecret: str) -> Dict[str, Any]:
         """
         获取微信公众号Access Token
         """
-        url = f"https://api.weixin.qq.com/cgi-bin/token?grant_type=client_credential&appid={appid}&secret={appsecret}"
-        
-        # 创建不使用代理的session
-        session = requests.Session()
-        session.trust_env = False  # 禁用环境变量中的代理设置
-        
-        response = session.get(url)
-        result = response.json()
-        print(result)
-        print(f"✅ Access Token获取成功")
-        print(f"⏰ 有效期: {result.get('expires_in', 0)}秒 ({result.get('expires_in', 0) // 60}分钟)")
+        provider = get_access_token_provider(appid, appsecret)
+        access_token = provider.get_token()
         return {
-            'success': True,
-            'access_token': result['access_token'],
-            'expires_in': result.get('expires_in', 7200)
+            'success': bool(access_token),
+            'access_token': access_token,
+            'expires_in': provider.expires_in()
         }
     
     def upload_permanent_image(self, image_path: str) -> Dict:
@@ -71,9 +73,8 @@ class WeChatPermanentMaterialUploader:
         # 构建请求URL
         url = f"https://api.weixin.qq.com/cgi-bin/material/add_material?access_token={self.access_token}&type=image"
         
-        # 创建不使用代理的session
-        session = requests.Session()
-        session.trust_env = False  # 禁用环境变量中的代理设置
+        # 共享HTTP客户端（连接复用，直连不走代理）
+        session = get_http_client()
         
         # 准备文件上传
         with open(image_path, 'rb') as f:
@@ -96,6 +97,9 @@ class WeChatPermanentMaterialUploader:
                         "file_name": Path(image_path).name,
                     }
                 else:
+                    if result.get('errcode') in TOKEN_INVALID_ERRCODES:
+                        # token失效（如被其他程序刷新），下次上传时重新获取
+                        get_access_token_provider(self.appid, self.secret).invalidate()
                     return {
                         "success": False,
                         "error": f"API错误: {result.get('errmsg', '未知错误')} (错误码: {result.get('errcode', 'N/A')})",
@@ -122,7 +126,13 @@ class WeChatPermanentMaterialUploader:
         print(f"准备上传文件: {file_path}")
         print("=" * 50)
 
-        result = self.upload_permanent_image(file_path)
+        # 相同内容的文件已上传过时直接复用，否则上传并记录到索引
+        file_hash = file_sha256(file_path) if Path(file_path).exists() else None
+        result = self.find_uploaded(file_hash, file_path, "image") if file_hash else None
+        if result is None:
+            result = self.upload_permanent_image(file_path)
+            if file_hash and result.get("success") and result.get("media_id"):
+                self.upload_index.put(file_hash, "image", result['media_id'], result.get('url', ''), result['file_name'])
         
         if result.get("success"):
             print(f"✅ 上传成功!")
@@ -142,6 +152,58 @@ class WeChatPermanentMaterialUploader:
         return result
     
 
+    def find_uploaded(self, file_hash: str, file_path: str, media_type: str):
+        """
+        查询相同内容的文件是否已上传过（每隔UPLOAD_INDEX_SYNC_INTERVAL秒先与素材库核对一次）
+
+        Returns:
+            dict or None: 与上传成功时格式一致的结果，未命中返回None
+        """
+        if self.upload_index.get(file_hash, media_type) is None:
+            return None
+        if self.upload_index.needs_sync(media_type, UPLOAD_INDEX_SYNC_INTERVAL):
+            self.sync_upload_index(media_type)
+
+        entry = self.upload_index.get(file_hash, media_type)
+        if entry is None:
+            return None
+        print(f"♻️ 相同内容的素材已上传过，直接复用: {entry['media_id']}")
+        return {
+            "success": True,
+            "media_id": entry['media_id'],
+            "url": entry.get('url', ''),
+            "file_path": file_path,
+            "file_name": Path(file_path).name,
+            "cached": True
+        }
+
+    def sync_upload_index(self, media_type: str = "image") -> int:
+        """
+        用batchget_material分页拉取素材库，移除上传索引中已在后台被删除的素材
+
+        Returns:
+            int: 移除的条目数
+        """
+        url = f"https://api.weixin.qq.com/cgi-bin/material/batchget_material?access_token={self.access_token}"
+        session = get_http_client()
+        remote_media_ids = set()
+        offset = 0
+        while True:
+            payload = {"type": media_type, "offset": offset, "count": 20}
+            response = session.post(url, data=json.dumps(payload), timeout=30)
+            result = response.json()
+            if 'item' not in result:
+                print(f"核对素材库失败: {result.get('errmsg', '未知错误')} (错误码: {result.get('errcode', 'N/A')})")
+                return 0
+            remote_media_ids.update(item['media_id'] for item in result['item'])
+            offset += result.get('item_count', 0)
+            if not result.get('item_count') or offset >= result.get('total_count', 0):
+                break
+
+        evicted = self.upload_index.evict_missing(media_type, remote_media_ids)
+        print(f"素材库核对完成，共 {len(remote_media_ids)} 个{media_type}素材，从上传索引中移除 {evicted} 个已删除的素材")
+        return evicted
+
     def save_result(self, result: Dict, 
                     output_file: str):
         """保存上传结果到JSON文件"""
@@ -1,14 +1,17 @@
+import os
+import sys
 import requests
 from PIL import Image
-from transformers import AutoProcessor, AutoModelForCausalLM 
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdf_utils.tf_id_model import get_tf_id_model
 
 model_id = "yifeihu/TF-ID-large" # recommended: use large models for better performance
 # model_id = "yifeihu/TF-ID-base"
 # model_id = "yifeihu/TF-ID-large-no-caption" # recommended: use large models for better performance
 # model_id = "yifeihu/TF-ID-base-no-caption"
 
-model = AutoModelForCausalLM.from_pretrained(model_id, trust_remote_code=True)
-processor = AutoProcessor.from_pretrained(model_id, trust_remote_code=True)
+model, processor = get_tf_id_model(model_id)
 
 prompt = "<OD>"
 
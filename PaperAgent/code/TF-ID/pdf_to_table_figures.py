@@ -1,18 +1,16 @@
-from pdf2image import convert_from_path, convert_from_bytes
-from pdf2image.exceptions import (
-    PDFInfoNotInstalledError,
-    PDFPageCountError,
-    PDFSyntaxError
-)
 from PIL import Image
-from transformers import AutoProcessor, AutoModelForCausalLM 
 
 import os
+import sys
 import json
 import time
 
-def pdf_to_image(pdf_path):
-	images = convert_from_path(pdf_path)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdf_utils.tf_id_detector import TFIDDetector
+from pdf_utils.pdf_pages import iter_pdf_pages, get_pdf_page_count
+
+def pdf_to_image(pdf_path, dpi=200):
+	images = [image for _, image in iter_pdf_pages(pdf_path, dpi=dpi)]
 	return images
 
 def tf_id_detection(image, model, processor):
@@ -38,22 +36,18 @@ def save_image_from_bbox(image, annotation, page, output_dir):
 		cropped_image = image.crop((x1, y1, x2, y2))
 		cropped_image.save(os.path.join(output_dir, f"page_{page}_{label}_{i}.png"))
 
-def pdf_to_table_figures(pdf_path, model_id, output_dir):
+def pdf_to_table_figures(pdf_path, model_id, output_dir, batch_size=4, dpi=200, first_page=None, last_page=None):
 	timestr = time.strftime("%Y%m%d-%H%M%S")
 	output_dir = os.path.join(output_dir, timestr)
 
 	os.makedirs(output_dir, exist_ok=True)
 
-	images = pdf_to_image(pdf_path)
-	print(f"PDF loaded. Number of pages: {len(images)}")
-	model = AutoModelForCausalLM.from_pretrained(model_id, trust_remote_code=True)
-	processor = AutoProcessor.from_pretrained(model_id, trust_remote_code=True)
-	print("Model loaded: ", model_id)
+	print(f"PDF loaded. Number of pages: {get_pdf_page_count(pdf_path)}")
+	detector = TFIDDetector(model_id=model_id, batch_size=batch_size)
 	
 	print("=====================================")
 	print("start saving cropped images")
-	for i, image in enumerate(images):
-		annotation = tf_id_detection(image, model, processor)
+	for i, image, annotation in detector.iter_pdf_detections(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page):
 		save_image_from_bbox(image, annotation, i, output_dir)
 		print(f"Page {i} saved. Number of objects: {len(annotation['bboxes'])}")
 	
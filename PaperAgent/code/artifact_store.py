@@ -0,0 +1,345 @@
+"""
+Function: Agent的结构化产物存储
+论文、产品、比赛、讨论帖、素材和总结统一存入一个SQLite库，各阶段按字段和索引查询，不再遍历目录、反复加载整个JSON文件；
+模板填充等旧脚本仍读取原有的JSON文件，由export_json/export_legacy_json按原格式从库中导出
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+"""
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs import ARTIFACT_DB_PATH, PAPER_EXPRESS_ROOT_PATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from item_journal import write_json_atomic
+
+
+SCHEMA = """
+-- 论文/产品：scope为所属周（数据目录名，如 2025_W25），key为详情页链接，data为完整记录
+CREATE TABLE IF NOT EXISTS papers (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER,
+    title TEXT,
+    data TEXT NOT NULL,
+    updated_at REAL,
+    PRIMARY KEY (scope, key)
+);
+CREATE INDEX IF NOT EXISTS idx_papers_scope_position ON papers(scope, position);
+CREATE INDEX IF NOT EXISTS idx_papers_title ON papers(title);
+
+CREATE TABLE IF NOT EXISTS products (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER,
+    title TEXT,
+    data TEXT NOT NULL,
+    updated_at REAL,
+    PRIMARY KEY (scope, key)
+);
+CREATE INDEX IF NOT EXISTS idx_products_scope_position ON products(scope, position);
+CREATE INDEX IF NOT EXISTS idx_products_title ON products(title);
+
+-- 比赛：key为比赛链接
+CREATE TABLE IF NOT EXISTS competitions (
+    key TEXT PRIMARY KEY,
+    position INTEGER,
+    name TEXT,
+    data TEXT NOT NULL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_competitions_name ON competitions(name);
+
+-- 讨论帖：scope为比赛目录名，key为讨论帖链接，name为详情目录名；
+-- 列表阶段写入position/data，详情阶段写入author_rank/content_path
+CREATE TABLE IF NOT EXISTS discussions (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER,
+    name TEXT,
+    author_rank INTEGER,
+    content_path TEXT,
+    data TEXT NOT NULL DEFAULT '{}',
+    updated_at REAL,
+    PRIMARY KEY (scope, key)
+);
+CREATE INDEX IF NOT EXISTS idx_discussions_scope_rank ON discussions(scope, author_rank);
+CREATE INDEX IF NOT EXISTS idx_discussions_scope_name ON discussions(scope, name);
+
+-- 素材：owner_kind/owner_key指向所属的论文、产品或讨论帖
+CREATE TABLE IF NOT EXISTS media (
+    owner_kind TEXT NOT NULL,
+    owner_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    local_path TEXT,
+    source_url TEXT,
+    upload_url TEXT,
+    updated_at REAL,
+    PRIMARY KEY (owner_kind, owner_key, position)
+);
+CREATE INDEX IF NOT EXISTS idx_media_upload_url ON media(upload_url);
+
+-- 总结/翻译结果：kind区分类型（如 paper_zh、solution），scope同上
+CREATE TABLE IF NOT EXISTS summaries (
+    kind TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER,
+    data TEXT NOT NULL,
+    updated_at REAL,
+    PRIMARY KEY (kind, scope, key)
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_kind_scope_position ON summaries(kind, scope, position);
+"""
+
+# 按周组织、整体替换的条目表
+RECORD_TABLES = ('papers', 'products')
+
+
+class ArtifactStore:
+    """SQLite产物存储，进程内共享一个连接"""
+
+    def __init__(self, db_path: str = ARTIFACT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        # WAL模式允许pipeline各阶段并发读写
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _write(self, statements):
+        """在一个事务内执行 [(sql, params), ...]"""
+        with self._lock, self._conn:
+            for sql, params in statements:
+                self._conn.execute(sql, params)
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    ##################
+    # 论文/产品
+    ##################
+    def put_records(self, table: str, scope: str, records: list, key_field: str):
+        """
+        用records整体替换某周的论文/产品
+
+        Args:
+            table: papers 或 products
+            scope: 所属周（数据目录名）
+            records: 按顺序排列的记录
+            key_field: 作为主键的字段，如 hf_url、producthunt_url
+        """
+        assert table in RECORD_TABLES, f"未知的表: {table}"
+        now = time.time()
+        statements = [(f"DELETE FROM {table} WHERE scope = ?", (scope,))]
+        for position, record in enumerate(records):
+            statements.append((
+                f"INSERT OR REPLACE INTO {table} (scope, key, position, title, data, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (scope, record[key_field], position, record.get('title'), json.dumps(record, ensure_ascii=False), now)
+            ))
+        self._write(statements)
+
+    def list_records(self, table: str, scope: str) -> list:
+        """按顺序返回某周的全部论文/产品"""
+        assert table in RECORD_TABLES, f"未知的表: {table}"
+        rows = self._query(f"SELECT data FROM {table} WHERE scope = ? ORDER BY position", (scope,))
+        return [json.loads(data) for data, in rows]
+
+    def get_record(self, table: str, scope: str, key: str):
+        """按链接获取单条论文/产品，不存在时返回None"""
+        assert table in RECORD_TABLES, f"未知的表: {table}"
+        rows = self._query(f"SELECT data FROM {table} WHERE scope = ? AND key = ?", (scope, key))
+        return json.loads(rows[0][0]) if rows else None
+
+    ##################
+    # 总结
+    ##################
+    def put_summaries(self, kind: str, scope: str, records: list, key_field: str):
+        """用records整体替换某类总结在scope下的全部记录"""
+        now = time.time()
+        statements = [("DELETE FROM summaries WHERE kind = ? AND scope = ?", (kind, scope))]
+        for position, record in enumerate(records):
+            statements.append((
+                "INSERT OR REPLACE INTO summaries (kind, scope, key, position, data, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, scope, str(record[key_field]), position, json.dumps(record, ensure_ascii=False), now)
+            ))
+        self._write(statements)
+
+    def list_summaries(self, kind: str, scope: str) -> list:
+        rows = self._query("SELECT data FROM summaries WHERE kind = ? AND scope = ? ORDER BY position", (kind, scope))
+        return [json.loads(data) for data, in rows]
+
+    ##################
+    # 比赛/讨论帖
+    ##################
+    def put_competitions(self, competitions: list):
+        """用最新爬取的比赛列表整体替换"""
+        now = time.time()
+        statements = [("DELETE FROM competitions", ())]
+        for position, comp in enumerate(competitions):
+            statements.append((
+                "INSERT OR REPLACE INTO competitions (key, position, name, data, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (comp['link'], position, comp.get('name'), json.dumps(comp, ensure_ascii=False), now)
+            ))
+        self._write(statements)
+
+    def list_competitions(self) -> list:
+        rows = self._query("SELECT data FROM competitions ORDER BY position")
+        return [json.loads(data) for data, in rows]
+
+    def put_discussions(self, scope: str, topics: list):
+        """写入讨论帖列表，已有的详情信息（排名、正文路径）保留"""
+        now = time.time()
+        statements = [("UPDATE discussions SET position = NULL WHERE scope = ?", (scope,))]
+        for position, topic in enumerate(topics):
+            statements.append((
+                """INSERT INTO discussions (scope, key, position, data, updated_at) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(scope, key) DO UPDATE SET position = excluded.position, data = excluded.data,
+                                                        updated_at = excluded.updated_at""",
+                (scope, topic['link'], position, json.dumps(topic, ensure_ascii=False), now)
+            ))
+        self._write(statements)
+
+    def list_discussions(self, scope: str) -> list:
+        """按列表顺序返回讨论帖列表"""
+        rows = self._query("SELECT data FROM discussions WHERE scope = ? AND position IS NOT NULL ORDER BY position",
+                           (scope,))
+        return [json.loads(data) for data, in rows]
+
+    def put_discussion_detail(self, scope: str, key: str, name: str, author_rank: int, content_path: str):
+        """记录讨论帖详情：目录名、作者排名和markdown正文路径"""
+        self._write([(
+            """INSERT INTO discussions (scope, key, name, author_rank, content_path, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(scope, key) DO UPDATE SET name = excluded.name, author_rank = excluded.author_rank,
+                                                    content_path = excluded.content_path, updated_at = excluded.updated_at""",
+            (scope, key, name, author_rank, content_path, time.time())
+        )])
+
+    def count_discussion_details(self, scope: str) -> int:
+        rows = self._query("SELECT COUNT(*) FROM discussions WHERE scope = ? AND content_path IS NOT NULL", (scope,))
+        return rows[0][0]
+
+    def discussion_names(self, scope: str) -> set:
+        """已记录详情的讨论帖目录名"""
+        rows = self._query("SELECT name FROM discussions WHERE scope = ? AND content_path IS NOT NULL", (scope,))
+        return {name for name, in rows}
+
+    def top_discussions(self, scope: str, top_k: int) -> list:
+        """
+        查询作者排名不超过top_k的讨论帖（同名次的帖子都保留），按排名升序
+
+        Returns:
+            list: [(name, author_rank, url), ...]
+        """
+        return self._query(
+            """SELECT name, author_rank, key FROM discussions
+               WHERE scope = ? AND content_path IS NOT NULL AND author_rank IS NOT NULL AND author_rank <= ?
+               ORDER BY author_rank, name""",
+            (scope, top_k))
+
+    ##################
+    # 素材
+    ##################
+    def put_media(self, owner_kind: str, owner_key: str, items: list):
+        """
+        整体替换某个条目的素材
+
+        Args:
+            items: [{'local_path', 'source_url', 'upload_url'}, ...]，缺少的字段记为空
+        """
+        now = time.time()
+        statements = [("DELETE FROM media WHERE owner_kind = ? AND owner_key = ?", (owner_kind, owner_key))]
+        for position, item in enumerate(items):
+            statements.append((
+                "INSERT INTO media (owner_kind, owner_key, position, local_path, source_url, upload_url, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (owner_kind, owner_key, position, item.get('local_path'), item.get('source_url'), item.get('upload_url'), now)
+            ))
+        if not items:
+            # 没有素材时写入占位行，查询时可区分"没有素材"和"从未记录"
+            statements.append((
+                "INSERT INTO media (owner_kind, owner_key, position, updated_at) VALUES (?, ?, -1, ?)",
+                (owner_kind, owner_key, now)
+            ))
+        self._write(statements)
+
+    def list_media(self, owner_kind: str, owner_key: str):
+        """
+        按顺序返回某个条目的素材
+
+        Returns:
+            list or None: 素材列表，从未记录过时返回None（与"没有素材"的空列表区分）
+        """
+        rows = self._query(
+            "SELECT local_path, source_url, upload_url FROM media WHERE owner_kind = ? AND owner_key = ? ORDER BY position",
+            (owner_kind, owner_key))
+        if not rows:
+            return None
+        # 过滤掉position=-1的占位行
+        return [{'local_path': local_path, 'source_url': source_url, 'upload_url': upload_url}
+                for local_path, source_url, upload_url in rows if local_path or source_url or upload_url]
+
+    ##################
+    # 导出
+    ##################
+    def export_json(self, records: list, path: str, indent: int = 2):
+        """按原有JSON格式导出查询结果（原子写入），供模板填充等旧脚本读取"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        write_json_atomic(path, records, indent=indent)
+        return path
+
+
+_ARTIFACT_STORE = None
+_ARTIFACT_STORE_LOCK = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """获取进程内共享的产物存储"""
+    global _ARTIFACT_STORE
+    if _ARTIFACT_STORE is None:
+        with _ARTIFACT_STORE_LOCK:
+            if _ARTIFACT_STORE is None:
+                _ARTIFACT_STORE = ArtifactStore()
+    return _ARTIFACT_STORE
+
+
+def export_legacy_json(scope: str, store: ArtifactStore = None) -> list:
+    """
+    从库中导出某周的旧版JSON文件（all_papers_details.json、zh_all_papers_details.json）
+
+    Args:
+        scope: 数据目录名，如 2025_W25
+    Returns:
+        list: 导出的文件路径
+    """
+    store = store or get_artifact_store()
+    data_dir = os.path.join(PAPER_EXPRESS_ROOT_PATH, scope)
+    exported = []
+    papers = store.list_records('papers', scope)
+    if papers:
+        exported.append(store.export_json(papers, os.path.join(data_dir, 'all_papers_details.json'), indent=2))
+    zh_papers = store.list_summaries('paper_zh', scope)
+    if zh_papers:
+        exported.append(store.export_json(zh_papers, os.path.join(data_dir, 'zh_all_papers_details.json'), indent=2))
+    return exported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='从产物库导出旧版JSON文件')
+    parser.add_argument('--scope', type=str, required=True, help='数据目录名，如 2025_W25')
+    args = parser.parse_args()
+
+    for path in export_legacy_json(args.scope):
+        print(f"已导出: {path}")
@@ -5,7 +5,17 @@ CreateDay: 20250625
 Author: HongfengAi
 History:
 20250625    HongfengAi  第一版
+20261018    HongfengAi  固定等待改为页面就绪等待
+20261018    HongfengAi  新增多worker并发爬取
+20261018    HongfengAi  论文详情优先用HTTP直取，必要时回退到浏览器
+20261018    HongfengAi  移除未使用的PyMuPDF/PIL导入
+20261018    HongfengAi  逐篇写入进度日志，中断后重跑从已完成的论文继续
+20261018    HongfengAi  论文详情和图片写入产物库，汇总JSON由产物库导出
+20261018    HongfengAi  返回爬取失败的论文，供pipeline判断阶段是否完成
+20261018    HongfengAi  TF-ID模型在worker启动前加载，worker中不再修改代理环境变量
+20261018    HongfengAi  并发数受HF访问上限限制时打印实际并发数
 """
+import copy
 import json
 import time
 import os
@@ -17,40 +27,58 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import re
 from datetime import datetime
-# 添加PDF处理相关导入
-import PyPDF2 # pip install PyPDF2
-import fitz  # pip install pymupdf
-from PIL import Image
-import io
-from pdf2image import convert_from_path
-from transformers import AutoProcessor, AutoModelForCausalLM
-import torch
+from urllib.parse import urljoin
 
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import USER_AGENT, PAPER_EXPRESS_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from crawler.crawler_utils import open_browser
+from crawler.crawler_utils import (get_browser_pool, wait_page_ready, get_host_throttle, run_workers,
+                                   fetch_static_html, static_text, record_fetch, report_fetch_stats)
 from utils import set_proxy, unset_proxy, safe_title_func
 from wechat_utils.upload_material import WeChatPermanentMaterialUploader
+from pdf_utils.tf_id_model import DEFAULT_TF_ID_MODEL_ID, get_tf_id_model, is_tf_id_model_loaded
+from pdf_utils.tf_id_detector import TFIDDetector
+from pdf_utils.pdf_store import get_pdf_store
+from item_journal import ItemJournal
+from artifact_store import get_artifact_store
 
 
 class PaperDetailsCrawler:
-    def __init__(self):
+    def __init__(self, tf_id_model_id=DEFAULT_TF_ID_MODEL_ID, tf_id_batch_size=4):
         self.browser = None
         self.wait = None
         self.media_uploader = WeChatPermanentMaterialUploader()
+        self.tf_id_model_id = tf_id_model_id
+        # TF-ID检测引擎，tf_id_batch_size为每次送入模型的页数
+        self.detector = TFIDDetector(model_id=tf_id_model_id, batch_size=tf_id_batch_size)
+        
+
+    def warmup_model(self):
+        """
+        预热TF-ID模型（进程内只加载一次）
+        模型下载只能通过环境变量走代理，而环境变量是进程共享的，须在并发worker启动前调用
+        """
+        if is_tf_id_model_loaded(self.tf_id_model_id):
+            return
+        set_proxy()
+        try:
+            get_tf_id_model(self.tf_id_model_id)
+        finally:
+            unset_proxy()
         
 
     def open_browser(self):
-        """打开浏览器"""
-        self.browser, self.wait = open_browser()
+        """从浏览器池租用浏览器"""
+        self.browser, self.wait = get_browser_pool().acquire()
         
 
-    def close_browser(self):
-        """关闭浏览器"""
+    def close_browser(self, broken=False):
+        """将浏览器归还浏览器池，broken=True表示浏览器出错需重建"""
         if self.browser:
-            self.browser.quit()
+            get_browser_pool().release(self.browser, broken=broken)
+            self.browser = None
+            self.wait = None
     
 
     def extract_github_url_from_pdf(self, pdf_url):
@@ -67,37 +95,9 @@ class PaperDetailsCrawler:
         try:
             print(f"🔍 正在从PDF第一页提取GitHub URL: {pdf_url}")
             
-            # 下载PDF文件
-            headers = {
-                'User-Agent': USER_AGENT
-            }
-            response = requests.get(pdf_url, headers=headers, timeout=30, stream=True)
-            response.raise_for_status()
-            
-            # 将PDF内容写入临时文件
-            temp_pdf_path = "temp_paper.pdf"
-            with open(temp_pdf_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            text_content = ""
-            
-            # 尝试使用PyPDF2
-            try:
-                with open(temp_pdf_path, 'rb') as pdf_file:
-                    pdf_reader = PyPDF2.PdfReader(pdf_file)
-                    if len(pdf_reader.pages) > 0:
-                        text_content = pdf_reader.pages[0].extract_text()
-            except Exception as e:
-                print(f"❌ PDF文本提取失败: {e}")
-                # 清理临时文件
-                if os.path.exists(temp_pdf_path):
-                    os.remove(temp_pdf_path)
-                return None
-            
-            # 清理临时文件
-            if os.path.exists(temp_pdf_path):
-                os.remove(temp_pdf_path)
+            # PDF来自共享存储，已下载过的论文不会重复下载
+            with get_pdf_store().open_document(pdf_url) as pdf_doc:
+                text_content = pdf_doc[0].get_text() if pdf_doc.page_count > 0 else ""
             
             if not text_content:
                 print("❌ 无法从PDF第一页提取文本内容")
@@ -137,40 +137,15 @@ class PaperDetailsCrawler:
         """
         try:
             print(f"🔍 正在从PDF中抽取表格/图片: {pdf_url}")
-            set_proxy()
-            headers = {'User-Agent': USER_AGENT}
-            response = requests.get(pdf_url, headers=headers, timeout=60)
-            response.raise_for_status()
-            # 保存临时PDF文件
             os.makedirs(save_dir, exist_ok=True)
-            temp_pdf_path = os.path.join(save_dir, "temp_paper.pdf")
-            with open(temp_pdf_path, 'wb') as f:
-                f.write(response.content)
+            pdf_path = get_pdf_store().get_pdf_path(pdf_url)
 
             # ===== TF-ID模型推理部分 =====
-            model_id = "yifeihu/TF-ID-base"
-            images = convert_from_path(temp_pdf_path)
-            model = AutoModelForCausalLM.from_pretrained(model_id, trust_remote_code=True)
-            processor = AutoProcessor.from_pretrained(model_id, trust_remote_code=True)
-            print("Model loaded: ", model_id)
-            unset_proxy()
-            
+            # 模型已在worker启动前由warmup_model加载，进程内共享
             img_urls = []
             img_count = 0
-            for i, image in enumerate(images):
-                # 推理
-                prompt = "<OD>"
-                inputs = processor(text=prompt, images=image, return_tensors="pt")
-                with torch.no_grad():
-                    generated_ids = model.generate(
-                        input_ids=inputs["input_ids"],
-                        pixel_values=inputs["pixel_values"],
-                        max_new_tokens=1024,
-                        do_sample=False,
-                        num_beams=3
-                    )
-                generated_text = processor.batch_decode(generated_ids, skip_special_tokens=False)[0]
-                annotation = processor.post_process_generation(generated_text, task="<OD>", image_size=(image.width, image.height))["<OD>"]
+            # 页面流式渲染并按batch推理，凑够max_images张后不再渲染/推理后续页面
+            for i, image, annotation in self.detector.iter_pdf_detections(pdf_path, max_objects=max_images):
                 # 裁剪并保存图片
                 for j, bbox in enumerate(annotation['bboxes']):
                     label = annotation['labels'][j]
@@ -187,9 +162,6 @@ class PaperDetailsCrawler:
                         break
                 if img_count >= max_images:
                     break
-            # 清理临时PDF
-            if os.path.exists(temp_pdf_path):
-                os.remove(temp_pdf_path)
             print(f"✓ 成功抽取并上传 {len(img_urls)} 张图片")
             return img_urls
         except Exception as e:
@@ -210,8 +182,10 @@ class PaperDetailsCrawler:
         print(f"正在访问论文页面: {hf_url}")
         self.browser.get(hf_url)
         
-        # 等待页面加载
-        time.sleep(3)
+        # 等待论文发表时间元素出现且网络空闲
+        wait_page_ready(self.browser, self.wait, "huggingface",
+                        ready_locator=(By.XPATH, "/html/body/div[1]/main/div/section[1]/div/div[1]/div[2]/div[1]"),
+                        label="HF论文详情")
         
         paper_details = {}
         
@@ -252,7 +226,68 @@ class PaperDetailsCrawler:
             elif 'GitHub' in link_element.text:
                 paper_details['github_url'] = link_element.get_attribute('href')
         
-        # 如果没有找到GitHub URL但有PDF URL，尝试从PDF第一页提取
+        self.fill_github_url_from_pdf(paper_details)
+        return paper_details
+
+
+    def fetch_paper_details_http(self, hf_url):
+        """
+        用HTTP直取HF论文页面的服务端渲染HTML并提取详细信息，不启动浏览器
+        XPath与extract_paper_details保持一致
+
+        Args:
+            hf_url: 论文在HF上的URL
+        Returns:
+            dict or None: 论文详细信息，None表示需回退到浏览器
+        """
+        tree = fetch_static_html(hf_url, "huggingface",
+                                 ready_xpath="/html/body/div/main/div/section[1]/div/div[2]/div/p")
+        if tree is None:
+            return None
+        print(f"已通过HTTP获取论文页面: {hf_url}")
+
+        paper_details = {}
+        try:
+            # 提取论文发表时间
+            paper_details['published_date'] = static_text(tree.xpath("/html/body/div[1]/main/div/section[1]/div/div[1]/div[2]/div[1]")[0])
+
+            # 提取作者列表
+            authors = []
+            for author_element in tree.xpath("/html/body/div[1]/main/div/section[1]/div/div[1]/div[4]/*"):
+                author = static_text(author_element)
+                if author and author != 'Authors:':
+                    authors.append(re.sub(r'\s*,$', '', author))
+            paper_details['authors'] = authors
+
+            # 提取AI生成总结
+            ai_summary_elements = tree.xpath("/html/body/div/main/div/section[1]/div/div[2]/div/div/p")
+            paper_details['ai_summary'] = static_text(ai_summary_elements[0]) if ai_summary_elements else ""
+
+            # 提取摘要
+            paper_details['abstract'] = static_text(tree.xpath("/html/body/div/main/div/section[1]/div/div[2]/div/p")[0])
+        except IndexError:
+            print("静态HTML结构与预期不一致，回退到浏览器")
+            return None
+
+        # 提取PDF链接和arXiv信息
+        paper_details['pdf_url'] = None
+        paper_details['github_url'] = None
+        for link_element in tree.xpath("/html/body/div[1]/main/div/section[1]/div/div[3]/*"):
+            link_text = static_text(link_element)
+            href = link_element.get('href')
+            if href:
+                href = urljoin(hf_url, href)
+            if link_text == 'View PDF' or link_text == 'View arXiv page':
+                paper_details['pdf_url'] = href
+            elif 'GitHub' in link_text:
+                paper_details['github_url'] = href
+
+        self.fill_github_url_from_pdf(paper_details)
+        return paper_details
+
+
+    def fill_github_url_from_pdf(self, paper_details):
+        """如果HF页面没有GitHub URL但有PDF URL，尝试从PDF第一页提取"""
         if paper_details['github_url'] is None and paper_details['pdf_url'] is not None:
             print("🔍 Hugging Face页面未找到GitHub URL，尝试从PDF第一页提取...")
             pdf_github_url = self.extract_github_url_from_pdf(paper_details['pdf_url'])
@@ -260,11 +295,66 @@ class PaperDetailsCrawler:
                 paper_details['github_url'] = pdf_github_url
             else:
                 print("❌ PDF第一页也未找到GitHub URL")
-        
-        return paper_details
 
 
-    def crawl_papers_details_from_list(self, paper_list_file, output_dir, max_papers=None):
+    def crawl_paper_details(self, i, paper, output_dir):
+        """
+        爬取单篇论文详情（含PDF图片抽取），并立即保存该论文的JSON
+
+        Args:
+            i: 论文在列表中的下标（从0开始）
+            paper: 论文列表中的论文信息
+            output_dir: 输出目录
+        Returns:
+            dict: 合并后的论文信息
+        """
+        # 每个worker使用独立的爬虫副本，浏览器互不干扰
+        worker = copy.copy(self)
+        worker.browser = None
+        worker.wait = None
+        print(f"\n正在处理第 {i+1} 篇论文: {paper.get('title', 'Unknown')}")
+
+        # 遵守HF站点的访问频率限制
+        with get_host_throttle().slot(paper['hf_url']):
+            # 优先HTTP直取，HTML中缺少所需内容时才从浏览器池租用浏览器（复用已启动的Chrome）
+            paper_details = worker.fetch_paper_details_http(paper['hf_url'])
+            if paper_details is None:
+                worker.open_browser()
+                try:
+                    paper_details = worker.extract_paper_details(paper['hf_url'])
+                except Exception:
+                    worker.close_browser(broken=True)
+                    raise
+                # 归还浏览器
+                worker.close_browser()
+                record_fetch("huggingface", "browser")
+
+        # 合并基本信息和详细信息
+        combined_paper_info = {
+            **paper,  # 原有的基本信息
+            **paper_details  # 新爬取的详细信息
+        }
+
+        # 新增：抽取论文图片并上传
+        safe_title = safe_title_func(paper.get('title', f'{i+1}_paper'))
+        paper_path = os.path.join(output_dir, f"{i+1}_{safe_title}")
+        paper_img_urls = []
+        if combined_paper_info.get('pdf_url'):
+            paper_img_dir = os.path.join(paper_path, "paper_imgs")
+            paper_img_urls = worker.extract_images_from_pdf(combined_paper_info['pdf_url'], paper_img_dir, max_images=5)
+        combined_paper_info['paper_img_urls'] = paper_img_urls
+
+        # 为每篇论文创建单独的文件
+        os.makedirs(paper_path, exist_ok=True)
+        paper_file = os.path.join(paper_path, f"paper_details.json")
+        with open(paper_file, 'w', encoding='utf-8') as f:
+            json.dump(combined_paper_info, f, ensure_ascii=False, indent=2)
+
+        print(f"已保存论文详情到: {paper_file}")
+        return combined_paper_info
+
+
+    def crawl_papers_details_from_list(self, paper_list_file, output_dir, max_papers=None, workers=1, resume=True):
         """
         从论文列表文件中读取论文信息并爬取详情
         
@@ -272,9 +362,11 @@ class PaperDetailsCrawler:
             paper_list_file: 论文列表JSON文件路径
             output_dir: 输出目录
             max_papers: 最大爬取论文数量，None表示爬取所有
+            workers: 并发爬取的worker数（每个worker独立的浏览器），1表示逐篇爬取
+            resume: 是否跳过进度日志中已爬取完成的论文，False时全部重新爬取
             
         Returns:
-            None
+            list: 爬取失败、留待下次重试的论文hf_url
         """
         # 读取论文列表
         with open(paper_list_file, 'r', encoding='utf-8') as f:
@@ -289,57 +381,39 @@ class PaperDetailsCrawler:
         
         # 创建输出目录
         os.makedirs(output_dir, exist_ok=True)
-        
-        crawled_papers = []
-        
-        for i, paper in enumerate(papers_list):
-            print(f"\n正在处理第 {i+1}/{len(papers_list)} 篇论文: {paper.get('title', 'Unknown')}")
 
-            # 打开浏览器
-            self.open_browser()
+        # 每篇论文爬取完成（含图片上传）后立即记入日志，中途崩溃重跑时只爬取剩余论文
+        journal = ItemJournal(os.path.join(output_dir, "all_papers_details.journal.jsonl"), resume=resume)
 
-            # 爬取论文详情
-            paper_details = self.extract_paper_details(paper['hf_url'])
+        def crawl_one(i, paper):
+            if journal.get(paper['hf_url']) is not None:
+                print(f"\n第 {i+1} 篇论文已爬取，跳过: {paper.get('title', 'Unknown')}")
+                return
+            journal.append(paper['hf_url'], self.crawl_paper_details(i, paper, output_dir))
 
-            # 关闭浏览器
-            self.close_browser()
-            
-            # 合并基本信息和详细信息
-            combined_paper_info = {
-                **paper,  # 原有的基本信息
-                **paper_details  # 新爬取的详细信息
-            }
-            
-            # 新增：抽取论文图片并上传
-            paper_img_urls = []
-            if combined_paper_info.get('pdf_url'):
-                safe_title = safe_title_func(paper.get('title', f'{i+1}_paper'))
-                paper_img_dir = os.path.join(output_dir, f"{i+1}_{safe_title}", "paper_imgs")
-                paper_img_urls = self.extract_images_from_pdf(combined_paper_info['pdf_url'], paper_img_dir, max_images=5)
-            combined_paper_info['paper_img_urls'] = paper_img_urls
-            crawled_papers.append(combined_paper_info)
-            
-            # 为每篇论文创建单独的文件
-            safe_title = safe_title_func(paper.get('title', f'{i+1}_paper'))
-            paper_path = os.path.join(output_dir, f"{i+1}_{safe_title}")
-            paper_file = os.path.join(paper_path, f"paper_details.json")
-            
-            with open(paper_file, 'w', encoding='utf-8') as f:
-                json.dump(combined_paper_info, f, ensure_ascii=False, indent=2)
-            
-            print(f"已保存论文详情到: {paper_file}")
-            
-            # 避免请求过快
-            time.sleep(2)
-        
-        # 保存所有论文的详细信息汇总
-        summary_file = os.path.join(output_dir, "all_papers_details.json")
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            json.dump(crawled_papers, f, ensure_ascii=False, indent=2)
+        # 在worker启动前加载模型（已加载时直接返回）
+        self.warmup_model()
+        # 爬取失败的论文不写入日志，下次运行时重试
+        run_workers(papers_list, crawl_one, workers=workers, url_of=lambda paper: paper['hf_url'])
+
+        # 汇总结果由日志生成，按论文在列表中的顺序排列，爬取失败的论文被跳过；
+        # 写入产物库（以数据目录名为周标识），并导出旧版汇总JSON供后续阶段和模板使用
+        crawled_papers = journal.results([paper['hf_url'] for paper in papers_list])
+        scope = os.path.basename(os.path.normpath(output_dir))
+        store = get_artifact_store()
+        store.put_records('papers', scope, crawled_papers, key_field='hf_url')
+        for paper in crawled_papers:
+            store.put_media('paper', paper['hf_url'], [{'upload_url': url} for url in paper.get('paper_img_urls', [])])
+        summary_file = store.export_json(crawled_papers, os.path.join(output_dir, "all_papers_details.json"), indent=2)
         
         print(f"\n爬取完成！共处理 {len(crawled_papers)} 篇论文")
         print(f"详细信息已保存到: {summary_file}")
+        report_fetch_stats()
 
+        failed_urls = [paper['hf_url'] for paper in papers_list if journal.get(paper['hf_url']) is None]
+        if failed_urls:
+            print(f"⚠️ {len(failed_urls)} 篇论文爬取失败，下次运行时重试: {failed_urls}")
+        return failed_urls
 
 if __name__ == "__main__":
     import argparse
@@ -348,6 +422,7 @@ if __name__ == "__main__":
     parser.add_argument('--paper_list', type=str, required=True, default='C:/Users/alvin/Downloads/paper_express/2025_W25/paper_list_2025-W25.json', help='论文列表JSON文件路径')
     parser.add_argument('--output_dir', type=str, required=True, default='C:/Users/alvin/Downloads/paper_express/2025_W25', help='输出目录')
     parser.add_argument('--max_papers', type=int, required=True, default=10, help='最大爬取论文数量')
+    parser.add_argument('--workers', type=int, default=1, help='并发爬取的worker数')
     
     args = parser.parse_args()
     
@@ -355,6 +430,7 @@ if __name__ == "__main__":
     crawler.crawl_papers_details_from_list(
         paper_list_file=args.paper_list,
         output_dir=args.output_dir,
-        max_papers=args.max_papers
+        max_papers=args.max_papers,
+        workers=args.workers
     )
 
@@ -5,6 +5,8 @@ CreateDay: 20250625
 Author: HongfengAi
 History:
 20250625    HongfengAi  第一版
+20261018    HongfengAi  固定等待改为页面就绪等待
+20261018    HongfengAi  PyMuPDF/PIL改为使用时才导入
 """
 import datetime
 import json
@@ -18,16 +20,15 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import re
 import argparse
-import fitz  # PyMuPDF for PDF processing
-from PIL import Image
-import io
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import USER_AGENT, PAPER_EXPRESS_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from crawler.crawler_utils import open_browser
-from utils import set_proxy, unset_proxy, safe_title_func, get_previous_week
+from crawler.crawler_utils import get_browser_pool, wait_page_ready
+from utils import safe_title_func, get_previous_week
+from http_client import get_http_client
 from wechat_utils.upload_material import WeChatPermanentMaterialUploader
+from pdf_utils.pdf_store import get_pdf_store
 
 
 class HFWeeklyPapersCrawler:
@@ -37,13 +38,15 @@ class HFWeeklyPapersCrawler:
         self.media_uploader = WeChatPermanentMaterialUploader()
         
     def open_browser(self):
-        """打开浏览器"""
-        self.browser, self.wait = open_browser()
+        """从浏览器池租用浏览器"""
+        self.browser, self.wait = get_browser_pool().acquire()
         
-    def close_browser(self):
-        """关闭浏览器"""
+    def close_browser(self, broken=False):
+        """将浏览器归还浏览器池，broken=True表示浏览器出错需重建"""
         if self.browser:
-            self.browser.quit()
+            get_browser_pool().release(self.browser, broken=broken)
+            self.browser = None
+            self.wait = None
             
     def extract_pdf_cover(self, hf_url, paper_title, save_dir):
         """从论文PDF中提取封面图
@@ -56,48 +59,27 @@ class HFWeeklyPapersCrawler:
         Returns:
             tuple: (local_path, upload_url)
         """
-        # 转换HF URL为ArXiv PDF URL
-        paper_id = hf_url.split('/')[-1]
-        pdf_url = f"https://arxiv.org/pdf/{paper_id}"
-        
-        print(f"正在下载PDF: {pdf_url}")
+        import io
+        import fitz  # PyMuPDF for PDF processing
+        from PIL import Image
+
+        print(f"正在获取PDF: {hf_url}")
         
         # 创建保存目录
         os.makedirs(save_dir, exist_ok=True)
         
-        # 创建使用代理的session
-        set_proxy()
-        session = requests.Session()
-        session.trust_env = True
-        
-        # 设置超时和重试
-        session.mount('https://', requests.adapters.HTTPAdapter(max_retries=3))
-        session.mount('http://', requests.adapters.HTTPAdapter(max_retries=3))
-        
-        # 添加请求头，模拟浏览器
-        headers = {
-            'User-Agent': USER_AGENT
-        }
-        
-        # 下载PDF文件
-        response = session.get(pdf_url, headers=headers, timeout=60)
-        response.raise_for_status()
-        
-        unset_proxy()
-        
-        # 使用PyMuPDF处理PDF
-        pdf_doc = fitz.open(stream=response.content, filetype="pdf")
-        
-        # 获取第一页
-        first_page = pdf_doc[0]
-        
-        # 将第一页转换为图片 (设置较高的分辨率)
-        mat = fitz.Matrix(2.0, 2.0)  # 2倍缩放以获得更高质量
-        pix = first_page.get_pixmap(matrix=mat)
-        
-        # 将pixmap转换为PIL Image
-        img_data = pix.tobytes("png")
-        img = Image.open(io.BytesIO(img_data))
+        # PDF由共享存储统一下载，后续详情爬取阶段直接复用
+        with get_pdf_store().open_document(hf_url) as pdf_doc:
+            # 获取第一页
+            first_page = pdf_doc[0]
+            
+            # 将第一页转换为图片 (设置较高的分辨率)
+            mat = fitz.Matrix(2.0, 2.0)  # 2倍缩放以获得更高质量
+            pix = first_page.get_pixmap(matrix=mat)
+            
+            # 将pixmap转换为PIL Image
+            img_data = pix.tobytes("png")
+            img = Image.open(io.BytesIO(img_data))
         
         # 调整图片尺寸为1200x648
         target_size = (1200, 648)
@@ -125,9 +107,6 @@ class HFWeeklyPapersCrawler:
         filepath = os.path.join(save_dir, filename)
         img.save(filepath, "PNG", quality=95)
         
-        # 关闭PDF文档
-        pdf_doc.close()
-        
         print(f"PDF封面图提取成功: {filepath}")
         
         # 上传到永久素材库
@@ -154,22 +133,13 @@ class HFWeeklyPapersCrawler:
         # 创建保存目录
         os.makedirs(save_dir, exist_ok=True)
                     
-        # 创建使用代理的session
-        set_proxy()
-        session = requests.Session()
-        session.trust_env = True
-        
-        # 设置超时和重试
-        session.mount('https://', requests.adapters.HTTPAdapter(max_retries=3))
-        session.mount('http://', requests.adapters.HTTPAdapter(max_retries=3))
-        
         # 添加请求头，模拟浏览器
         headers = {
             'User-Agent': USER_AGENT
         }
         
-        # 下载媒体文件
-        response = session.get(media_url, headers=headers, timeout=30)
+        # 下载媒体文件（共享HTTP客户端，走代理，失败自动重试）
+        response = get_http_client().get(media_url, proxy=True, headers=headers, timeout=30)
         response.raise_for_status()
         
         # 生成安全的文件名
@@ -190,11 +160,10 @@ class HFWeeklyPapersCrawler:
         with open(filepath, 'wb') as f:
             f.write(response.content)
         
-        unset_proxy()
-        
         # 处理图片尺寸调整
         if media_type == 'image':
             try:
+                from PIL import Image
                 img = Image.open(filepath)
                 target_size = (1200, 648)
                 
@@ -250,12 +219,10 @@ class HFWeeklyPapersCrawler:
             print(f"正在访问: {week_url}")
             self.browser.get(week_url)
             
-            # 等待页面加载
-            time.sleep(3)
-            
-            # 滚动到页面底部确保所有内容加载
-            self.browser.execute_script("window.scrollTo(0, document.body.scrollHeight)")
-            time.sleep(2)
+            # 等待论文列表出现，并滚动到页面底部直到高度稳定，确保所有内容加载
+            wait_page_ready(self.browser, self.wait, "huggingface",
+                            ready_locator=(By.XPATH, '/html/body/div[1]/main/div[2]/section/div[2]/*'),
+                            scroll=True, label="HF周论文列表")
             
             # 查找所有论文条目
             # 根据页面结构，论文条目通常在特定的容器中
@@ -0,0 +1,250 @@
+"""
+Function: LLM请求的录制与离线回放
+- 录制：configs.LLM_REPLAY_RECORD=True时，把真实请求的(prompt, 响应, TTFT, 总耗时, token用量)追加到LLM_REPLAY_PATH
+- 回放：启动本地OpenAI兼容的stub服务，按录制时的耗时（可缩放）流式返回录制的响应；
+  将configs.LLM_BASE_URL指向该服务后，各summarizer无需网络和API费用即可端到端压测并发和缓存改动
+
+Example:
+    python code/llm_replay.py --replay_file <录制文件> --port 8765 --latency_scale 1.0
+    # configs.py中设置 LLM_BASE_URL = "http://127.0.0.1:8765/v1"，再运行summarizer或pipeline
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+"""
+import json
+import time
+import hashlib
+import argparse
+import threading
+from uuid import UUID
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs import LLM_REPLAY_PATH
+
+
+# LangChain消息类型 -> OpenAI角色
+ROLE_MAPPING = {"human": "user", "ai": "assistant", "system": "system", "tool": "tool"}
+
+
+def replay_key(messages: list) -> str:
+    """按消息的(角色, 内容)计算回放key，录制端和stub服务端一致"""
+    normalized = [[message.get("role"), message.get("content")] for message in messages]
+    return hashlib.sha256(json.dumps(normalized, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class ReplayRecorder(BaseCallbackHandler):
+    """LangChain回调：录制真实请求的prompt、响应和耗时"""
+
+    def __init__(self, replay_path: str):
+        self.replay_path = replay_path
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        invocation_params = kwargs.get('invocation_params') or {}
+        with self._lock:
+            self._runs[run_id] = {
+                'model': invocation_params.get('model') or invocation_params.get('model_name', ""),
+                'messages': [[{"role": ROLE_MAPPING.get(m.type, m.type), "content": m.content} for m in batch]
+                             for batch in messages],
+                'start': time.perf_counter(),
+                'first_token': None,
+            }
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and run['first_token'] is None:
+            run['first_token'] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        # 命中LLM响应缓存的调用没有真实耗时，不录制
+        if run is None or run['first_token'] is None:
+            return
+        latency = time.perf_counter() - run['start']
+        ttft = run['first_token'] - run['start']
+        records = []
+        for messages, generations in zip(run['messages'], response.generations):
+            if not generations:
+                continue
+            usage = getattr(getattr(generations[0], 'message', None), 'usage_metadata', None) or {}
+            records.append({
+                'key': replay_key(messages),
+                'model': run['model'],
+                'messages': messages,
+                'response': generations[0].text,
+                'ttft': round(ttft, 3),
+                'latency': round(latency, 3),
+                'prompt_tokens': usage.get('input_tokens', 0),
+                'completion_tokens': usage.get('output_tokens', 0),
+            })
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.replay_path), exist_ok=True)
+                with open(self.replay_path, 'a', encoding='utf-8') as f:
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except Exception as e:
+                print(f"写入LLM回放记录失败: {e}")
+
+
+_REPLAY_RECORDER = None
+_REPLAY_RECORDER_LOCK = threading.Lock()
+
+
+def get_replay_recorder() -> ReplayRecorder:
+    """获取进程内共享的录制回调（LLMClient在LLM_REPLAY_RECORD开启时挂载）"""
+    global _REPLAY_RECORDER
+    if _REPLAY_RECORDER is None:
+        with _REPLAY_RECORDER_LOCK:
+            if _REPLAY_RECORDER is None:
+                _REPLAY_RECORDER = ReplayRecorder(LLM_REPLAY_PATH)
+    return _REPLAY_RECORDER
+
+
+class ReplayStore:
+    """加载录制文件；同一prompt录制了多次时轮流返回"""
+
+    def __init__(self, replay_path: str):
+        self.records = {}
+        self._cursor = {}
+        self._lock = threading.Lock()
+        with open(replay_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.records.setdefault(record['key'], []).append(record)
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def lookup(self, messages: list):
+        key = replay_key(messages)
+        with self._lock:
+            candidates = self.records.get(key)
+            if not candidates:
+                self.stats['misses'] += 1
+                return None
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            self.stats['hits'] += 1
+            return candidates[index % len(candidates)]
+
+
+def build_handler(store: ReplayStore, latency_scale: float, chunk_chars: int):
+    """构造OpenAI兼容的 /v1/chat/completions 处理器"""
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status: int, payload: dict):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_chunk(self, payload):
+            data = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+            body = f"data: {data}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(body):x}\r\n".encode('ascii') + body + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith("/chat/completions"):
+                self.send_json(404, {"error": {"message": f"不支持的接口: {self.path}", "type": "invalid_request_error"}})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            record = store.lookup(request.get("messages", []))
+            if record is None:
+                print(f"⚠ 回放未命中: {str(request.get('messages', [])[-1:])[:120]}")
+                self.send_json(404, {"error": {"message": "replay miss: 录制文件中没有该prompt", "type": "replay_miss"}})
+                return
+
+            model = request.get("model") or record['model']
+            created = int(time.time())
+            ttft = record['ttft'] * latency_scale
+            generation_time = max(0.0, record['latency'] - record['ttft']) * latency_scale
+            usage = {
+                "prompt_tokens": record['prompt_tokens'],
+                "completion_tokens": record['completion_tokens'],
+                "total_tokens": record['prompt_tokens'] + record['completion_tokens'],
+            }
+
+            if not request.get("stream"):
+                time.sleep(ttft + generation_time)
+                self.send_json(200, {
+                    "id": "chatcmpl-replay", "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": record['response']},
+                                 "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+                return
+
+            # 流式：首个chunk在TTFT后发出，其余chunk均匀分布在生成耗时内
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            text = record['response']
+            pieces = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)] or [""]
+            time.sleep(ttft)
+            for i, piece in enumerate(pieces):
+                delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+                self.send_chunk({"id": "chatcmpl-replay", "object": "chat.completion.chunk", "created": created,
+                                 "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                time.sleep(generation_time / len(pieces))
+            self.send_chunk({"id": "chatcmpl-replay", "object": "chat.completion.chunk", "created": created,
+                             "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if (request.get("stream_options") or {}).get("include_usage"):
+                self.send_chunk({"id": "chatcmpl-replay", "object": "chat.completion.chunk", "created": created,
+                                 "model": model, "choices": [], "usage": usage})
+            self.send_chunk("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return ReplayHandler
+
+
+def serve(replay_file: str, host: str = "127.0.0.1", port: int = 8765,
+          latency_scale: float = 1.0, chunk_chars: int = 16):
+    """
+    启动本地OpenAI兼容的回放服务
+
+    Args:
+        replay_file: 录制文件
+        latency_scale: 耗时缩放系数，1.0为原始耗时，0表示不等待
+        chunk_chars: 流式返回时每个chunk的字符数
+    """
+    store = ReplayStore(replay_file)
+    print(f"已加载 {sum(len(v) for v in store.records.values())} 条录制记录（{len(store.records)} 个不同prompt）")
+    server = ThreadingHTTPServer((host, port), build_handler(store, latency_scale, chunk_chars))
+    print(f"🚀 LLM回放服务已启动: http://{host}:{port}/v1 （耗时缩放 {latency_scale}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"回放命中 {store.stats['hits']} 次，未命中 {store.stats['misses']} 次")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地OpenAI兼容的LLM回放服务")
+    parser.add_argument("--replay_file", type=str, default=LLM_REPLAY_PATH, help="录制文件路径")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--latency_scale", type=float, default=1.0, help="耗时缩放系数，0表示不等待")
+    parser.add_argument("--chunk_chars", type=int, default=16, help="流式返回时每个chunk的字符数")
+    args = parser.parse_args()
+
+    serve(args.replay_file, args.host, args.port, args.latency_scale, args.chunk_chars)
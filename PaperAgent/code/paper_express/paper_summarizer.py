@@ -5,23 +5,61 @@ CreateDay: 20250626
 Author: HongfengAi
 History:
 20250626    HongfengAi  第一版
+20261018    HongfengAi  新增异步并发模式（ainvoke + 并发上限 + 限流）
+20261018    HongfengAi  技术关键词改为结构化输出（pydantic校验 + 失败时针对性修正）
+20261018    HongfengAi  LLM调用改走LLMClient，记录TTFT、耗时和token用量
+20261018    HongfengAi  论文详情从产物库读取，中文结果写入产物库后再导出JSON
+20261018    HongfengAi  传入的论文详情文件优先于产物库，与pipeline哈希的阶段输入保持一致
+20261018    HongfengAi  关键词超过5个时截断而不是判为校验失败
 """
 import json
 import argparse
+import asyncio
 import os
 import sys
 from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel, Field, field_validator
+from langchain_core.rate_limiters import InMemoryRateLimiter
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import OUTPUT_ROOT_PATH, PAPER_EXPRESS_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import set_proxy, unset_proxy, init_llm, safe_title_func, format_json_block
+from utils import safe_title_func
+from llm_client import LLMClient
+from structured_output import invoke_structured, ainvoke_structured, StructuredOutputError
+from artifact_store import get_artifact_store
+
+
+class PaperKeywords(BaseModel):
+    """论文技术关键词"""
+    keywords: List[str] = Field(description="论文的核心技术关键词，不超过5个", min_length=1)
+
+    @field_validator('keywords')
+    @classmethod
+    def truncate_keywords(cls, keywords: List[str]) -> List[str]:
+        # 关键词多于5个时截断，不判为校验失败
+        return keywords[:5]
 
 
 class PaperSummarizer:
-    def __init__(self):
+    def __init__(self, concurrency: int = 1, requests_per_second: float = None):
+        """
+        Args:
+            concurrency: 同时进行的LLM请求数，大于1时所有论文的各个prompt异步并发执行
+            requests_per_second: LLM请求速率上限，None表示不限流
+        """
+        self.concurrency = max(1, int(concurrency))
+        rate_limiter = None
+        if requests_per_second:
+            rate_limiter = InMemoryRateLimiter(
+                requests_per_second=requests_per_second,
+                check_every_n_seconds=0.1,
+                max_bucket_size=self.concurrency
+            )
         # 初始化llm
-        self.llm = init_llm(temperature=0.15)
+        self.llm_client = LLMClient("paper_summarizer", temperature=0.15, rate_limiter=rate_limiter)
         self.paper_express_root_path = PAPER_EXPRESS_ROOT_PATH
 
 
@@ -36,6 +74,23 @@ class PaperSummarizer:
         if not abstract or abstract.strip() == "":
             return abstract
 
+        translated_abstract = self.llm_client.invoke(self.build_translate_prompt(abstract), call_site="translate_abstract").content.strip()
+        return translated_abstract
+
+
+    async def atranslate_abstract(self, abstract: str) -> str:
+        """translate_abstract的异步版本"""
+        if not abstract or abstract.strip() == "":
+            return abstract
+
+        async with self._semaphore:
+            response = await self.llm_client.ainvoke(self.build_translate_prompt(abstract), call_site="translate_abstract")
+        return response.content.strip()
+
+
+    @staticmethod
+    def build_translate_prompt(abstract: str) -> str:
+        """构造摘要翻译prompt"""
         prompt = f"""
         请将以下学术论文的摘要内容专业地翻译成中文：
 
@@ -50,11 +105,10 @@ class PaperSummarizer:
         - 对于数学公式和技术参数，请原封不动保留其格式。
         - 翻译要准确、流畅、符合中文学术写作习惯。
         """
-        translated_abstract = self.llm.invoke(prompt).content.strip()
-        return translated_abstract
+        return prompt
 
 
-    def generate_paper_keywords(self, title: str, ai_summary: str, abstract: str) -> list:
+    def generate_paper_keywords(self, title: str, ai_summary: str, abstract: str) -> str:
         """
         根据论文信息生成技术关键词
         Args:
@@ -62,8 +116,29 @@ class PaperSummarizer:
             ai_summary: AI总结
             abstract: 摘要
         Returns:
-            技术关键词列表
+            技术关键词列表的JSON字符串，如 '["VLA", "Agent"]'（与历史数据格式一致）
         """
+        try:
+            keywords = invoke_structured(self.llm_client.for_site("paper_keywords"), self.build_keywords_prompt(title, ai_summary, abstract), PaperKeywords).keywords
+        except StructuredOutputError as e:
+            keywords = e.parsed.keywords[:5] if e.parsed else []
+        return json.dumps(keywords, ensure_ascii=False)
+
+
+    async def agenerate_paper_keywords(self, title: str, ai_summary: str, abstract: str) -> str:
+        """generate_paper_keywords的异步版本"""
+        async with self._semaphore:
+            try:
+                result = await ainvoke_structured(self.llm_client.for_site("paper_keywords"), self.build_keywords_prompt(title, ai_summary, abstract), PaperKeywords)
+                keywords = result.keywords
+            except StructuredOutputError as e:
+                keywords = e.parsed.keywords[:5] if e.parsed else []
+        return json.dumps(keywords, ensure_ascii=False)
+
+
+    @staticmethod
+    def build_keywords_prompt(title: str, ai_summary: str, abstract: str) -> str:
+        """构造技术关键词prompt"""
         prompt = f"""
         请根据以下学术论文信息，生成该论文的核心技术关键词（不超过5个）：
 
@@ -77,17 +152,15 @@ class PaperSummarizer:
         {abstract}
 
         注意：
-        1. 输出格式为JSON列表，列表中每个元素为技术关键词；
+        1. 输出格式为JSON对象，keywords字段为技术关键词列表；
         2. 关键词应该是具体的技术术语，避免使用"机器学习"、"深度学习"等过于泛化的词汇；
         3. 关键词数量不能超过5个；
         4. 优先使用中文，但对于专有名词可以保留英文；
         5. 关键词应该能够准确反映论文的技术贡献和创新点。
 
-        输出示例：["VLA", "Agent", "多模态学习", "强化学习", "大语言模型"]
+        输出示例：{{"keywords": ["VLA", "Agent", "多模态学习", "强化学习", "大语言模型"]}}
         """
-        keywords_response = self.llm.invoke(prompt).content.strip()
-        keywords = format_json_block(keywords_response)
-        return keywords
+        return prompt
 
 
     def convert_date_to_chinese(self, date_str: str) -> str:
@@ -131,24 +204,44 @@ class PaperSummarizer:
             return date_str
 
 
-    def summarize_papers_from_json(self, input_file: str, output_file: str):
+    def summarize_papers_from_json(self, input_file: str, output_file: str, run_async=None):
         """
-        从JSON文件读取论文详情并生成中文版本
+        读取论文详情并生成中文版本
         Args:
-            input_file: 输入的英文论文详情JSON文件路径
-            output_file: 输出的中文论文详情JSON文件路径
+            input_file: 输入的英文论文详情JSON文件路径，为None或文件不存在时从产物库读取该周数据
+            output_file: 输出的中文论文详情JSON文件路径，其所在目录名作为产物库中的周标识
+            run_async: 异步模式下执行协程的函数，批量模式传入共享运行时的常驻事件循环，默认asyncio.run
         """
-        # 设置代理
-        set_proxy()
+        store = get_artifact_store()
+        scope = os.path.basename(os.path.dirname(os.path.abspath(output_file)))
 
-        print(f"正在读取论文详情文件: {input_file}")
-        
-        # 读取论文详情
-        with open(input_file, "r", encoding="utf-8") as f:
-            papers_list = json.load(f)
+        # 传入的文件即pipeline按内容哈希的阶段输入，以它为准；没有文件时从产物库读取
+        if input_file and os.path.exists(input_file):
+            print(f"正在读取论文详情文件: {input_file}")
+            with open(input_file, "r", encoding="utf-8") as f:
+                papers_list = json.load(f)
+        else:
+            papers_list = store.list_records('papers', scope)
         
         print(f"找到 {len(papers_list)} 篇论文，开始处理...")
+
+        if self.concurrency > 1:
+            print(f"异步并发模式，LLM并发数: {self.concurrency}")
+            zh_papers_list = (run_async or asyncio.run)(self.asummarize_papers(papers_list))
+        else:
+            zh_papers_list = self.summarize_papers(papers_list)
+        
+        # 中文版本写入产物库，并导出JSON供模板填充使用
+        store.put_summaries('paper_zh', scope, zh_papers_list, key_field='hf_url')
+        store.export_json(zh_papers_list, output_file, indent=2)
         
+        print(f"\n✅ 处理完成！")
+        print(f"总共处理 {len(zh_papers_list)} 篇论文")
+        print(f"中文版本已保存到: {output_file}")
+
+
+    def summarize_papers(self, papers_list: list) -> list:
+        """逐篇顺序处理论文"""
         zh_papers_list = []
         
         for i, paper in enumerate(papers_list):
@@ -178,22 +271,40 @@ class PaperSummarizer:
 
             zh_papers_list.append(zh_paper)
             print(f"  ✓ 完成处理论文: {paper.get('title', 'Unknown')}")
-        
-        # 确保输出目录存在
-        output_dir = os.path.dirname(output_file)
-        if output_dir:
-            os.makedirs(output_dir, exist_ok=True)
-        
-        # 保存中文版本
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(zh_papers_list, f, ensure_ascii=False, indent=2)
-        
-        print(f"\n✅ 处理完成！")
-        print(f"总共处理 {len(zh_papers_list)} 篇论文")
-        print(f"中文版本已保存到: {output_file}")
 
-        # 取消代理
-        unset_proxy()
+        return zh_papers_list
+
+
+    async def asummarize_paper(self, i: int, total: int, paper: dict) -> dict:
+        """异步处理单篇论文，三个prompt同时发出；字段顺序与顺序模式一致"""
+        zh_ai_summary, zh_abstract, keywords = await asyncio.gather(
+            self.atranslate_abstract(paper['ai_summary']) if paper['ai_summary'] else asyncio.sleep(0, result=""),
+            self.atranslate_abstract(paper['abstract']),
+            self.agenerate_paper_keywords(
+                paper.get('title', ''),
+                paper.get('ai_summary', ''),
+                paper.get('abstract', '')
+            )
+        )
+
+        zh_paper = paper.copy()
+        zh_paper['zh_ai_summary'] = zh_ai_summary
+        zh_paper['zh_abstract'] = zh_abstract
+        zh_paper['keywords'] = keywords
+        zh_paper['zh_published_date'] = self.convert_date_to_chinese(paper['published_date'])
+        print(f"  ✓ 完成处理论文 ({i+1}/{total}): {paper.get('title', 'Unknown')}")
+        return zh_paper
+
+
+    async def asummarize_papers(self, papers_list: list) -> list:
+        """所有论文的所有prompt并发执行，受concurrency和限流器约束，结果保持原顺序"""
+        # Semaphore需在事件循环内创建
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        total = len(papers_list)
+        return await asyncio.gather(*[
+            self.asummarize_paper(i, total, paper) for i, paper in enumerate(papers_list)
+        ])
+
 
 
 
@@ -201,8 +312,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='论文摘要翻译器')
     parser.add_argument('--input_file', type=str, default=os.path.join(PAPER_EXPRESS_ROOT_PATH,'2025_W25/all_papers_details.json'), help='输入的英文论文详情JSON文件路径')
     parser.add_argument('--output_file', type=str, default=os.path.join(PAPER_EXPRESS_ROOT_PATH, '2025_W25/zh_all_papers_details.json'), help='输出的中文论文详情JSON文件路径')
+    parser.add_argument('--concurrency', type=int, default=1, help='LLM并发请求数，大于1时启用异步模式')
+    parser.add_argument('--rps', type=float, default=None, help='LLM每秒请求数上限')
     
     args = parser.parse_args()
     
-    summarizer = PaperSummarizer()
+    summarizer = PaperSummarizer(concurrency=args.concurrency, requests_per_second=args.rps)
     summarizer.summarize_papers_from_json(args.input_file, args.output_file)
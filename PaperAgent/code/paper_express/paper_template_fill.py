@@ -13,7 +13,7 @@ import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import PAPER_EXPRESS_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import safe_title_func, get_previous_week
+from utils import safe_title_func, get_previous_week, parse_keywords
 
 
 class PaperTemplateFiller():
@@ -45,8 +45,7 @@ class PaperTemplateFiller():
         paper_html_list = []
         for data in data_list:
             # 预处理下相关元素
-            data['keywords'] = eval(data['keywords'])
-            data['keywords'] = ', '.join(data['keywords'])
+            data['keywords'] = ', '.join(parse_keywords(data['keywords']))
             data['authors'] = ', '.join(data['authors'])
 
             # 准备标题html
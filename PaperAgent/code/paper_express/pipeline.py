@@ -6,6 +6,11 @@ CreateDay: 20250129
 Author: HongfengAi
 History:
 20250129    HongfengAi  第一版
+20261018    HongfengAi  改为声明式阶段图，按内容哈希跳过未变化的阶段，无需人工交互
+20261018    HongfengAi  新增--weeks批量模式，多周共享预热的模型、浏览器池和LLM客户端
+20261018    HongfengAi  各阶段依赖的模块改为阶段执行时才导入，缩短启动时间
+20261018    HongfengAi  论文详情按篇记录进度，中断后重跑从断点继续
+20261018    HongfengAi  有论文爬取失败时details阶段记为失败，下次运行时重试
 """
 
 import sys, os
@@ -18,14 +23,126 @@ import argparse
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import PAPER_EXPRESS_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from crawler.paper_list_crawler import HFWeeklyPapersCrawler
-from crawler.paper_details_crawler import PaperDetailsCrawler
-from paper_express.paper_summarizer import PaperSummarizer
-from paper_express.paper_template_fill import PaperTemplateFiller
-from utils import get_previous_week
-from wechat_utils.upload_material import WeChatPermanentMaterialUploader
-from wechat_utils.create_draft import WeChatDraftCreator
-from wechat_utils.ppt_to_image import PPTToImage
+# 爬虫（selenium/PyMuPDF/TF-ID）、LLM（langchain）和封面（pptx/win32com）相关模块都较重，
+# 在各阶段函数内按需导入：阶段全部命中时不会加载这些库
+from utils import get_previous_week, parse_weeks, report_llm_stats
+from pipeline_runner import Stage, PipelineRunner, SharedRuntime, run_batch, STATUS_FAILED
+
+
+def build_pipeline(year, week, args, runtime: SharedRuntime) -> PipelineRunner:
+    """
+    构建某一周论文速递的阶段图
+    list -> details -> summarize -> template -> draft，cover -> upload -> draft，
+    cover不依赖论文数据，与list/details/summarize并发执行
+
+    Args:
+        year: 年份
+        week: 周数，如W25
+        args: 命令行参数
+        runtime: 共享运行时，批量模式下多周共用同一个
+    """
+    data_dir = f'{PAPER_EXPRESS_ROOT_PATH}/{year}_{week}'
+    paper_list_file = f'{data_dir}/paper_list_{year}-{week}.json'
+    all_papers_details_file = f'{data_dir}/all_papers_details.json'
+    zh_papers_details_file = f'{data_dir}/zh_all_papers_details.json'
+    cover_image_file = f'{data_dir}/cover/cover.png'
+    cover_result_file = f'{data_dir}/cover/cover.json'
+    html_file = f'{data_dir}/zh_all_papers_express.html'
+    title = f"HF论文速递 | {year}年第{week[1:]}周AI精选热门论文"
+    # 已爬取的论文记录在进度日志中，默认跳过；--force details 时全部重新爬取
+    resume_details = not ('all' in args.force or 'details' in args.force)
+
+    def crawl_list():
+        from crawler.paper_list_crawler import HFWeeklyPapersCrawler
+        papers_list = HFWeeklyPapersCrawler().crawl_specific_week(year, week, args.topk)
+        if not papers_list:
+            raise RuntimeError("没有获取到论文数据")
+        print(f"[论文列表] ✓ 爬取完成，共获取 {len(papers_list)} 篇论文")
+
+    def crawl_details():
+        from pdf_utils.tf_id_model import unload_tf_id_model
+        # 爬虫每篇论文使用独立副本，可在多周之间共享；TF-ID模型批量模式下常驻，单周模式用完即卸载
+        details_crawler = runtime.get('details_crawler', new_details_crawler)
+        details_crawler.warmup_model()
+        try:
+            failed_urls = details_crawler.crawl_papers_details_from_list(paper_list_file, data_dir, args.topk,
+                                                                         workers=args.workers, resume=resume_details)
+        finally:
+            if not runtime.keep_warm:
+                unload_tf_id_model()
+        # 有论文爬取失败时阶段记为失败，下次运行时重跑本阶段（已爬取的论文从进度日志跳过）
+        if failed_urls:
+            raise RuntimeError(f"{len(failed_urls)} 篇论文爬取失败: {failed_urls}")
+
+    def new_details_crawler():
+        from crawler.paper_details_crawler import PaperDetailsCrawler
+        from pdf_utils.tf_id_model import unload_tf_id_model
+        runtime.on_close(unload_tf_id_model)
+        return PaperDetailsCrawler()
+
+    def summarize():
+        # 多周共用一个summarizer（同一个LLM客户端和限流器），异步请求跑在运行时的常驻事件循环上
+        from paper_express.paper_summarizer import PaperSummarizer
+        summarizer = runtime.get('summarizer', lambda: PaperSummarizer(concurrency=args.llm_concurrency,
+                                                                       requests_per_second=args.llm_rps))
+        summarizer.summarize_papers_from_json(all_papers_details_file, zh_papers_details_file,
+                                              run_async=runtime.run_async)
+
+    def make_cover():
+        from wechat_utils.ppt_to_image import PPTToImage
+        PPTToImage().main(year=year, week=week)
+
+    def fill_template():
+        from paper_express.paper_template_fill import PaperTemplateFiller
+        PaperTemplateFiller().paper_template_fill(year, week)
+
+    def upload_cover():
+        from wechat_utils.upload_material import WeChatPermanentMaterialUploader
+        upload_result = WeChatPermanentMaterialUploader().upload_specific_file(cover_image_file)
+        if not upload_result.get('success'):
+            raise RuntimeError(f"封面图上传失败: {upload_result.get('error', '未知错误')}")
+
+    def create_draft():
+        from wechat_utils.create_draft import WeChatDraftCreator
+        result = WeChatDraftCreator().create_draft(comp_type="paper_express", title=title, year=year, week=week)
+        if 'errcode' in result:
+            raise RuntimeError(f"草稿创建失败: {result.get('errcode')}: {result.get('errmsg')}")
+
+    runner = PipelineRunner(name=f"论文速递 {year}_{week}",
+                            state_path=f'{data_dir}/.pipeline_state.json',
+                            max_workers=args.max_parallel,
+                            force=args.force,
+                            dry_run=args.dry_run)
+    runner.add(Stage('list', crawl_list,
+                     outputs=[paper_list_file],
+                     code=['crawler.paper_list_crawler'],
+                     config={'year': year, 'week': week, 'topk': args.topk}))
+    runner.add(Stage('details', crawl_details,
+                     inputs=[paper_list_file],
+                     outputs=[all_papers_details_file],
+                     code=['crawler.paper_details_crawler', 'pdf_utils.tf_id_detector'],
+                     config={'topk': args.topk}))
+    runner.add(Stage('summarize', summarize,
+                     inputs=[all_papers_details_file],
+                     outputs=[zh_papers_details_file],
+                     code=['paper_express.paper_summarizer'],
+                     resource='llm'))
+    runner.add(Stage('cover', make_cover,
+                     outputs=[cover_image_file],
+                     code=['wechat_utils.ppt_to_image'],
+                     config={'year': year, 'week': week},
+                     resource='wps'))
+    runner.add(Stage('template', fill_template,
+                     inputs=[zh_papers_details_file],
+                     outputs=[html_file],
+                     code=['paper_express.paper_template_fill']))
+    runner.add(Stage('upload', upload_cover,
+                     inputs=[cover_image_file],
+                     outputs=[cover_result_file]))
+    runner.add(Stage('draft', create_draft,
+                     inputs=[html_file, cover_result_file],
+                     config={'title': title}))
+    return runner
 
 
 if __name__ == '__main__':
@@ -38,192 +155,47 @@ if __name__ == '__main__':
     parser.add_argument('--topk', type=int, default=10, help='获取前k篇论文')
     parser.add_argument('--year', type=int, help='指定年份')
     parser.add_argument('--week', type=str, help='指定周数，如W25')
+    parser.add_argument('--workers', type=int, default=1, help='并发爬取论文详情的worker数')
+    parser.add_argument('--llm_concurrency', type=int, default=1, help='翻译总结时的LLM并发请求数，大于1时启用异步模式')
+    parser.add_argument('--llm_rps', type=float, default=None, help='翻译总结时LLM每秒请求数上限')
+    parser.add_argument('--refresh_llm_cache', action='store_true', help='不读取LLM响应缓存，强制重新请求')
+    parser.add_argument('--max_parallel', type=int, default=2, help='同时执行的阶段数上限')
+    parser.add_argument('--force', nargs='*', default=[], help='强制重新执行的阶段，如 summarize template，all表示全部')
+    parser.add_argument('--dry_run', action='store_true', help='只打印各阶段是否需要执行，不实际执行')
+    parser.add_argument('--weeks', type=str, default=None, help='批量模式要处理的周，如 2025-W20:2025-W32 或 2025-W20,2025-W22')
+    parser.add_argument('--max_items', type=int, default=2, help='批量模式同时处理的周数')
+    parser.add_argument('--max_stages', type=int, default=None, help='批量模式所有周合计同时执行的阶段数上限')
     args = parser.parse_args()
+    if args.refresh_llm_cache:
+        from llm_cache import get_llm_cache_store
+        get_llm_cache_store().bypass = True
     
     # 确定要处理的年份和周数
-    if args.year and args.week:
-        year, week = args.year, args.week
-    else:
-        year, week = get_previous_week()
-        print(f"自动获取上一周: {year}年 {week}")
-    
-    topk = args.topk
-    data_dir = f'{PAPER_EXPRESS_ROOT_PATH}/{year}_{week}'
-    
-    print(f"处理时间: {year}年 {week}")
-    print(f"获取论文数量: {topk}")
-    print(f"数据目录: {data_dir}")
-    
-    ############################
-    # 1、爬取论文列表
-    ############################
-    print("\n" + "="*60)
-    print("步骤1: 爬取论文列表")
-    print("="*60)
-    
-    paper_list_file = f'{data_dir}/paper_list_{year}-{week}.json'
-    
-    if os.path.exists(paper_list_file):
-        print(f"发现已存在的论文列表: {paper_list_file}")
-        user_input = input("是否需要重新爬取论文列表? (y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[论文列表] ✓ 跳过爬取 (使用现有数据)")
-            with open(paper_list_file, 'r', encoding='utf-8') as f:
-                papers_list = json.load(f)
-        else:
-            stime = time.time()
-            crawler = HFWeeklyPapersCrawler()
-            papers_list = crawler.crawl_specific_week(year, week, topk)
-            etime = time.time()
-            print(f"[论文列表] ✓ 爬取完成，共获取 {len(papers_list)} 篇论文，耗时 {etime-stime:.2f} 秒")
+    if args.weeks:
+        weeks = parse_weeks(args.weeks)
+        print(f"批量模式: 共 {len(weeks)} 周，同时处理 {args.max_items} 周")
+    elif args.year and args.week:
+        weeks = [(args.year, args.week)]
     else:
-        stime = time.time()
-        crawler = HFWeeklyPapersCrawler()
-        papers_list = crawler.crawl_specific_week(year, week, topk)
-        etime = time.time()
-        print(f"[论文列表] ✓ 爬取完成，共获取 {len(papers_list)} 篇论文，耗时 {etime-stime:.2f} 秒")
-    
-    if not papers_list:
-        print("[论文列表] ❌ 没有获取到论文数据，程序结束。")
-        exit()
-    
-    ############################
-    # 2、爬取论文详情
-    ############################
-    print("\n" + "="*60)
-    print("步骤2: 爬取论文详情")
-    print("="*60)
-    
-    all_papers_details_file = f'{data_dir}/all_papers_details.json'
-    
-    if os.path.exists(all_papers_details_file):
-        print(f"发现已存在的论文详情: {all_papers_details_file}")
-        user_input = input("是否需要重新爬取论文详情? (y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[论文详情] ✓ 跳过爬取 (使用现有数据)")
-            with open(all_papers_details_file, 'r', encoding='utf-8') as f:
-                papers_details = json.load(f)
+        weeks = [get_previous_week()]
+        print(f"自动获取上一周: {weeks[0][0]}年 {weeks[0][1]}")
+
+    for year, week in weeks:
+        print(f"处理时间: {year}年 {week}，数据目录: {PAPER_EXPRESS_ROOT_PATH}/{year}_{week}")
+    print(f"获取论文数量: {args.topk}")
+
+    # 所有周共享一个运行时：浏览器池、HTTP客户端、access_token本身就是进程级单例，模型和LLM客户端由runtime复用
+    runtime = SharedRuntime(keep_warm=len(weeks) > 1)
+    try:
+        runners = [build_pipeline(year, week, args, runtime) for year, week in weeks]
+        if len(runners) == 1:
+            all_results = [runners[0].run()]
         else:
-            stime = time.time()
-            details_crawler = PaperDetailsCrawler()
-            details_crawler.crawl_papers_details_from_list(paper_list_file, data_dir, topk)
-            etime = time.time()
-            print(f"[论文详情] ✓ 爬取完成，耗时 {etime-stime:.2f} 秒")
-    else:
-        stime = time.time()
-        details_crawler = PaperDetailsCrawler()
-        details_crawler.crawl_papers_details_from_list(paper_list_file, data_dir, topk)
-        etime = time.time()
-        print(f"[论文详情] ✓ 爬取完成，耗时 {etime-stime:.2f} 秒")
-    
-    
-    ############################
-    # 3、翻译和总结论文
-    ############################
-    print("\n" + "="*60)
-    print("步骤3: 翻译和总结论文")
-    print("="*60)
-    
-    zh_papers_details_file = f'{data_dir}/zh_all_papers_details.json'
-    
-    if os.path.exists(zh_papers_details_file):
-        print(f"发现已存在的中文论文详情: {zh_papers_details_file}")
-        user_input = input("是否需要重新翻译和总结论文? (y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[论文翻译] ✓ 跳过翻译 (使用现有数据)")
-        else:
-            stime = time.time()
-            summarizer = PaperSummarizer()
-            summarizer.summarize_papers_from_json(all_papers_details_file, zh_papers_details_file)
-            etime = time.time()
-            print(f"[论文翻译] ✓ 翻译完成，耗时 {etime-stime:.2f} 秒")
-    else:
-        stime = time.time()
-        summarizer = PaperSummarizer()
-        summarizer.summarize_papers_from_json(all_papers_details_file, zh_papers_details_file)
-        etime = time.time()
-        print(f"[论文翻译] ✓ 翻译完成，耗时 {etime-stime:.2f} 秒")
-
-    ############################
-    # 4、制作封面图
-    ############################
-    print("\n" + "="*60)
-    print("制作封面图")
-    print("="*60)
-
-    # 检查是否已存在封面图文件
-    cover_image_file_path = f'{PAPER_EXPRESS_ROOT_PATH}/{year}_{week}/cover/cover.png'
-    if os.path.exists(cover_image_file_path):
-        print(f"发现已存在的封面图: {cover_image_file_path}")
-        user_input = input(f"是否需要重新制作封面图？(y/N): ").strip().lower()
-
-        if user_input not in ['y', 'yes']:
-            print(f"[封面图] ✓ 跳过: {year}_{week} (使用现有数据)")
-        else:
-            ppt_to_image = PPTToImage()
-            ppt_to_image.main(year=year,
-                              week=week)
-            print(f"[封面图] ✓ 制作完成: {year}_{week}")
-    else:    
-        ppt_to_image = PPTToImage()
-        ppt_to_image.main(year=year,
-                          week=week)
-        print(f"[封面图] ✓ 制作完成: {year}_{week}")
-
-    ############################
-    # 5、填充HTML模板
-    ############################
-    print("\n" + "="*60)
-    print("步骤4: 填充HTML模板")
-    print("="*60)
-    
-    html_file = f'{data_dir}/zh_all_papers_express.html'
-    
-    if os.path.exists(html_file):
-        print(f"发现已存在的HTML文件: {html_file}")
-        user_input = input("是否需要重新填充HTML模板? (y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[HTML模板] ✓ 跳过填充 (使用现有数据)")
-        else:
-            template_filler = PaperTemplateFiller()
-            template_filler.paper_template_fill(year, week)
-            print(f"[HTML模板] ✓ 填充完成")
-    else:
-        template_filler = PaperTemplateFiller()
-        template_filler.paper_template_fill(year, week)
-        print(f"[HTML模板] ✓ 填充完成")
-
-
-
-    ############################
-    # 5、上传封面图至公众号平台
-    ############################
-    print("\n" + "="*60)
-    print("上传封面图至公众号平台")
-    print("="*60)
-
-    # 检查是否已存在封面图文件
-    cover_image_file_path = f'{PAPER_EXPRESS_ROOT_PATH}/{year}_{week}/cover/cover.png'
-    wechat_uploader = WeChatPermanentMaterialUploader()
-    upload_result= wechat_uploader.upload_specific_file(cover_image_file_path)
-    print(f"[封面图] ✓ 上传完成！")
-
-
-    ############################
-    # 6、创建草稿至公众号平台
-    ############################
-    print("\n" + "="*60)
-    print("创建草稿至公众号平台")
-    print("="*60)
+            all_results = list(run_batch(runners, max_items=args.max_items, max_stages=args.max_stages).values())
+    finally:
+        runtime.close()
 
-    wechat_draft_creator = WeChatDraftCreator()
-    wechat_draft_creator.create_draft(comp_type="paper_express",
-                                      title=f"HF论文速递 | {year}年第{week[1:]}周AI精选热门论文",
-                                      year=year,
-                                      week=week)
-    print(f"[草稿] ✓ 创建完成！")
+    report_llm_stats()
 
+    if any(STATUS_FAILED in results.values() for results in all_results):
+        sys.exit(1)
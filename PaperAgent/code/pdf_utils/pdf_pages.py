@@ -0,0 +1,62 @@
+"""
+Function: 基于PyMuPDF的流式PDF页面渲染
+一次只渲染一页，页面被消费后立即释放pixmap，避免整本PDF的图片同时驻留内存
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+"""
+import fitz  # pip install pymupdf
+from PIL import Image
+
+
+def iter_pdf_pages(source, dpi: int = 200, first_page: int = None, last_page: int = None):
+    """
+    逐页渲染PDF为PIL图片的生成器
+
+    Args:
+        source: PDF文件路径、PDF字节内容或已打开的fitz.Document
+        dpi: 渲染分辨率，默认200（与pdf2image默认值一致）
+        first_page: 起始页码（从1开始，包含），None表示第一页
+        last_page: 结束页码（从1开始，包含），None表示最后一页
+    Yields:
+        tuple: (页码(从0开始), PIL.Image)
+    """
+    # 传入已打开的文档时由调用方负责关闭
+    own_doc = not isinstance(source, fitz.Document)
+    if not own_doc:
+        pdf_doc = source
+    elif isinstance(source, (bytes, bytearray)):
+        pdf_doc = fitz.open(stream=source, filetype="pdf")
+    else:
+        pdf_doc = fitz.open(source)
+
+    try:
+        start = max(1, first_page or 1) - 1
+        stop = min(pdf_doc.page_count, last_page or pdf_doc.page_count)
+        zoom = dpi / 72.0
+        matrix = fitz.Matrix(zoom, zoom)
+
+        for page_no in range(start, stop):
+            page = pdf_doc.load_page(page_no)
+            pix = page.get_pixmap(matrix=matrix, alpha=False)
+            image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            # 像素数据已拷贝到PIL图片，立即释放pixmap
+            pix = None
+            page = None
+            yield page_no, image
+    finally:
+        if own_doc:
+            pdf_doc.close()
+
+
+def get_pdf_page_count(source) -> int:
+    """获取PDF页数"""
+    if isinstance(source, fitz.Document):
+        return source.page_count
+    if isinstance(source, (bytes, bytearray)):
+        with fitz.open(stream=source, filetype="pdf") as pdf_doc:
+            return pdf_doc.page_count
+    with fitz.open(source) as pdf_doc:
+        return pdf_doc.page_count
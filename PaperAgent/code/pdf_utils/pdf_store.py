@@ -0,0 +1,223 @@
+"""
+Function: 论文PDF的本地内容寻址存储
+按arXiv ID索引，同一篇论文的PDF只下载一次，封面渲染、GitHub URL提取、图表抽取共用同一份文件；
+再次使用时通过ETag/Last-Modified做条件请求校验是否有更新
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+20261018    HongfengAi  PyMuPDF改为打开文档时才导入
+20261018    HongfengAi  只从arxiv.org的abs/pdf链接和HF论文链接解析arXiv ID，避免其他链接误判为arXiv论文
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from configs import USER_AGENT, PDF_CACHE_ROOT_PATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_client import get_http_client
+
+
+# 匹配新旧两种arXiv ID，如 2506.13585、2506.13585v2、cs/0112017
+ARXIV_ID_PATTERN = re.compile(r'(\d{4}\.\d{4,5}(?:v\d+)?|[a-z\-]+(?:\.[A-Z]{2})?/\d{7}(?:v\d+)?)')
+
+# 可解析出arXiv ID的链接：host -> 路径前缀
+ARXIV_URL_PREFIXES = {
+    'arxiv.org': ('/abs/', '/pdf/'),
+    'export.arxiv.org': ('/abs/', '/pdf/'),
+    'huggingface.co': ('/papers/',),
+}
+
+
+def parse_arxiv_id(url_or_id: str):
+    """
+    从HF论文链接、arXiv abs/pdf链接或ID本身解析出arXiv ID
+
+    Args:
+        url_or_id: 如 https://huggingface.co/papers/2506.13585、https://arxiv.org/pdf/2506.13585v1
+    Returns:
+        str or None: arXiv ID
+    """
+    if not url_or_id:
+        return None
+    if '://' in url_or_id:
+        # 只认arxiv.org的abs/pdf链接和HF论文链接，其他站点即使路径中含有形似ID的片段也不视为arXiv论文
+        parsed = urlparse(url_or_id)
+        host = parsed.netloc.lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        prefix = next((prefix for prefix in ARXIV_URL_PREFIXES.get(host, ()) if parsed.path.startswith(prefix)), None)
+        if prefix is None:
+            return None
+        tail = parsed.path[len(prefix):].rstrip('/')
+    else:
+        tail = url_or_id.strip()
+    if tail.endswith('.pdf'):
+        tail = tail[:-4]
+    match = ARXIV_ID_PATTERN.fullmatch(tail)
+    return match.group(1) if match else None
+
+
+class PDFArtifactStore:
+    """论文PDF存储：objects/下按SHA-256存放文件，index.json记录arXiv ID到文件的映射"""
+
+    def __init__(self, root_dir: str = PDF_CACHE_ROOT_PATH, max_age: int = 24 * 3600):
+        """
+        Args:
+            root_dir: 存储根目录
+            max_age: 缓存超过该秒数后，下次使用前做一次条件请求重新校验
+        """
+        self.root_dir = root_dir
+        self.objects_dir = os.path.join(root_dir, "objects")
+        self.index_path = os.path.join(root_dir, "index.json")
+        self.max_age = max_age
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self._index = self._load_index()
+        self._index_lock = threading.Lock()
+        # 每个key一把锁，避免并发时同一篇论文被重复下载
+        self._key_locks = {}
+
+    def _load_index(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"读取PDF索引失败，将重新建立: {e}")
+            return {}
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._index_lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], f"{sha256}.pdf")
+
+    def _resolve(self, url_or_id: str):
+        """返回 (key, pdf_url)，arXiv论文统一使用arxiv.org/pdf链接"""
+        arxiv_id = parse_arxiv_id(url_or_id)
+        if arxiv_id:
+            return arxiv_id, f"https://arxiv.org/pdf/{arxiv_id}"
+        # 非arXiv链接退化为按URL哈希索引
+        return "url-" + hashlib.sha256(url_or_id.encode('utf-8')).hexdigest()[:16], url_or_id
+
+    def _fetch(self, key: str, pdf_url: str, entry: dict = None):
+        """下载PDF，entry不为空时带上条件请求头；返回新的索引项"""
+        headers = {'User-Agent': USER_AGENT}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = get_http_client().get(pdf_url, proxy=True, headers=headers, timeout=60)
+
+        if entry and response.status_code == 304:
+            print(f"PDF未更新，继续使用缓存: {key}")
+            return {**entry, 'checked_at': time.time()}
+
+        response.raise_for_status()
+        content = response.content
+        sha256 = hashlib.sha256(content).hexdigest()
+        object_path = self._object_path(sha256)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp_path = object_path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, object_path)
+        print(f"PDF已下载并缓存: {key} ({len(content) // 1024} KB)")
+
+        return {
+            'url': pdf_url,
+            'sha256': sha256,
+            'size': len(content),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'checked_at': time.time(),
+        }
+
+    def get_pdf_path(self, url_or_id: str, revalidate: bool = None) -> str:
+        """
+        获取论文PDF的本地路径，必要时下载或重新校验
+
+        Args:
+            url_or_id: HF论文链接、arXiv链接或arXiv ID
+            revalidate: True强制做条件请求校验，False从不校验，None表示超过max_age才校验
+        Returns:
+            str: 本地PDF路径
+        """
+        key, pdf_url = self._resolve(url_or_id)
+        with self._key_lock(key):
+            entry = self._index.get(key)
+            if entry and not os.path.exists(self._object_path(entry['sha256'])):
+                entry = None
+
+            if entry is None:
+                new_entry = self._fetch(key, pdf_url)
+            else:
+                if revalidate is None:
+                    revalidate = time.time() - entry.get('checked_at', 0) > self.max_age
+                if not revalidate:
+                    return self._object_path(entry['sha256'])
+                try:
+                    new_entry = self._fetch(key, pdf_url, entry)
+                except requests.RequestException as e:
+                    # 校验失败时继续使用旧文件
+                    print(f"PDF重新校验失败，使用缓存: {e}")
+                    return self._object_path(entry['sha256'])
+
+            with self._index_lock:
+                self._index[key] = new_entry
+                self._save_index()
+            return self._object_path(new_entry['sha256'])
+
+    @contextmanager
+    def open_document(self, url_or_id: str, revalidate: bool = None):
+        """
+        以fitz.Document形式打开论文PDF（按需读取文件，不整体载入内存）
+
+        Example:
+            with store.open_document(hf_url) as pdf_doc:
+                first_page = pdf_doc[0]
+        """
+        import fitz  # pip install pymupdf
+
+        pdf_doc = fitz.open(self.get_pdf_path(url_or_id, revalidate=revalidate))
+        try:
+            yield pdf_doc
+        finally:
+            pdf_doc.close()
+
+
+_PDF_STORE = None
+_PDF_STORE_LOCK = threading.Lock()
+
+
+def get_pdf_store() -> PDFArtifactStore:
+    """获取进程内共享的PDF存储"""
+    global _PDF_STORE
+    if _PDF_STORE is None:
+        with _PDF_STORE_LOCK:
+            if _PDF_STORE is None:
+                _PDF_STORE = PDFArtifactStore()
+    return _PDF_STORE
@@ -0,0 +1,110 @@
+"""
+Function: TF-ID表格/图片检测引擎
+按micro-batch把多页送入模型推理，页面按需流式渲染，检测数量达到上限后不再调度新的batch
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+20261018    HongfengAi  页面渲染模块改为检测时才导入
+"""
+import os
+import sys
+import threading
+from itertools import islice
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdf_utils.tf_id_model import DEFAULT_TF_ID_MODEL_ID, get_tf_id_model
+
+
+# 模型在进程内共享，多个爬取worker并发时串行推理，避免同时占满CPU/显存
+_INFERENCE_LOCK = threading.Lock()
+
+
+class TFIDDetector:
+    """TF-ID批量检测器"""
+
+    def __init__(self,
+                 model_id: str = DEFAULT_TF_ID_MODEL_ID,
+                 batch_size: int = 4,
+                 max_new_tokens: int = 1024,
+                 num_beams: int = 3):
+        self.model_id = model_id
+        self.batch_size = max(1, int(batch_size))
+        self.max_new_tokens = max_new_tokens
+        self.num_beams = num_beams
+        self.prompt = "<OD>"
+
+    def detect_batch(self, images: list) -> list:
+        """
+        对一个batch的页面图片做一次推理
+
+        Args:
+            images: PIL.Image列表
+        Returns:
+            list: 每张图片对应的annotation，格式为 {'bboxes': [...], 'labels': [...]}
+        """
+        import torch
+
+        if not images:
+            return []
+
+        model, processor = get_tf_id_model(self.model_id)
+        inputs = processor(text=[self.prompt] * len(images), images=images, return_tensors="pt")
+        with _INFERENCE_LOCK, torch.no_grad():
+            generated_ids = model.generate(
+                input_ids=inputs["input_ids"],
+                pixel_values=inputs["pixel_values"],
+                max_new_tokens=self.max_new_tokens,
+                do_sample=False,
+                num_beams=self.num_beams
+            )
+        generated_texts = processor.batch_decode(generated_ids, skip_special_tokens=False)
+
+        annotations = []
+        for image, generated_text in zip(images, generated_texts):
+            annotation = processor.post_process_generation(generated_text, task=self.prompt, image_size=(image.width, image.height))
+            annotations.append(annotation[self.prompt])
+        return annotations
+
+    def iter_detections(self, pages, max_objects: int = None):
+        """
+        按batch消费页面并检测，检测到的目标数达到max_objects后停止调度新batch
+
+        Args:
+            pages: 可迭代的 (页码, PIL.Image)，建议传入iter_pdf_pages等惰性生成器
+            max_objects: 目标数上限，None表示处理所有页面
+        Yields:
+            tuple: (页码, PIL.Image, annotation)，按页码顺序输出
+        """
+        pages = iter(pages)
+        found = 0
+        while max_objects is None or found < max_objects:
+            batch = list(islice(pages, self.batch_size))
+            if not batch:
+                break
+
+            annotations = self.detect_batch([image for _, image in batch])
+            for (page_no, image), annotation in zip(batch, annotations):
+                found += len(annotation.get('bboxes', []))
+                yield page_no, image, annotation
+
+    def iter_pdf_detections(self, source, max_objects: int = None, dpi: int = 200,
+                            first_page: int = None, last_page: int = None):
+        """
+        直接对PDF做检测，页面流式渲染
+
+        Args:
+            source: PDF文件路径、PDF字节内容或已打开的fitz.Document
+            max_objects: 目标数上限，None表示处理所有页面
+            dpi: 渲染分辨率
+            first_page: 起始页码（从1开始，包含）
+            last_page: 结束页码（从1开始，包含）
+        """
+        from pdf_utils.pdf_pages import iter_pdf_pages
+
+        pages = iter_pdf_pages(source, dpi=dpi, first_page=first_page, last_page=last_page)
+        try:
+            yield from self.iter_detections(pages, max_objects=max_objects)
+        finally:
+            pages.close()
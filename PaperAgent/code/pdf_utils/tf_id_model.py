@@ -0,0 +1,77 @@
+"""
+Function: TF-ID模型/处理器的进程级共享注册表
+同一进程内所有TF-ID调用方共享一份模型，首次使用时才加载，避免每篇论文重复加载模型
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+"""
+import threading
+
+
+# 默认使用的TF-ID模型
+DEFAULT_TF_ID_MODEL_ID = "yifeihu/TF-ID-base"
+
+# model_id -> (model, processor)
+_TF_ID_REGISTRY = {}
+_TF_ID_LOCK = threading.Lock()
+
+
+def get_tf_id_model(model_id: str = DEFAULT_TF_ID_MODEL_ID):
+    """
+    获取TF-ID模型和处理器，首次调用时加载，之后直接复用
+
+    Args:
+        model_id: HuggingFace上的模型ID
+    Returns:
+        tuple: (model, processor)
+    """
+    entry = _TF_ID_REGISTRY.get(model_id)
+    if entry is not None:
+        return entry
+
+    with _TF_ID_LOCK:
+        # 双重检查，避免多线程下重复加载
+        entry = _TF_ID_REGISTRY.get(model_id)
+        if entry is None:
+            from transformers import AutoProcessor, AutoModelForCausalLM
+
+            model = AutoModelForCausalLM.from_pretrained(model_id, trust_remote_code=True)
+            processor = AutoProcessor.from_pretrained(model_id, trust_remote_code=True)
+            model.eval()
+            entry = (model, processor)
+            _TF_ID_REGISTRY[model_id] = entry
+            print("Model loaded: ", model_id)
+    return entry
+
+
+def warmup_tf_id_model(model_id: str = DEFAULT_TF_ID_MODEL_ID):
+    """预热：提前加载TF-ID模型，把加载耗时挪到流程开始阶段"""
+    get_tf_id_model(model_id)
+
+
+def unload_tf_id_model(model_id: str = None):
+    """
+    卸载TF-ID模型，释放内存
+
+    Args:
+        model_id: 要卸载的模型ID，None表示卸载全部
+    """
+    with _TF_ID_LOCK:
+        if model_id is None:
+            model_ids = list(_TF_ID_REGISTRY.keys())
+        else:
+            model_ids = [model_id] if model_id in _TF_ID_REGISTRY else []
+        for mid in model_ids:
+            del _TF_ID_REGISTRY[mid]
+            print("Model unloaded: ", mid)
+
+    if model_ids:
+        import gc
+        gc.collect()
+
+
+def is_tf_id_model_loaded(model_id: str = DEFAULT_TF_ID_MODEL_ID) -> bool:
+    """判断模型是否已加载"""
+    return model_id in _TF_ID_REGISTRY
@@ -0,0 +1,441 @@
+"""
+Function: 声明式的pipeline阶段图执行器
+每个阶段声明输入文件、输出文件、依赖的代码和配置，只有当输入内容哈希、代码版本或配置发生变化（或输出缺失）时才重新执行；
+互不依赖的阶段（如制作封面图与翻译总结）并发执行，全程无需人工交互，可直接用于定时任务；
+批量模式下多个pipeline（多周/多个比赛）在同一进程内共享预热好的运行时，受全局阶段并发预算约束
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+20261018    HongfengAi  新增批量模式：SharedRuntime共享运行时、run_batch全局并发预算、阶段资源互斥
+20261018    HongfengAi  code支持以模块名声明，计算指纹时不导入模块，阶段依赖的重型库只在阶段执行时加载
+20261018    HongfengAi  失败的阶段记录到状态中，下次运行时重新执行，不再被当作已有输出接管
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import inspect
+import importlib.util
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+# 阶段的执行结果
+STATUS_DONE = "done"          # 已执行并成功
+STATUS_SKIPPED = "skipped"    # 指纹未变化，跳过
+STATUS_FAILED = "failed"      # 执行出错
+STATUS_BLOCKED = "blocked"    # 上游阶段失败，未执行
+STATUS_PENDING = "pending"    # dry_run时表示需要执行
+
+# 资源名 -> 锁，声明了同一resource的阶段（跨pipeline）串行执行
+_RESOURCE_LOCKS = {}
+_RESOURCE_LOCKS_LOCK = threading.Lock()
+
+
+def _resource_lock(resource: str) -> threading.Lock:
+    with _RESOURCE_LOCKS_LOCK:
+        return _RESOURCE_LOCKS.setdefault(resource, threading.Lock())
+
+
+def _hash_path(path: str, hasher) -> None:
+    """把文件或目录的内容写入hasher，目录按相对路径排序后逐个文件计算"""
+    if os.path.isfile(path):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(block)
+    elif os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for file in sorted(files):
+                file_path = os.path.join(root, file)
+                hasher.update(os.path.relpath(file_path, path).replace(os.sep, '/').encode('utf-8'))
+                _hash_path(file_path, hasher)
+    else:
+        hasher.update(b'<missing>')
+
+
+def content_hash(path: str) -> str:
+    """计算文件或目录的内容哈希"""
+    hasher = hashlib.sha256()
+    _hash_path(path, hasher)
+    return hasher.hexdigest()
+
+
+class Stage:
+    """pipeline中的一个阶段"""
+
+    def __init__(self,
+                 name: str,
+                 fn,
+                 inputs: list = None,
+                 outputs: list = None,
+                 deps: list = None,
+                 code: list = None,
+                 config: dict = None,
+                 version: str = "",
+                 resource: str = None):
+        """
+        Args:
+            name: 阶段名称，如 list、details、summarize
+            fn: 无参可调用对象，执行该阶段
+            inputs: 输入文件或目录，内容变化时重新执行
+            outputs: 输出文件或目录，缺失时重新执行；为空表示只依据指纹判断（如上传、创建草稿）
+            deps: 额外依赖的阶段名称；输入由其他阶段产出时会自动建立依赖
+            code: 该阶段用到的类、函数、模块或模块名（如 "crawler.paper_details_crawler"），其源文件变化时重新执行；
+                  用模块名声明时只定位源文件、不导入模块，pipeline启动时无需加载阶段依赖的重型库
+            config: 影响该阶段结果的配置，变化时重新执行
+            version: 手动指定的版本号，修改后强制重新执行
+            resource: 独占资源名，如 "wps"、"llm"，声明同一资源的阶段不会同时执行
+        """
+        self.name = name
+        self.fn = fn
+        self.inputs = list(inputs or [])
+        self.outputs = list(outputs or [])
+        self.deps = list(deps or [])
+        self.code = list(code or [])
+        self.config = dict(config or {})
+        self.version = version
+        self.resource = resource
+
+    def fingerprint(self) -> str:
+        """输入内容、代码和配置的组合指纹"""
+        hasher = hashlib.sha256()
+        hasher.update(f"version:{self.version}\n".encode('utf-8'))
+        for path in self.inputs:
+            hasher.update(f"input:{path}:{content_hash(path)}\n".encode('utf-8'))
+        for source in self._code_sources():
+            hasher.update(f"code:{source}\n".encode('utf-8'))
+        hasher.update(json.dumps(self.config, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+        return hasher.hexdigest()
+
+    def _code_sources(self) -> list:
+        """阶段函数本身的源码哈希 + 依赖代码所在源文件的内容哈希"""
+        sources = []
+        try:
+            sources.append(hashlib.sha256(inspect.getsource(self.fn).encode('utf-8')).hexdigest())
+        except (OSError, TypeError):
+            sources.append(getattr(self.fn, '__qualname__', repr(self.fn)))
+        for obj in self.code:
+            try:
+                if isinstance(obj, str):
+                    spec = importlib.util.find_spec(obj)
+                    source_file = spec.origin if spec else None
+                else:
+                    source_file = inspect.getsourcefile(obj)
+            except (TypeError, ImportError, ValueError):
+                source_file = None
+            if source_file:
+                sources.append(f"{os.path.basename(source_file)}:{content_hash(source_file)}")
+            else:
+                sources.append(repr(obj))
+        return sources
+
+    def missing_outputs(self) -> list:
+        return [path for path in self.outputs if not os.path.exists(path)]
+
+
+class PipelineRunner:
+    """按依赖关系调度执行阶段，阶段状态记录在state_path中"""
+
+    def __init__(self,
+                 name: str,
+                 state_path: str,
+                 max_workers: int = 2,
+                 force: list = None,
+                 dry_run: bool = False,
+                 budget: threading.Semaphore = None):
+        """
+        Args:
+            name: pipeline名称，用于日志
+            state_path: 阶段状态文件路径（JSON）
+            max_workers: 同时执行的阶段数上限
+            force: 强制重新执行的阶段名称列表，包含 "all" 时全部重新执行
+            dry_run: 只打印每个阶段是否需要执行，不实际执行
+            budget: 多个pipeline共享的阶段并发预算，None表示只受max_workers约束
+        """
+        self.name = name
+        self.state_path = state_path
+        self.max_workers = max(1, int(max_workers))
+        self.force = set(force or [])
+        self.dry_run = dry_run
+        self.budget = budget
+        self.stages = {}
+        self._state = self._load_state()
+        self._state_lock = threading.Lock()
+
+    def add(self, stage: Stage) -> Stage:
+        if stage.name in self.stages:
+            raise ValueError(f"重复的阶段名称: {stage.name}")
+        self.stages[stage.name] = stage
+        return stage
+
+    def _load_state(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"读取pipeline状态失败，将全部重新执行: {e}")
+            return {}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _upstream(self, stage: Stage) -> set:
+        """显式依赖 + 输入由其他阶段产出的隐式依赖"""
+        producers = {}
+        for other in self.stages.values():
+            for path in other.outputs:
+                producers[os.path.normpath(path)] = other.name
+        upstream = set(stage.deps)
+        for path in stage.inputs:
+            producer = producers.get(os.path.normpath(path))
+            if producer and producer != stage.name:
+                upstream.add(producer)
+        unknown = upstream - set(self.stages)
+        if unknown:
+            raise ValueError(f"阶段 {stage.name} 依赖了不存在的阶段: {sorted(unknown)}")
+        return upstream
+
+    def _check_acyclic(self, upstream: dict):
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"阶段依赖存在环: {name}")
+            visiting.add(name)
+            for dep in upstream[name]:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in upstream:
+            visit(name)
+
+    def _should_run(self, stage: Stage, fingerprint: str, upstream_changed: bool = False):
+        """返回 (是否执行, 原因)"""
+        if "all" in self.force or stage.name in self.force:
+            return True, "强制执行"
+        missing = stage.missing_outputs()
+        if missing:
+            return True, f"输出缺失: {os.path.basename(missing[0])}"
+        record = self._state.get(stage.name)
+        if not record:
+            # 只接管从未执行过的阶段的输出；执行过的阶段即使失败也有状态记录
+            if stage.outputs and not upstream_changed:
+                # 引入阶段图之前已生成的输出：直接接管，记录当前指纹
+                if not self.dry_run:
+                    with self._state_lock:
+                        self._state[stage.name] = {'fingerprint': fingerprint, 'adopted_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+                        self._save_state()
+                return False, "接管已有输出"
+            return True, "首次执行"
+        if record.get('failed'):
+            return True, "上次执行失败"
+        if record.get('fingerprint') != fingerprint:
+            return True, "输入/代码/配置已变化"
+        return False, "指纹未变化"
+
+    def _run_stage(self, stage: Stage, fingerprint: str):
+        resource = _resource_lock(stage.resource) if stage.resource else nullcontext()
+        with resource, (self.budget or nullcontext()):
+            print(f"\n[{self.name}] ▶ 开始阶段: {stage.name}")
+            stime = time.time()
+            stage.fn()
+            duration = time.time() - stime
+        missing = stage.missing_outputs()
+        if missing:
+            raise RuntimeError(f"阶段执行后输出仍缺失: {missing}")
+
+        with self._state_lock:
+            self._state[stage.name] = {
+                'fingerprint': fingerprint,
+                'finished_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'duration': round(duration, 2),
+            }
+            self._save_state()
+        print(f"[{self.name}] ✓ 阶段完成: {stage.name}，耗时 {duration:.2f} 秒")
+
+    def run(self) -> dict:
+        """
+        执行整个阶段图
+
+        Returns:
+            dict: 阶段名称 -> 执行结果（done / skipped / failed / blocked / pending）
+        """
+        upstream = {name: self._upstream(stage) for name, stage in self.stages.items()}
+        self._check_acyclic(upstream)
+
+        results = {}
+        remaining = list(self.stages)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while remaining or running:
+                for name in list(remaining):
+                    deps = upstream[name]
+                    if any(results.get(dep) in (STATUS_FAILED, STATUS_BLOCKED) for dep in deps):
+                        results[name] = STATUS_BLOCKED
+                        remaining.remove(name)
+                        print(f"[{self.name}] ⏭ 阶段 {name} 的上游失败，未执行")
+                        continue
+                    if not all(dep in results for dep in deps):
+                        continue
+
+                    remaining.remove(name)
+                    stage = self.stages[name]
+                    fingerprint = stage.fingerprint()
+                    upstream_changed = any(results[dep] in (STATUS_DONE, STATUS_PENDING) for dep in deps)
+                    need_run, reason = self._should_run(stage, fingerprint, upstream_changed)
+                    if self.dry_run and any(results[dep] == STATUS_PENDING for dep in deps):
+                        # dry_run时上游并未真正执行，下游的输入哈希还是旧的
+                        need_run, reason = True, "上游需要执行"
+                    if not need_run:
+                        results[name] = STATUS_SKIPPED
+                        print(f"[{self.name}] ✓ 跳过阶段: {name} ({reason})")
+                    elif self.dry_run:
+                        results[name] = STATUS_PENDING
+                        print(f"[{self.name}] ○ 需要执行: {name} ({reason})")
+                    else:
+                        print(f"[{self.name}] ○ 需要执行: {name} ({reason})")
+                        running[executor.submit(self._run_stage, stage, fingerprint)] = name
+
+                if not running:
+                    if remaining:
+                        # 剩余阶段的依赖都无法满足（不应出现，环已提前检查）
+                        for name in remaining:
+                            results[name] = STATUS_BLOCKED
+                        remaining = []
+                    continue
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                        results[name] = STATUS_DONE
+                    except Exception as e:
+                        results[name] = STATUS_FAILED
+                        print(f"[{self.name}] ❌ 阶段失败: {name}: {e}")
+                        # 阶段可能在失败前已写出部分输出（如上传失败时仍保存了结果文件），
+                        # 记录失败状态且不保留指纹，避免下次运行被当作已完成而跳过
+                        with self._state_lock:
+                            self._state[name] = {
+                                'failed': True,
+                                'failed_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                                'error': str(e)[:500],
+                            }
+                            self._save_state()
+
+        self.report(results)
+        return results
+
+    def report(self, results: dict):
+        print("\n" + "="*60)
+        print(f"[{self.name}] 阶段执行结果")
+        print("="*60)
+        for name in self.stages:
+            print(f"  {name:<12} {results.get(name, '-')}")
+
+
+class SharedRuntime:
+    """
+    多个pipeline共享的运行时
+    爬虫、LLM客户端、模型等重对象按名称只创建一次；异步LLM调用统一跑在一个常驻事件循环上，
+    避免每次asyncio.run新建循环导致复用的异步HTTP连接失效
+    """
+
+    def __init__(self, keep_warm: bool = False):
+        """
+        Args:
+            keep_warm: 是否在阶段之间保持模型等资源常驻（批量模式），False时阶段结束即释放
+        """
+        self.keep_warm = keep_warm
+        self._instances = {}
+        self._lock = threading.Lock()
+        self._closers = []
+        self._loop = None
+        self._loop_thread = None
+
+    def get(self, name: str, factory):
+        """获取名为name的共享对象，首次获取时调用factory()创建"""
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = factory()
+            return self._instances[name]
+
+    def on_close(self, fn):
+        """注册close()时执行的清理函数"""
+        with self._lock:
+            self._closers.append(fn)
+
+    def run_async(self, coro):
+        """在常驻事件循环中执行协程并等待结果，可在任意线程调用"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, name="runtime-loop", daemon=True)
+                self._loop_thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def close(self):
+        """执行清理函数并停止事件循环"""
+        with self._lock:
+            closers, self._closers = self._closers, []
+            self._instances.clear()
+        for fn in reversed(closers):
+            try:
+                fn()
+            except Exception as e:
+                print(f"释放运行时资源失败: {e}")
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+
+
+def run_batch(runners: list, max_items: int = 2, max_stages: int = None) -> dict:
+    """
+    批量执行多个pipeline（如多周、多个比赛）
+
+    Args:
+        runners: PipelineRunner列表
+        max_items: 同时处理的pipeline数
+        max_stages: 所有pipeline合计同时执行的阶段数上限，None表示不额外限制
+    Returns:
+        dict: pipeline名称 -> 各阶段执行结果
+    """
+    if max_stages:
+        budget = threading.Semaphore(max_stages)
+        for runner in runners:
+            runner.budget = budget
+
+    def run_one(runner):
+        try:
+            return runner.run()
+        except Exception as e:
+            print(f"[{runner.name}] ❌ pipeline执行失败: {e}")
+            return {name: STATUS_FAILED for name in runner.stages}
+
+    with ThreadPoolExecutor(max_workers=max(1, int(max_items)), thread_name_prefix="pipeline") as executor:
+        batch_results = dict(zip([runner.name for runner in runners], executor.map(run_one, runners)))
+
+    print("\n" + "="*60)
+    print(f"批量执行结果，共 {len(runners)} 个pipeline")
+    print("="*60)
+    for name, results in batch_results.items():
+        failed = [stage for stage, status in results.items() if status in (STATUS_FAILED, STATUS_BLOCKED)]
+        print(f"  {'❌' if failed else '✓'} {name}" + (f"  失败/未执行: {', '.join(failed)}" if failed else ""))
+    return batch_results
@@ -0,0 +1,163 @@
+"""
+Function: 基于pydantic schema的结构化LLM输出
+通过JSON mode让模型直接输出JSON对象并用pydantic校验，不再依赖正则/eval解析；
+校验失败时把错误信息连同上次的输出发回模型做针对性修正，并统计修正消耗的额外调用次数
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+20261018    HongfengAi  未通过校验的响应从LLM缓存中淘汰，下次运行重新请求而不是重放同一个无效响应
+"""
+import json
+import threading
+from typing import Callable, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+from langchain_core.messages import HumanMessage, AIMessage
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from llm_cache import track_cache_keys, evict_cache_keys
+
+
+# 结构化调用统计：calls为首次请求数，repairs为修正时额外消耗的请求数，failures为修正后仍未通过校验的次数
+STRUCTURED_STATS = {'calls': 0, 'repairs': 0, 'failures': 0}
+_STATS_LOCK = threading.Lock()
+
+
+class StructuredOutputError(Exception):
+    """修正次数用完后仍未通过校验，parsed为最后一次通过schema校验的结果（可能为None）"""
+
+    def __init__(self, message: str, parsed: BaseModel = None, raw: str = ""):
+        super().__init__(message)
+        self.parsed = parsed
+        self.raw = raw
+
+
+def _count(key: str):
+    with _STATS_LOCK:
+        STRUCTURED_STATS[key] += 1
+
+
+def build_structured_prompt(prompt: str, schema: Type[BaseModel]) -> str:
+    """在原prompt后追加JSON输出要求和schema"""
+    return f"""{prompt}
+        输出要求：只输出一个JSON对象，不要输出任何其他内容，JSON需符合以下JSON Schema：
+        {json.dumps(schema.model_json_schema(), ensure_ascii=False)}
+        """
+
+
+def check_structured_output(content: str, schema: Type[BaseModel], validator: Callable = None):
+    """
+    校验模型输出
+    Returns:
+        tuple: (parsed, error)，error为None表示校验通过；JSON或schema不合法时parsed为None
+    """
+    try:
+        parsed = schema.model_validate_json(content)
+    except ValidationError as e:
+        error = "; ".join(f"{'.'.join(str(loc) for loc in err['loc']) or 'JSON'}: {err['msg']}" for err in e.errors())
+        return None, error
+    if validator is not None:
+        error = validator(parsed)
+        if error:
+            return parsed, error
+    return parsed, None
+
+
+def build_repair_messages(messages: list, content: str, error: str) -> list:
+    """针对性修正：把上次输出和校验错误发回模型"""
+    return messages + [
+        AIMessage(content=content),
+        HumanMessage(content=f"上面的输出未通过校验：\n{error}\n请只针对上述问题修正，其余内容保持不变，重新输出完整的JSON对象。")
+    ]
+
+
+def _invoke_checked(json_llm, messages: list, schema: Type[BaseModel], validator: Callable = None):
+    """调用一次并校验，未通过校验的响应从LLM缓存淘汰"""
+    with track_cache_keys() as keys:
+        content = json_llm.invoke(messages).content
+    parsed, error = check_structured_output(content, schema, validator)
+    if error is not None:
+        evict_cache_keys(keys)
+    return content, parsed, error
+
+
+async def _ainvoke_checked(json_llm, messages: list, schema: Type[BaseModel], validator: Callable = None):
+    """_invoke_checked的异步版本"""
+    with track_cache_keys() as keys:
+        content = (await json_llm.ainvoke(messages)).content
+    parsed, error = check_structured_output(content, schema, validator)
+    if error is not None:
+        evict_cache_keys(keys)
+    return content, parsed, error
+
+
+def invoke_structured(llm, prompt: str, schema: Type[BaseModel],
+                      validator: Optional[Callable] = None, max_repairs: int = 2) -> BaseModel:
+    """
+    以JSON mode调用LLM并按schema校验，失败时最多修正max_repairs次
+
+    Args:
+        llm: init_llm返回的ChatOpenAI，或LLMClient.for_site()绑定了调用点的llm
+        prompt: 原始prompt
+        schema: pydantic模型
+        validator: 额外的业务校验，入参为解析后的对象，返回错误描述字符串，通过时返回None
+        max_repairs: 最多额外修正的次数
+    Returns:
+        BaseModel: 校验通过的对象
+    Raises:
+        StructuredOutputError: 修正次数用完后仍未通过校验
+    """
+    json_llm = llm.bind(response_format={"type": "json_object"})
+    messages = [HumanMessage(content=build_structured_prompt(prompt, schema))]
+    _count('calls')
+    content, parsed, error = _invoke_checked(json_llm, messages, schema, validator)
+    last_parsed = parsed
+
+    for attempt in range(max_repairs):
+        if error is None:
+            return parsed
+        print(f"结构化输出校验失败，第{attempt + 1}次修正: {error}")
+        messages = build_repair_messages(messages, content, error)
+        _count('repairs')
+        content, parsed, error = _invoke_checked(json_llm, messages, schema, validator)
+        last_parsed = parsed or last_parsed
+
+    if error is None:
+        return parsed
+    _count('failures')
+    raise StructuredOutputError(f"结构化输出校验失败: {error}", parsed=last_parsed, raw=content)
+
+
+async def ainvoke_structured(llm, prompt: str, schema: Type[BaseModel],
+                             validator: Optional[Callable] = None, max_repairs: int = 2) -> BaseModel:
+    """invoke_structured的异步版本"""
+    json_llm = llm.bind(response_format={"type": "json_object"})
+    messages = [HumanMessage(content=build_structured_prompt(prompt, schema))]
+    _count('calls')
+    content, parsed, error = await _ainvoke_checked(json_llm, messages, schema, validator)
+    last_parsed = parsed
+
+    for attempt in range(max_repairs):
+        if error is None:
+            return parsed
+        print(f"结构化输出校验失败，第{attempt + 1}次修正: {error}")
+        messages = build_repair_messages(messages, content, error)
+        _count('repairs')
+        content, parsed, error = await _ainvoke_checked(json_llm, messages, schema, validator)
+        last_parsed = parsed or last_parsed
+
+    if error is None:
+        return parsed
+    _count('failures')
+    raise StructuredOutputError(f"结构化输出校验失败: {error}", parsed=last_parsed, raw=content)
+
+
+def report_structured_stats():
+    """打印本进程结构化调用的修正统计"""
+    if STRUCTURED_STATS['calls'] == 0:
+        return
+    print(f"🧩 结构化输出: 请求 {STRUCTURED_STATS['calls']} 次，修正额外消耗 {STRUCTURED_STATS['repairs']} 次，"
+          f"修正后仍失败 {STRUCTURED_STATS['failures']} 次")
@@ -0,0 +1,155 @@
+"""
+Function: 进程级共享的微信公众号access_token
+token缓存在内存和磁盘中，按接口返回的expires_in提前刷新；刷新时加锁，多个worker/上传器共用同一个token，
+使用stable_token接口获取，刷新不会使其他进程手中尚未过期的token失效
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+20261018    HongfengAi  invalidate后不再从磁盘缓存读回被拒绝的token，并强制刷新
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from configs import OUTPUT_ROOT_PATH, WECHAT_APP_ID, WECHAT_APP_SECRET
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_client import get_http_client
+
+
+# token磁盘缓存（同一公众号的各个Agent共用）
+ACCESS_TOKEN_CACHE_PATH = os.path.join(OUTPUT_ROOT_PATH, "wechat_access_token.json")
+
+# 表示access_token无效或过期的错误码，遇到时应调用invalidate()
+TOKEN_INVALID_ERRCODES = (40001, 40014, 42001)
+
+
+class AccessTokenProvider:
+    """access_token提供者，过期前refresh_ahead秒开始刷新"""
+
+    def __init__(self, appid: str, secret: str,
+                 cache_path: str = ACCESS_TOKEN_CACHE_PATH,
+                 refresh_ahead: int = 300):
+        self.appid = appid
+        self.secret = secret
+        self.cache_path = cache_path
+        self.refresh_ahead = refresh_ahead
+        self._lock = threading.Lock()
+        self._token = ""
+        self._expires_at = 0
+        # 被接口拒绝的token：磁盘缓存中仍是该token时不再读回
+        self._rejected_token = ""
+        # invalidate后下一次获取需强制刷新，否则stable_token接口会返回同一个未过期的token
+        self._force_next = False
+
+    def _is_fresh(self) -> bool:
+        return bool(self._token) and time.time() < self._expires_at - self.refresh_ahead
+
+    def _load_disk(self):
+        """读取磁盘缓存（可能已被其他进程刷新）"""
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f).get(self.appid, {})
+        except Exception as e:
+            print(f"读取access_token缓存失败: {e}")
+            return
+        if entry.get('access_token') and entry.get('access_token') == self._rejected_token:
+            return
+        if entry.get('expires_at', 0) > self._expires_at:
+            self._token = entry.get('access_token', "")
+            self._expires_at = entry.get('expires_at', 0)
+
+    def _save_disk(self):
+        try:
+            data = {}
+            if os.path.exists(self.cache_path):
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            data[self.appid] = {'access_token': self._token, 'expires_at': self._expires_at}
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"保存access_token缓存失败: {e}")
+
+    def _fetch(self, force_refresh: bool = False) -> dict:
+        url = "https://api.weixin.qq.com/cgi-bin/stable_token"
+        payload = {
+            "grant_type": "client_credential",
+            "appid": self.appid,
+            "secret": self.secret,
+            "force_refresh": force_refresh
+        }
+        response = get_http_client().post(url, data=json.dumps(payload), timeout=30)
+        return response.json()
+
+    def get_token(self, force_refresh: bool = False) -> str:
+        """
+        获取access_token，缓存有效时不发起请求
+
+        Args:
+            force_refresh: 强制向微信重新获取
+        Returns:
+            str: access_token，获取失败时为空字符串
+        """
+        if not force_refresh and self._is_fresh():
+            return self._token
+
+        with self._lock:
+            if not force_refresh:
+                # 双重检查：等锁期间可能已被其他线程刷新，或磁盘中已有其他进程刷新的token
+                if self._is_fresh():
+                    return self._token
+                self._load_disk()
+                if self._is_fresh():
+                    return self._token
+
+            result = self._fetch(force_refresh=force_refresh or self._force_next)
+            if 'access_token' not in result:
+                print(f"❌ Access Token获取失败: {result.get('errmsg', '未知错误')} (错误码: {result.get('errcode', 'N/A')})")
+                return self._token if time.time() < self._expires_at else ""
+
+            expires_in = result.get('expires_in', 7200)
+            self._token = result['access_token']
+            self._expires_at = time.time() + expires_in
+            self._force_next = False
+            self._save_disk()
+            print(f"✅ Access Token获取成功")
+            print(f"⏰ 有效期: {expires_in}秒 ({expires_in // 60}分钟)")
+            return self._token
+
+    def expires_in(self) -> int:
+        """当前token的剩余有效秒数"""
+        return max(0, int(self._expires_at - time.time()))
+
+    def invalidate(self):
+        """接口返回token无效时调用，下次get_token会强制重新获取（磁盘缓存中的同一token也不再使用）"""
+        with self._lock:
+            if self._token:
+                self._rejected_token = self._token
+            self._token = ""
+            self._expires_at = 0
+            self._force_next = True
+
+
+_PROVIDERS = {}
+_PROVIDERS_LOCK = threading.Lock()
+
+
+def get_access_token_provider(appid: str = WECHAT_APP_ID, secret: str = WECHAT_APP_SECRET) -> AccessTokenProvider:
+    """获取进程内共享的token提供者（每个appid一个）"""
+    provider = _PROVIDERS.get(appid)
+    if provider is None:
+        with _PROVIDERS_LOCK:
+            provider = _PROVIDERS.get(appid)
+            if provider is None:
+                provider = AccessTokenProvider(appid, secret)
+                _PROVIDERS[appid] = provider
+    return provider
@@ -5,31 +5,49 @@ CreateDay: 20250702
 Author: HongfengAi
 History:
 20250702    HongfengAi  第一版
+20261018    HongfengAi  软件内容翻译改为结构化输出（pydantic校验 + 失败时针对性修正）
+20261018    HongfengAi  LLM调用改走LLMClient，记录TTFT、耗时和token用量
+20261018    HongfengAi  软件详情从产物库读取，中文结果写入产物库后再导出JSON
+20261018    HongfengAi  传入的软件详情文件优先于产物库，与pipeline哈希的阶段输入保持一致
 """
 import json
 import argparse
 import os
 import sys
 from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel, Field
 import requests
 from bs4 import BeautifulSoup
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import OUTPUT_ROOT_PATH, SOFTWARE_EXPRESS_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import set_proxy, unset_proxy, init_llm, safe_title_func, format_json_block
+from utils import safe_title_func
+from llm_client import LLMClient
+from http_client import get_http_client
+from structured_output import invoke_structured, StructuredOutputError
+from artifact_store import get_artifact_store
+
+
+class AppTranslation(BaseModel):
+    """软件内容的中文翻译"""
+    sentence_description: str = Field(description="翻译后的一句话描述")
+    tags: List[str] = Field(description="翻译后的标签，与输入标签一一对应")
+    content_description: str = Field(description="翻译后的详细描述")
 
 
 class AppSummarizer:
     def __init__(self):
         # 初始化llm
-        self.llm = init_llm(temperature=0.15)
+        self.llm_client = LLMClient("app_summarizer", temperature=0.15)
         self.software_express_root_path = SOFTWARE_EXPRESS_ROOT_PATH
 
     def fetch_website_text(self, url):
         try:
             headers = {"User-Agent": "Mozilla/5.0"}
-            resp = requests.get(url, headers=headers, timeout=15)
+            resp = get_http_client().get(url, proxy=True, headers=headers, timeout=15)
             resp.raise_for_status()
             soup = BeautifulSoup(resp.text, "html.parser")
             texts = [p.get_text() for p in soup.find_all('p')]
@@ -85,7 +103,7 @@ ClickUp 的亮点功能包括其新推出的 Brain MAX AI 桌面应用，集成
         website_text = self.fetch_website_text(website) if website else ""
         prompt = self.build_summary_prompt(title, sentence_description, content_discription, website_text)
         try:
-            response = self.llm.invoke(prompt).content.strip()
+            response = self.llm_client.invoke(prompt, call_site="summarize_with_website").content.strip()
             return response
         except Exception as e:
             print(f'大模型总结失败: {e}')
@@ -112,7 +130,7 @@ ClickUp 的亮点功能包括其新推出的 Brain MAX AI 桌面应用，集成
         {json.dumps(input_json, ensure_ascii=False, indent=2)}
 
         翻译要求：
-        - 直接输出翻译后的JSON格式，不要输出任何其他内容
+        - 直接输出翻译后的JSON对象，不要输出任何其他内容
         - sentence_description: 翻译成自然流畅的中文描述
         - tags: 每个标签都翻译成中文，保持数组格式
         - content_description: 翻译成完整的中文描述
@@ -128,11 +146,24 @@ ClickUp 的亮点功能包括其新推出的 Brain MAX AI 桌面应用，集成
         }}
         """
         
+        def validate_tags(result: AppTranslation):
+            """标签需逐个翻译，数量与输入一致"""
+            if len(result.tags) != len(input_json["tags"]):
+                return f"tags应包含{len(input_json['tags'])}个标签（与输入一一对应），实际为{len(result.tags)}个"
+            return None
+
         try:
-            response = self.llm.invoke(prompt).content.strip()
-            # 提取JSON内容
-            translated_data = format_json_block(response)
-            return translated_data
+            return invoke_structured(self.llm_client.for_site("translate_app_content"), prompt, AppTranslation, validator=validate_tags).model_dump()
+        except StructuredOutputError as e:
+            if e.parsed is not None:
+                # 仅标签数量不一致时仍使用翻译结果
+                return e.parsed.model_dump()
+            print(f"翻译失败: {e}")
+            return {
+                "sentence_description": "",
+                "tags": [],
+                "content_description": ""
+            }
         except Exception as e:
             print(f"翻译失败: {e}")
             # 返回空的翻译结果
@@ -145,19 +176,21 @@ ClickUp 的亮点功能包括其新推出的 Brain MAX AI 桌面应用，集成
 
     def summarize_apps_from_json(self, input_file: str, output_file: str):
         """
-        从JSON文件读取软件详情并生成中文版本
+        读取软件详情并生成中文版本
         Args:
-            input_file: 输入的英文软件详情JSON文件路径
-            output_file: 输出的中文软件详情JSON文件路径
+            input_file: 输入的英文软件详情JSON文件路径，为None或文件不存在时从产物库读取该周数据
+            output_file: 输出的中文软件详情JSON文件路径，其所在目录名作为产物库中的周标识
         """
-        # 设置代理
-        set_proxy()
-
-        print(f"正在读取软件详情文件: {input_file}")
-        
-        # 读取软件详情
-        with open(input_file, "r", encoding="utf-8") as f:
-            apps_list = json.load(f)
+        store = get_artifact_store()
+        scope = os.path.basename(os.path.dirname(os.path.abspath(output_file)))
+
+        # 传入的文件即pipeline按内容哈希的阶段输入，以它为准；没有文件时从产物库读取
+        if input_file and os.path.exists(input_file):
+            print(f"正在读取软件详情文件: {input_file}")
+            with open(input_file, "r", encoding="utf-8") as f:
+                apps_list = json.load(f)
+        else:
+            apps_list = store.list_records('products', scope)
         
         print(f"找到 {len(apps_list)} 款软件，开始处理...")
         
@@ -174,7 +207,6 @@ ClickUp 的亮点功能包括其新推出的 Brain MAX AI 桌面应用，集成
             translated_content = self.translate_app_content(app)
             
             # 将翻译结果追加到原数据中
-            translated_content = json.loads(translated_content)
             zh_app['zh_sentence_description'] = translated_content.get('sentence_description', '')
             zh_app['zh_tags'] = translated_content.get('tags', [])
             zh_app['zh_content_description'] = translated_content.get('content_description', '')
@@ -183,22 +215,14 @@ ClickUp 的亮点功能包括其新推出的 Brain MAX AI 桌面应用，集成
             zh_apps_list.append(zh_app)
             print(f"  ✓ 完成处理软件: {app.get('title', 'Unknown')}")
         
-        # 确保输出目录存在
-        output_dir = os.path.dirname(output_file)
-        if output_dir:
-            os.makedirs(output_dir, exist_ok=True)
-        
-        # 保存中文版本
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(zh_apps_list, f, ensure_ascii=False, indent=2)
+        # 中文版本写入产物库，并导出JSON供模板填充使用
+        store.put_summaries('app_zh', scope, zh_apps_list, key_field='producthunt_url')
+        store.export_json(zh_apps_list, output_file, indent=2)
         
         print(f"\n✅ 处理完成！")
         print(f"总共处理 {len(zh_apps_list)} 款软件")
         print(f"中文版本已保存到: {output_file}")
 
-        # 取消代理
-        unset_proxy()
-
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='软件内容翻译器')
@@ -6,6 +6,11 @@ CreateDay: 20250702
 Author: HongfengAi
 History:
 20250702    HongfengAi  第一版
+20261018    HongfengAi  改为声明式阶段图，按内容哈希跳过未变化的阶段，无需人工交互
+20261018    HongfengAi  新增--weeks批量模式，多周共享浏览器池和LLM客户端
+20261018    HongfengAi  各阶段依赖的模块改为阶段执行时才导入，缩短启动时间
+20261018    HongfengAi  软件详情按款记录进度，中断后重跑从断点继续
+20261018    HongfengAi  有软件爬取失败时details阶段记为失败，下次运行时重试
 """
 
 import sys, os
@@ -18,14 +23,110 @@ import argparse
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import SOFTWARE_EXPRESS_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from crawler.software_list_crawler import ProductHuntWeeklyProductsCrawler
-from crawler.software_details_crawler import SoftwareDetailsCrawler
-from app_express.app_summarizer import AppSummarizer
-from app_express.app_template_fill import AppTemplateFiller
-from utils import get_previous_week
-from wechat_utils.upload_material import WeChatPermanentMaterialUploader
-from wechat_utils.create_draft import WeChatDraftCreator
-from wechat_utils.ppt_to_image import PPTToImage
+# 爬虫（selenium）、LLM（langchain）和封面（pptx/win32com）相关模块都较重，
+# 在各阶段函数内按需导入：阶段全部命中时不会加载这些库
+from utils import get_previous_week, parse_weeks, report_llm_stats
+from pipeline_runner import Stage, PipelineRunner, SharedRuntime, run_batch, STATUS_FAILED
+
+
+def build_pipeline(year, week, args, runtime: SharedRuntime) -> PipelineRunner:
+    """
+    构建某一周软件速递的阶段图
+    list -> details -> summarize -> template -> draft，cover -> upload -> draft，
+    cover不依赖软件数据，与list/details/summarize并发执行
+
+    Args:
+        year: 年份
+        week: 周数，如26
+        args: 命令行参数
+        runtime: 共享运行时，批量模式下多周共用同一个
+    """
+    data_dir = f'{SOFTWARE_EXPRESS_ROOT_PATH}/{year}_{week}'
+    software_list_file = f'{data_dir}/software_list_{week}.json'
+    all_software_details_file = f'{data_dir}/all_software_details.json'
+    zh_software_details_file = f'{data_dir}/zh_all_software_details.json'
+    cover_image_file = f'{data_dir}/cover/cover.png'
+    cover_result_file = f'{data_dir}/cover/cover.json'
+    html_file = f'{data_dir}/zh_all_software_express.html'
+    title = f"ProductHunt产品速递 | {year}年第{week}周热门创新产品精选"
+    # 已爬取的软件记录在进度日志中，默认跳过；--force details 时全部重新爬取
+    resume_details = not ('all' in args.force or 'details' in args.force)
+
+    def crawl_list():
+        from crawler.software_list_crawler import ProductHuntWeeklyProductsCrawler
+        software_list = ProductHuntWeeklyProductsCrawler().crawl_specific_week(year, week, args.topk)
+        if not software_list:
+            raise RuntimeError("没有获取到软件数据")
+        print(f"[软件列表] ✓ 爬取完成，共获取 {len(software_list)} 款软件")
+
+    def crawl_details():
+        from crawler.software_details_crawler import SoftwareDetailsCrawler
+        # 爬虫每款软件使用独立副本，可在多周之间共享
+        details_crawler = runtime.get('details_crawler', SoftwareDetailsCrawler)
+        failed_urls = details_crawler.crawl_software_details_from_list(software_list_file, data_dir, args.topk,
+                                                                       workers=args.workers, resume=resume_details)
+        # 有软件爬取失败时阶段记为失败，下次运行时重跑本阶段（已爬取的软件从进度日志跳过）
+        if failed_urls:
+            raise RuntimeError(f"{len(failed_urls)} 款软件爬取失败: {failed_urls}")
+
+    def summarize():
+        from app_express.app_summarizer import AppSummarizer
+        runtime.get('summarizer', AppSummarizer).summarize_apps_from_json(all_software_details_file, zh_software_details_file)
+
+    def make_cover():
+        from wechat_utils.ppt_to_image import PPTToImage
+        PPTToImage().main(year=year, week=week)
+
+    def fill_template():
+        from app_express.app_template_fill import AppTemplateFiller
+        AppTemplateFiller().app_template_fill(year, week)
+
+    def upload_cover():
+        from wechat_utils.upload_material import WeChatPermanentMaterialUploader
+        upload_result = WeChatPermanentMaterialUploader().upload_specific_file(cover_image_file)
+        if not upload_result.get('success'):
+            raise RuntimeError(f"封面图上传失败: {upload_result.get('error', '未知错误')}")
+
+    def create_draft():
+        from wechat_utils.create_draft import WeChatDraftCreator
+        result = WeChatDraftCreator().create_draft(comp_type="app_express", title=title, year=year, week=week)
+        if 'errcode' in result:
+            raise RuntimeError(f"草稿创建失败: {result.get('errcode')}: {result.get('errmsg')}")
+
+    runner = PipelineRunner(name=f"软件速递 {year}_{week}",
+                            state_path=f'{data_dir}/.pipeline_state.json',
+                            max_workers=args.max_parallel,
+                            force=args.force,
+                            dry_run=args.dry_run)
+    runner.add(Stage('list', crawl_list,
+                     outputs=[software_list_file],
+                     code=['crawler.software_list_crawler'],
+                     config={'year': year, 'week': week, 'topk': args.topk}))
+    runner.add(Stage('details', crawl_details,
+                     inputs=[software_list_file],
+                     outputs=[all_software_details_file],
+                     code=['crawler.software_details_crawler'],
+                     config={'topk': args.topk}))
+    runner.add(Stage('summarize', summarize,
+                     inputs=[all_software_details_file],
+                     outputs=[zh_software_details_file],
+                     code=['app_express.app_summarizer']))
+    runner.add(Stage('cover', make_cover,
+                     outputs=[cover_image_file],
+                     code=['wechat_utils.ppt_to_image'],
+                     config={'year': year, 'week': week},
+                     resource='wps'))
+    runner.add(Stage('template', fill_template,
+                     inputs=[zh_software_details_file],
+                     outputs=[html_file],
+                     code=['app_express.app_template_fill']))
+    runner.add(Stage('upload', upload_cover,
+                     inputs=[cover_image_file],
+                     outputs=[cover_result_file]))
+    runner.add(Stage('draft', create_draft,
+                     inputs=[html_file, cover_result_file],
+                     config={'title': title}))
+    return runner
 
 
 if __name__ == '__main__':
@@ -38,192 +139,45 @@ if __name__ == '__main__':
     parser.add_argument('--topk', type=int, default=10, help='获取前k款软件')
     parser.add_argument('--year', type=int, help='指定年份')
     parser.add_argument('--week', type=str, help='指定周数，如26')
+    parser.add_argument('--workers', type=int, default=1, help='并发爬取软件详情的worker数')
+    parser.add_argument('--refresh_llm_cache', action='store_true', help='不读取LLM响应缓存，强制重新请求')
+    parser.add_argument('--max_parallel', type=int, default=2, help='同时执行的阶段数上限')
+    parser.add_argument('--force', nargs='*', default=[], help='强制重新执行的阶段，如 summarize template，all表示全部')
+    parser.add_argument('--dry_run', action='store_true', help='只打印各阶段是否需要执行，不实际执行')
+    parser.add_argument('--weeks', type=str, default=None, help='批量模式要处理的周，如 2025-20:2025-32 或 2025-20,2025-22')
+    parser.add_argument('--max_items', type=int, default=2, help='批量模式同时处理的周数')
+    parser.add_argument('--max_stages', type=int, default=None, help='批量模式所有周合计同时执行的阶段数上限')
     args = parser.parse_args()
+    if args.refresh_llm_cache:
+        from llm_cache import get_llm_cache_store
+        get_llm_cache_store().bypass = True
     
     # 确定要处理的年份和周数
-    if args.year and args.week:
-        year, week = args.year, args.week
-    else:
-        year, week = get_previous_week()
-        print(f"自动获取上一周: {year}年 {week}")
-    
-    topk = args.topk
-    data_dir = f'{SOFTWARE_EXPRESS_ROOT_PATH}/{year}_{week}'
-    
-    print(f"处理时间: {year}年 {week}")
-    print(f"获取软件数量: {topk}")
-    print(f"数据目录: {data_dir}")
-    
-    ############################
-    # 1、爬取软件列表
-    ############################
-    print("\n" + "="*60)
-    print("步骤1: 爬取软件列表")
-    print("="*60)
-    
-    software_list_file = f'{data_dir}/software_list_{week}.json'
-    
-    if os.path.exists(software_list_file):
-        print(f"发现已存在的软件列表: {software_list_file}")
-        user_input = input("是否需要重新爬取软件列表? (y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[软件列表] ✓ 跳过爬取 (使用现有数据)")
-            with open(software_list_file, 'r', encoding='utf-8') as f:
-                software_list = json.load(f)
-        else:
-            stime = time.time()
-            crawler = ProductHuntWeeklyProductsCrawler()
-            software_list = crawler.crawl_specific_week(year, week, topk)
-            etime = time.time()
-            print(f"[软件列表] ✓ 爬取完成，共获取 {len(software_list)} 款软件，耗时 {etime-stime:.2f} 秒")
+    if args.weeks:
+        weeks = parse_weeks(args.weeks)
+        print(f"批量模式: 共 {len(weeks)} 周，同时处理 {args.max_items} 周")
+    elif args.year and args.week:
+        weeks = [(args.year, args.week)]
     else:
-        stime = time.time()
-        crawler = ProductHuntWeeklyProductsCrawler()
-        software_list = crawler.crawl_specific_week(year, week, topk)
-        etime = time.time()
-        print(f"[软件列表] ✓ 爬取完成，共获取 {len(software_list)} 款软件，耗时 {etime-stime:.2f} 秒")
-    
-    if not software_list:
-        print("[软件列表] ❌ 没有获取到软件数据，程序结束。")
-        exit()
-    
-    ############################
-    # 2、爬取软件详情
-    ############################
-    print("\n" + "="*60)
-    print("步骤2: 爬取软件详情")
-    print("="*60)
-    
-    all_software_details_file = f'{data_dir}/all_software_details.json'
-    
-    if os.path.exists(all_software_details_file):
-        print(f"发现已存在的软件详情: {all_software_details_file}")
-        user_input = input("是否需要重新爬取软件详情? (y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[软件详情] ✓ 跳过爬取 (使用现有数据)")
-            with open(all_software_details_file, 'r', encoding='utf-8') as f:
-                software_details = json.load(f)
+        weeks = [get_previous_week()]
+        print(f"自动获取上一周: {weeks[0][0]}年 {weeks[0][1]}")
+
+    for year, week in weeks:
+        print(f"处理时间: {year}年 {week}，数据目录: {SOFTWARE_EXPRESS_ROOT_PATH}/{year}_{week}")
+    print(f"获取软件数量: {args.topk}")
+
+    # 所有周共享一个运行时：浏览器池、HTTP客户端、access_token本身就是进程级单例，爬虫和LLM客户端由runtime复用
+    runtime = SharedRuntime(keep_warm=len(weeks) > 1)
+    try:
+        runners = [build_pipeline(year, week, args, runtime) for year, week in weeks]
+        if len(runners) == 1:
+            all_results = [runners[0].run()]
         else:
-            stime = time.time()
-            details_crawler = SoftwareDetailsCrawler()
-            details_crawler.crawl_software_details_from_list(software_list_file, data_dir, topk)
-            etime = time.time()
-            print(f"[软件详情] ✓ 爬取完成，耗时 {etime-stime:.2f} 秒")
-    else:
-        stime = time.time()
-        details_crawler = SoftwareDetailsCrawler()
-        details_crawler.crawl_software_details_from_list(software_list_file, data_dir, topk)
-        etime = time.time()
-        print(f"[软件详情] ✓ 爬取完成，耗时 {etime-stime:.2f} 秒")
-    
-    
-    ############################
-    # 3、翻译和总结软件
-    ############################
-    print("\n" + "="*60)
-    print("步骤3: 翻译和总结软件")
-    print("="*60)
-    
-    zh_software_details_file = f'{data_dir}/zh_all_software_details.json'
-    
-    if os.path.exists(zh_software_details_file):
-        print(f"发现已存在的中文软件详情: {zh_software_details_file}")
-        user_input = input("是否需要重新翻译和总结软件? (y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[软件翻译] ✓ 跳过翻译 (使用现有数据)")
-        else:
-            stime = time.time()
-            summarizer = AppSummarizer()
-            summarizer.summarize_apps_from_json(all_software_details_file, zh_software_details_file)
-            etime = time.time()
-            print(f"[软件翻译] ✓ 翻译完成，耗时 {etime-stime:.2f} 秒")
-    else:
-        stime = time.time()
-        summarizer = AppSummarizer()
-        summarizer.summarize_apps_from_json(all_software_details_file, zh_software_details_file)
-        etime = time.time()
-        print(f"[软件翻译] ✓ 翻译完成，耗时 {etime-stime:.2f} 秒")
-
-    ############################
-    # 4、制作封面图
-    ############################
-    print("\n" + "="*60)
-    print("制作封面图")
-    print("="*60)
-
-    # 检查是否已存在封面图文件
-    cover_image_file_path = f'{SOFTWARE_EXPRESS_ROOT_PATH}/{year}_{week}/cover/cover.png'
-    if os.path.exists(cover_image_file_path):
-        print(f"发现已存在的封面图: {cover_image_file_path}")
-        user_input = input(f"是否需要重新制作封面图？(y/N): ").strip().lower()
-
-        if user_input not in ['y', 'yes']:
-            print(f"[封面图] ✓ 跳过: {year}_{week} (使用现有数据)")
-        else:
-            ppt_to_image = PPTToImage()
-            ppt_to_image.main(year=year,
-                              week=week)
-            print(f"[封面图] ✓ 制作完成: {year}_{week}")
-    else:    
-        ppt_to_image = PPTToImage()
-        ppt_to_image.main(year=year,
-                          week=week)
-        print(f"[封面图] ✓ 制作完成: {year}_{week}")
-
-    ############################
-    # 5、填充HTML模板
-    ############################
-    print("\n" + "="*60)
-    print("步骤4: 填充HTML模板")
-    print("="*60)
-    
-    html_file = f'{data_dir}/zh_all_software_express.html'
-    
-    if os.path.exists(html_file):
-        print(f"发现已存在的HTML文件: {html_file}")
-        user_input = input("是否需要重新填充HTML模板? (y/N): ").strip().lower()
-        
-        if user_input not in ['y', 'yes']:
-            print(f"[HTML模板] ✓ 跳过填充 (使用现有数据)")
-        else:
-            template_filler = AppTemplateFiller()
-            template_filler.app_template_fill(year, week)
-            print(f"[HTML模板] ✓ 填充完成")
-    else:
-        template_filler = AppTemplateFiller()
-        template_filler.app_template_fill(year, week)
-        print(f"[HTML模板] ✓ 填充完成")
-
-
-
-    ############################
-    # 5、上传封面图至公众号平台
-    ############################
-    print("\n" + "="*60)
-    print("上传封面图至公众号平台")
-    print("="*60)
-
-    # 检查是否已存在封面图文件
-    cover_image_file_path = f'{SOFTWARE_EXPRESS_ROOT_PATH}/{year}_{week}/cover/cover.png'
-    wechat_uploader = WeChatPermanentMaterialUploader()
-    upload_result= wechat_uploader.upload_specific_file(cover_image_file_path)
-    print(f"[封面图] ✓ 上传完成！")
-
-
-    ############################
-    # 6、创建草稿至公众号平台
-    ############################
-    print("\n" + "="*60)
-    print("创建草稿至公众号平台")
-    print("="*60)
+            all_results = list(run_batch(runners, max_items=args.max_items, max_stages=args.max_stages).values())
+    finally:
+        runtime.close()
 
-    wechat_draft_creator = WeChatDraftCreator()
-    wechat_draft_creator.create_draft(comp_type="app_express",
-                                      title=f"ProductHunt产品速递 | {year}年第{week}周热门创新产品精选",
-                                      year=year,
-                                      week=week)
-    print(f"[草稿] ✓ 创建完成！")
+    report_llm_stats()
 
+    if any(STATUS_FAILED in results.values() for results in all_results):
+        sys.exit(1)
@@ -5,13 +5,26 @@ CreateDay: 20250615
 Author: HongfengAi
 History:
 20250615    HongfengAi  第一版
+20261018    HongfengAi  新增浏览器池、页面就绪等待、并发爬取
+20261018    HongfengAi  页面就绪等待的各步骤共用一个截止时间，总耗时不超过站点timeout
+20261018    HongfengAi  --workers超过站点并发上限时提示实际并发数
 """
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
 from selenium import webdriver
 from selenium.webdriver.support.wait import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))))
-from configs import USER_AGENT
+from configs import USER_AGENT, OUTPUT_ROOT_PATH
 
 
 def open_browser():
@@ -49,4 +62,403 @@ def open_browser():
         
     # 显式等待：设置浏览器最长允许超时的时间
     wait = WebDriverWait(browser, 10)
-    return browser, wait
\ No newline at end of file
+    return browser, wait
+
+
+##################
+# 页面就绪等待
+##################
+# 各站点的就绪等待配置：timeout为最长等待秒数，idle_time为判定网络空闲所需的静默秒数，
+# scroll_pause为每次下拉后的最短静默秒数，max_scrolls为下拉直到页面高度稳定的最大次数
+SITE_READY_PROFILES = {
+    "producthunt": {"timeout": 20, "idle_time": 0.8, "scroll_pause": 0.8, "max_scrolls": 5},
+    "default": {"timeout": 15, "idle_time": 0.5, "scroll_pause": 0.5, "max_scrolls": 5},
+}
+
+# 就绪耗时日志，每行一条JSON，便于统计各站点真实加载速度
+PAGE_READY_TIMING_LOG = os.path.join(OUTPUT_ROOT_PATH, "page_ready_timing.jsonl")
+_TIMING_LOG_LOCK = threading.Lock()
+
+
+def get_site_profile(site: str) -> dict:
+    """获取站点的就绪等待配置"""
+    return SITE_READY_PROFILES.get(site, SITE_READY_PROFILES["default"])
+
+
+def wait_for_element(browser, wait, locator, timeout: float = None):
+    """
+    等待元素出现在DOM中
+
+    Args:
+        browser: 浏览器
+        wait: open_browser()返回的WebDriverWait
+        locator: 如 (By.XPATH, '...')
+        timeout: 覆盖wait默认超时时间
+    Returns:
+        WebElement
+    """
+    if timeout is not None:
+        wait = WebDriverWait(browser, timeout)
+    return wait.until(EC.presence_of_element_located(locator))
+
+
+def wait_for_network_idle(browser, idle_time: float = 0.5, timeout: float = 15, poll: float = 0.1) -> bool:
+    """
+    等待页面网络空闲：document加载完成，且资源请求数在idle_time秒内不再增加
+
+    Returns:
+        bool: 是否在超时前达到空闲
+    """
+    script = "return [document.readyState, performance.getEntriesByType('resource').length];"
+    deadline = time.time() + timeout
+    last_count = -1
+    stable_since = None
+    while time.time() < deadline:
+        try:
+            ready_state, resource_count = browser.execute_script(script)
+        except Exception:
+            ready_state, resource_count = "loading", -1
+
+        now = time.time()
+        if ready_state == "complete" and resource_count == last_count:
+            if stable_since is None:
+                stable_since = now
+            if now - stable_since >= idle_time:
+                return True
+        else:
+            stable_since = None
+        last_count = resource_count
+        time.sleep(poll)
+    return False
+
+
+def scroll_until_stable(browser, pause: float = 0.5, max_scrolls: int = 5, timeout: float = 15) -> int:
+    """
+    反复下拉到底部，直到页面高度不再变化（懒加载内容全部加载）
+    timeout为所有下拉共用的总等待时间，至少下拉一次
+
+    Returns:
+        int: 实际下拉次数
+    """
+    deadline = time.time() + timeout
+    height_script = "return document.body.scrollHeight;"
+    last_height = browser.execute_script(height_script)
+    scrolls = 0
+    for _ in range(max_scrolls):
+        if scrolls and time.time() >= deadline:
+            break
+        browser.execute_script("window.scrollTo(0, document.body.scrollHeight)")
+        scrolls += 1
+        wait_for_network_idle(browser, idle_time=pause, timeout=max(0.0, deadline - time.time()))
+        height = browser.execute_script(height_script)
+        if height == last_height:
+            break
+        last_height = height
+    return scrolls
+
+
+def log_ready_timing(site: str, label: str, elapsed: float, ok: bool):
+    """打印并记录页面就绪耗时"""
+    status = "✓" if ok else "⚠ 超时"
+    print(f"⏱ [{site}] {label} 页面就绪 {status}，耗时 {elapsed:.2f} 秒")
+    record = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "site": site, "label": label,
+              "elapsed": round(elapsed, 3), "ok": ok}
+    try:
+        with _TIMING_LOG_LOCK:
+            with open(PAGE_READY_TIMING_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except Exception as e:
+        print(f"写入就绪耗时日志失败: {e}")
+
+
+def wait_page_ready(browser, wait, site: str, ready_locator=None, scroll: bool = False, label: str = "") -> bool:
+    """
+    按站点配置等待页面就绪，替代固定的time.sleep
+
+    Args:
+        browser: 浏览器
+        wait: open_browser()返回的WebDriverWait
+        site: 站点名，对应SITE_READY_PROFILES
+        ready_locator: 页面就绪的标志元素，如 (By.XPATH, '...')，None表示只等待网络空闲
+        scroll: 是否下拉直到页面高度稳定
+        label: 日志中的页面描述
+    Returns:
+        bool: 是否在超时前就绪（超时不抛异常，由调用方继续解析）
+    """
+    profile = get_site_profile(site)
+    stime = time.time()
+    # 各步骤共用一个截止时间，总等待不超过站点配置的timeout
+    deadline = stime + profile["timeout"]
+    ok = True
+
+    if ready_locator is not None:
+        try:
+            wait_for_element(browser, wait, ready_locator, timeout=profile["timeout"])
+        except TimeoutException:
+            ok = False
+
+    remaining = max(0.0, deadline - time.time())
+    ok = wait_for_network_idle(browser, idle_time=profile["idle_time"], timeout=remaining) and ok
+
+    if scroll:
+        remaining = max(0.0, deadline - time.time())
+        scroll_until_stable(browser, pause=profile["scroll_pause"],
+                            max_scrolls=profile["max_scrolls"], timeout=remaining)
+
+    log_ready_timing(site, label or browser.current_url, time.time() - stime, ok)
+    return ok
+
+
+class BrowserPool:
+    """
+    浏览器池：复用已启动的Chrome，避免每爬一个条目就冷启动一次浏览器
+    - 每个浏览器被租用max_pages次后自动回收重建
+    - 浏览器崩溃或归还时标记为损坏，则直接关闭，下次租用时重建
+    - max_size限制同时存在的浏览器数量，超出时acquire会阻塞等待
+    """
+
+    def __init__(self, max_size: int = 4, max_pages: int = 30):
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self._idle = []  # 空闲的 [browser, wait, 已使用次数]
+        self._leased = {}  # id(browser) -> [browser, wait, 已使用次数]
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max_size)
+        self._closed = False
+
+    @staticmethod
+    def _is_alive(browser) -> bool:
+        """检查浏览器是否还能响应"""
+        try:
+            browser.current_url
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(browser):
+        try:
+            browser.quit()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """租用一个浏览器，返回 (browser, wait)"""
+        self._slots.acquire()
+        try:
+            entry = None
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None or self._is_alive(entry[0]):
+                    break
+                print("浏览器已失效，关闭后重建")
+                self._quit(entry[0])
+
+            if entry is None:
+                browser, wait = open_browser()
+                entry = [browser, wait, 0]
+
+            with self._lock:
+                self._leased[id(entry[0])] = entry
+            return entry[0], entry[1]
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, browser, broken: bool = False):
+        """
+        归还浏览器
+
+        Args:
+            browser: acquire得到的浏览器
+            broken: 使用过程中浏览器是否出错，出错则直接关闭不再复用
+        """
+        with self._lock:
+            entry = self._leased.pop(id(browser), None)
+        if entry is None:
+            return
+
+        try:
+            entry[2] += 1
+            if broken or self._closed or entry[2] >= self.max_pages:
+                self._quit(browser)
+            else:
+                with self._lock:
+                    self._idle.append(entry)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def session(self):
+        """
+        以上下文管理器形式租用浏览器，出现异常时视为损坏
+
+        Example:
+            with get_browser_pool().session() as (browser, wait):
+                browser.get(url)
+        """
+        browser, wait = self.acquire()
+        try:
+            yield browser, wait
+        except Exception:
+            self.release(browser, broken=True)
+            raise
+        else:
+            self.release(browser)
+
+    def ensure_size(self, max_size: int):
+        """扩大浏览器池容量，使其至少能同时租出max_size个浏览器"""
+        with self._lock:
+            extra = max_size - self.max_size
+            if extra <= 0:
+                return
+            self.max_size = max_size
+        for _ in range(extra):
+            self._slots.release()
+
+    def shutdown(self):
+        """关闭池中所有浏览器"""
+        with self._lock:
+            self._closed = True
+            entries = self._idle + list(self._leased.values())
+            self._idle = []
+            self._leased = {}
+        for entry in entries:
+            self._quit(entry[0])
+
+
+_BROWSER_POOL = None
+_BROWSER_POOL_LOCK = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """获取进程内所有爬虫共享的浏览器池，进程退出时自动关闭所有浏览器"""
+    global _BROWSER_POOL
+    if _BROWSER_POOL is None:
+        with _BROWSER_POOL_LOCK:
+            if _BROWSER_POOL is None:
+                _BROWSER_POOL = BrowserPool()
+                atexit.register(_BROWSER_POOL.shutdown)
+    return _BROWSER_POOL
+
+
+##################
+# 并发爬取
+##################
+# 各host的礼貌访问配置：min_interval为两次打开页面的最小间隔秒数，max_concurrent为同时访问的最大页面数
+HOST_POLITENESS = {
+    "producthunt.com": {"min_interval": 2.0, "max_concurrent": 3},
+    "default": {"min_interval": 2.0, "max_concurrent": 2},
+}
+
+
+class HostThrottle:
+    """按host限流，多个worker并发爬取时保证对同一站点的访问频率不超过礼貌预算"""
+
+    def __init__(self, politeness: dict = None):
+        self.politeness = politeness or HOST_POLITENESS
+        self._lock = threading.Lock()
+        self._semaphores = {}  # host -> Semaphore
+        self._next_time = {}  # host -> 下一次允许访问的时间
+
+    def _config(self, host: str) -> dict:
+        return self.politeness.get(host, self.politeness["default"])
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        host = urlparse(url).netloc.lower()
+        if host.startswith("www."):
+            host = host[4:]
+        return host
+
+    def max_concurrent(self, url: str) -> int:
+        """url所在host允许同时访问的最大页面数"""
+        return self._config(self.host_of(url))["max_concurrent"]
+
+    @contextmanager
+    def slot(self, url: str):
+        """
+        占用一个host访问名额，并等待到允许访问的时间点
+
+        Example:
+            with get_host_throttle().slot(url):
+                browser.get(url)
+        """
+        host = self.host_of(url)
+        config = self._config(host)
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.Semaphore(config["max_concurrent"]))
+
+        semaphore.acquire()
+        try:
+            with self._lock:
+                now = time.time()
+                start_time = max(now, self._next_time.get(host, 0))
+                self._next_time[host] = start_time + config["min_interval"]
+            if start_time > now:
+                time.sleep(start_time - now)
+            yield
+        finally:
+            semaphore.release()
+
+
+_HOST_THROTTLE = None
+
+
+def get_host_throttle() -> HostThrottle:
+    """获取进程内共享的host限流器"""
+    global _HOST_THROTTLE
+    if _HOST_THROTTLE is None:
+        with _BROWSER_POOL_LOCK:
+            if _HOST_THROTTLE is None:
+                _HOST_THROTTLE = HostThrottle()
+    return _HOST_THROTTLE
+
+
+def run_workers(items: list, worker_fn, workers: int = 1, url_of=None) -> list:
+    """
+    用workers个线程并发处理items，每个worker从浏览器池租用独立的浏览器
+
+    Args:
+        items: 待处理条目列表
+        worker_fn: 处理函数 worker_fn(index, item)，index从0开始
+        workers: 并发数，1表示逐条处理
+        url_of: 取条目访问URL的函数，worker_fn内按host限流时传入，workers超过host并发上限时提示实际并发数
+    Returns:
+        list: 与items顺序一致的结果列表，处理失败的条目为None
+    """
+    workers = max(1, min(int(workers), len(items) or 1))
+    if url_of is not None and workers > 1:
+        throttle = get_host_throttle()
+        host_urls = {}
+        for item in items:
+            url = url_of(item)
+            host_urls.setdefault(throttle.host_of(url), url)
+        for host, url in host_urls.items():
+            limit = throttle.max_concurrent(url)
+            if workers > limit:
+                print(f"⚠️ {host} 的礼貌访问上限为同时 {limit} 个页面，{workers} 个worker中实际并发为 {limit}"
+                      f"（可在crawler_utils.HOST_POLITENESS中调整）")
+    results = [None] * len(items)
+
+    if workers == 1:
+        for i, item in enumerate(items):
+            try:
+                results[i] = worker_fn(i, item)
+            except Exception as e:
+                print(f"❌ 第 {i+1} 项处理失败: {e}")
+        return results
+
+    # 保证浏览器池至少能同时提供workers个浏览器
+    get_browser_pool().ensure_size(workers)
+    print(f"🚀 使用 {workers} 个worker并发处理 {len(items)} 项")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawler") as executor:
+        futures = {executor.submit(worker_fn, i, item): i for i, item in enumerate(items)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                print(f"❌ 第 {i+1} 项处理失败: {e}")
+    return results
@@ -5,9 +5,18 @@ CreateDay: 20250702
 Author: HongfengAi
 History:
 20250702    HongfengAi  第一版
+20261018    HongfengAi  固定等待改为页面就绪等待
+20261018    HongfengAi  新增多worker并发爬取
+20261018    HongfengAi  图片下载和上传改为后台并发
+20261018    HongfengAi  逐款写入进度日志，中断后重跑从已完成的软件继续
+20261018    HongfengAi  软件详情和图片写入产物库，汇总JSON由产物库导出
+20261018    HongfengAi  返回爬取失败的软件，供pipeline判断阶段是否完成
+20261018    HongfengAi  并发数受Product Hunt访问上限限制时打印实际并发数
 """
+import copy
 import json
 import time
+import uuid
 import os
 import sys
 import requests
@@ -24,9 +33,13 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import USER_AGENT, SOFTWARE_EXPRESS_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from crawler.crawler_utils import open_browser
+from crawler.crawler_utils import get_browser_pool, wait_page_ready, get_host_throttle, run_workers
 from utils import set_proxy, unset_proxy, safe_title_func
+from http_client import get_http_client
 from wechat_utils.upload_material import WeChatPermanentMaterialUploader
+from wechat_utils.media_pipeline import get_media_pipeline, collect_media_results
+from item_journal import ItemJournal
+from artifact_store import get_artifact_store
 
 class SoftwareDetailsCrawler:
     def __init__(self):
@@ -35,14 +48,16 @@ class SoftwareDetailsCrawler:
         self.media_uploader = WeChatPermanentMaterialUploader()
 
     def open_browser(self):
-        """打开浏览器"""
-        self.browser, self.wait = open_browser()
+        """从浏览器池租用浏览器"""
+        self.browser, self.wait = get_browser_pool().acquire()
         
 
-    def close_browser(self):
-        """关闭浏览器"""
+    def close_browser(self, broken=False):
+        """将浏览器归还浏览器池，broken=True表示浏览器出错需重建"""
         if self.browser:
-            self.browser.quit()
+            get_browser_pool().release(self.browser, broken=broken)
+            self.browser = None
+            self.wait = None
     
     def download_image_from_url(self, image_url: str, save_dir: str = None) -> str:
         """
@@ -63,7 +78,8 @@ class SoftwareDetailsCrawler:
             
             # 从URL获取文件名和扩展名
             parsed_url = urllib.parse.urlparse(image_url)
-            filename = f"image_{int(time.time())}.png"
+            # 多个worker并发下载时避免文件名冲突
+            filename = f"image_{int(time.time())}_{uuid.uuid4().hex[:8]}.png"
             
             # 确保文件名有正确的扩展名
             if not any(filename.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp']):
@@ -73,10 +89,7 @@ class SoftwareDetailsCrawler:
             
             # 下载图片
             print(f"正在下载图片: {image_url}")
-            session = requests.Session()
-            session.trust_env = False
-            
-            response = session.get(image_url, timeout=60, stream=True)
+            response = get_http_client().get(image_url, timeout=60, stream=True)
             response.raise_for_status()
             
             # 保存到本地
@@ -92,13 +105,14 @@ class SoftwareDetailsCrawler:
             raise e
         
 
-    def extract_software_details(self, producthunt_url:str, title:str):
+    def extract_software_details(self, producthunt_url:str, title:str, defer_media:bool=False):
         """
         从Product Hunt软件页面提取详细信息
         
         Args:
             producthunt_url: 软件在Product Hunt上的URL
             title: 软件标题
+            defer_media: True时images_upload_url为图片处理的Future列表，由调用方在归还浏览器后用collect_media_results取回
         Returns:
             dict: 软件详细信息
         """
@@ -106,15 +120,16 @@ class SoftwareDetailsCrawler:
         print(f"正在访问软件页面: {producthunt_url}")
         self.browser.get(producthunt_url)
         
-        # 等待页面加载
-        time.sleep(4)
+        # 等待主体内容出现且网络空闲
+        wait_page_ready(self.browser, self.wait, "producthunt",
+                        ready_locator=(By.XPATH, "//*[@id='root-container']/div[3]/div/main"),
+                        label="PH软件详情")
         
         # 处理可能的通知弹窗
         notification_buttons = self.browser.find_elements(By.XPATH, "//button[contains(text(), 'Block') or contains(text(), '阻止') or contains(text(), 'Not now') or contains(text(), '以后再说')]")
         if notification_buttons:
             notification_buttons[0].click()
             print("已关闭通知弹窗")
-            time.sleep(1)
         
         software_details = {}
         
@@ -143,8 +158,9 @@ class SoftwareDetailsCrawler:
         product_website_element = self.browser.find_element(By.XPATH, "//*[@id='root-container']/div[3]/div/main/div[1]/section/div[2]/a")
         software_details['product_website'] = product_website_element.get_attribute('href')
 
-        # 抽取图片
-        software_details['images_upload_url'] = []
+        # 抽取图片：图片URL提交到媒体流水线，下载和上传在后台并发进行
+        image_futures = []
+        upload_fn = lambda local_path: self.media_uploader.upload_specific_file(local_path, title=title)
         image_elements = self.browser.find_elements(By.XPATH, "//*[@id='root-container']/div[3]/div/main/section[1]/div/div[1]/section/*")
         if not image_elements:
             # 如果第一个路径没有找到元素，尝试第二个路径
@@ -201,19 +217,69 @@ class SoftwareDetailsCrawler:
             except NoSuchElementException:
                 continue
                 
-            local_path = self.download_image_from_url(image_url)
-            result = self.media_uploader.upload_specific_file(local_path, title=title)
-            # 删除本地图片
-            os.remove(local_path)
-            try:
-                software_details['images_upload_url'].append(result['url'])
-            except Exception as e:
-                print(f"图片上传失败: {e}")
+            # 上传后删除本地图片
+            local_path = os.path.join(tempfile.gettempdir(), f"image_{int(time.time())}_{uuid.uuid4().hex[:8]}.png")
+            image_futures.append(get_media_pipeline().submit(image_url, local_path, upload_fn, keep_file=False))
 
+        # 按页面中的顺序取回上传结果
+        if defer_media:
+            software_details['images_upload_url'] = image_futures
+        else:
+            software_details['images_upload_url'] = collect_media_results(image_futures)
         return software_details
 
 
-    def crawl_software_details_from_list(self, software_list_file, output_dir, max_software=None):
+    def crawl_software_details(self, i, software, output_dir):
+        """
+        爬取单款软件详情，并立即保存该软件的JSON
+
+        Args:
+            i: 软件在列表中的下标（从0开始）
+            software: 软件列表中的软件信息
+            output_dir: 输出目录
+        Returns:
+            dict: 合并后的软件信息
+        """
+        # 每个worker使用独立的爬虫副本，浏览器互不干扰
+        worker = copy.copy(self)
+        worker.browser = None
+        worker.wait = None
+        print(f"\n正在处理第 {i+1} 款软件: {software.get('title', 'Unknown')}")
+
+        # 从浏览器池租用浏览器（复用已启动的Chrome），并遵守Product Hunt的访问频率限制
+        with get_host_throttle().slot(software['producthunt_url']):
+            worker.open_browser()
+            try:
+                software_details = worker.extract_software_details(software['producthunt_url'], software['title'],
+                                                                   defer_media=True)
+            except Exception:
+                worker.close_browser(broken=True)
+                raise
+            # 归还浏览器
+            worker.close_browser()
+
+        # 浏览器归还后再等待图片下载/上传完成
+        software_details['images_upload_url'] = collect_media_results(software_details['images_upload_url'])
+
+        # 合并基本信息和详细信息
+        combined_software_info = {
+            **software,  # 原有的基本信息
+            **software_details  # 新爬取的详细信息
+        }
+
+        # 为每款软件创建单独的文件
+        safe_title = safe_title_func(software.get('title', f'{i+1}_software'))
+        software_path = os.path.join(output_dir, f"{software['index']}_{safe_title}")
+        software_file = os.path.join(software_path, f"software_details.json")
+
+        with open(software_file, 'w', encoding='utf-8') as f:
+            json.dump(combined_software_info, f, ensure_ascii=False, indent=2)
+
+        print(f"已保存软件详情到: {software_file}")
+        return combined_software_info
+
+
+    def crawl_software_details_from_list(self, software_list_file, output_dir, max_software=None, workers=1, resume=True):
         """
         从论文列表文件中读取论文信息并爬取详情
         
@@ -221,9 +287,11 @@ class SoftwareDetailsCrawler:
             software_list_file: 软件列表JSON文件路径
             output_dir: 输出目录
             max_software: 最大爬取软件数量，None表示爬取所有
+            workers: 并发爬取的worker数（每个worker独立的浏览器），1表示逐款爬取
+            resume: 是否跳过进度日志中已爬取完成的软件，False时全部重新爬取
             
         Returns:
-            None
+            list: 爬取失败、留待下次重试的软件producthunt_url
         """
         # 读取论文列表
         with open(software_list_file, 'r', encoding='utf-8') as f:
@@ -238,50 +306,38 @@ class SoftwareDetailsCrawler:
         
         # 创建输出目录
         os.makedirs(output_dir, exist_ok=True)
-        
-        crawled_software = []
-        
-        for i, software in enumerate(software_list):
-            print(f"\n正在处理第 {i+1}/{len(software_list)} 款软件: {software.get('title', 'Unknown')}")
 
-            # 打开浏览器
-            self.open_browser()
+        # 每款软件爬取完成（含图片上传）后立即记入日志，中途崩溃重跑时只爬取剩余软件
+        journal = ItemJournal(os.path.join(output_dir, "all_software_details.journal.jsonl"), resume=resume)
 
-            # 爬取软件详情
-            software_details = self.extract_software_details(software['producthunt_url'], software['title'])
+        def crawl_one(i, software):
+            if journal.get(software['producthunt_url']) is not None:
+                print(f"\n第 {i+1} 款软件已爬取，跳过: {software.get('title', 'Unknown')}")
+                return
+            journal.append(software['producthunt_url'], self.crawl_software_details(i, software, output_dir))
 
-            # 关闭浏览器
-            self.close_browser()
-            
-            # 合并基本信息和详细信息
-            combined_software_info = {
-                **software,  # 原有的基本信息
-                **software_details  # 新爬取的详细信息
-            }
-            
-            crawled_software.append(combined_software_info)
-            
-            # 为每篇论文创建单独的文件
-            safe_title = safe_title_func(software.get('title', f'{i+1}_software'))
-            software_path = os.path.join(output_dir, f"{software['index']}_{safe_title}")
-            software_file = os.path.join(software_path, f"software_details.json")
-            
-            with open(software_file, 'w', encoding='utf-8') as f:
-                json.dump(combined_software_info, f, ensure_ascii=False, indent=2)
-            
-            print(f"已保存软件详情到: {software_file}")
-            
-            # 避免请求过快
-            time.sleep(2)
-        
-        # 保存所有软件的详细信息汇总
-        summary_file = os.path.join(output_dir, "all_software_details.json")
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            json.dump(crawled_software, f, ensure_ascii=False, indent=2)
+        # 爬取失败的软件不写入日志，下次运行时重试
+        run_workers(software_list, crawl_one, workers=workers, url_of=lambda software: software['producthunt_url'])
+
+        # 汇总结果由日志生成，按软件在列表中的顺序（index）排列，爬取失败的软件被跳过；
+        # 写入产物库（以数据目录名为周标识），并导出旧版汇总JSON供后续阶段和模板使用
+        crawled_software = journal.results([software['producthunt_url'] for software in software_list])
+        scope = os.path.basename(os.path.normpath(output_dir))
+        store = get_artifact_store()
+        store.put_records('products', scope, crawled_software, key_field='producthunt_url')
+        for software in crawled_software:
+            store.put_media('product', software['producthunt_url'],
+                            [{'upload_url': url} for url in software.get('images_upload_url', [])])
+        summary_file = store.export_json(crawled_software, os.path.join(output_dir, "all_software_details.json"), indent=2)
         
         print(f"\n爬取完成！共处理 {len(crawled_software)} 款软件")
         print(f"详细信息已保存到: {summary_file}")
 
+        failed_urls = [software['producthunt_url'] for software in software_list
+                       if journal.get(software['producthunt_url']) is None]
+        if failed_urls:
+            print(f"⚠️ {len(failed_urls)} 款软件爬取失败，下次运行时重试: {failed_urls}")
+        return failed_urls
 
 if __name__ == "__main__":
     # import argparse
@@ -5,6 +5,7 @@ CreateDay: 20250701
 Author: HongfengAi
 History:
 20250701    HongfengAi  第一版
+20261018    HongfengAi  固定等待改为页面就绪等待
 """
 import datetime
 import json
@@ -24,8 +25,9 @@ import urllib.parse
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from configs import USER_AGENT, SOFTWARE_EXPRESS_ROOT_PATH
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from crawler.crawler_utils import open_browser
+from crawler.crawler_utils import get_browser_pool, wait_page_ready
 from utils import set_proxy, unset_proxy, safe_title_func, get_previous_week
+from http_client import get_http_client
 from wechat_utils.upload_material import WeChatPermanentMaterialUploader
 
 
@@ -36,13 +38,15 @@ class ProductHuntWeeklyProductsCrawler:
         self.media_uploader = WeChatPermanentMaterialUploader()
         
     def open_browser(self):
-        """打开浏览器"""
-        self.browser, self.wait = open_browser()
+        """从浏览器池租用浏览器"""
+        self.browser, self.wait = get_browser_pool().acquire()
         
-    def close_browser(self):
-        """关闭浏览器"""
+    def close_browser(self, broken=False):
+        """将浏览器归还浏览器池，broken=True表示浏览器出错需重建"""
         if self.browser:
-            self.browser.quit()
+            get_browser_pool().release(self.browser, broken=broken)
+            self.browser = None
+            self.wait = None
 
     def download_image_from_url(self, image_url: str, save_dir: str = None) -> str:
         """
@@ -73,10 +77,7 @@ class ProductHuntWeeklyProductsCrawler:
             
             # 下载图片
             print(f"正在下载图片: {image_url}")
-            session = requests.Session()
-            session.trust_env = False
-            
-            response = session.get(image_url, timeout=30, stream=True)
+            response = get_http_client().get(image_url, timeout=30, stream=True)
             response.raise_for_status()
             
             # 保存到本地
@@ -110,12 +111,10 @@ class ProductHuntWeeklyProductsCrawler:
             print(f"正在访问: {week_url}")
             self.browser.get(week_url)
             
-            # 等待页面加载
-            time.sleep(3)
-            
-            # 滚动到页面底部确保所有内容加载
-            self.browser.execute_script("window.scrollTo(0, document.body.scrollHeight)")
-            time.sleep(2)
+            # 等待软件列表出现，并滚动到页面底部直到高度稳定，确保所有内容加载
+            wait_page_ready(self.browser, self.wait, "producthunt",
+                            ready_locator=(By.XPATH, '//*[@id="root-container"]/div[3]/div/main/div/div/div[2]/*'),
+                            scroll=True, label="PH周软件列表")
             
             # 查找所有软件条目
             # 根据页面结构，软件条目通常在特定的容器中
@@ -0,0 +1,112 @@
+"""
+Function: 长阶段的逐条目进度日志
+阶段内每处理完一个条目就向JSONL日志追加一行并落盘，进程中途崩溃后重跑时跳过已完成的条目，
+阶段最终的汇总文件由日志生成（先写临时文件再原子替换）
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+def content_digest(*parts) -> str:
+    """计算条目输入内容的摘要，输入变化后对应的日志记录失效"""
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(json.dumps(part, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+        sha.update(b'\0')
+    return sha.hexdigest()[:16]
+
+
+def write_json_atomic(path: str, data, indent: int = 2):
+    """先写临时文件再替换，避免中途崩溃留下半截JSON"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ItemJournal:
+    """
+    只追加的条目日志，每行一条记录：{"key", "digest", "result", "ts"}
+    同一个key以最后一条记录为准；崩溃时写了一半的末行在读取时忽略
+
+    Example:
+        journal = ItemJournal(f"{output_dir}/all_software_details.journal.jsonl")
+        result = journal.get(software['producthunt_url'])
+        if result is None:
+            result = crawl(software)
+            journal.append(software['producthunt_url'], result)
+    """
+
+    def __init__(self, path: str, resume: bool = True):
+        """
+        Args:
+            path: 日志文件路径
+            resume: False时清空已有日志，所有条目重新处理
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if not resume and os.path.exists(path):
+            os.remove(path)
+        self._records = self._load()
+        if self._records:
+            print(f"📒 从进度日志恢复 {len(self._records)} 条已完成记录: {path}")
+
+    def _load(self) -> dict:
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    records[record['key']] = record
+                except (ValueError, KeyError, TypeError):
+                    # 崩溃时未写完的行
+                    continue
+        return records
+
+    def get(self, key: str, digest: str = None):
+        """
+        获取已完成条目的结果
+
+        Args:
+            key: 条目标识
+            digest: 条目输入摘要，与记录不一致时视为未完成
+        Returns:
+            记录的结果，未完成时返回None
+        """
+        record = self._records.get(key)
+        if record is None or (digest is not None and record.get('digest') != digest):
+            return None
+        return record['result']
+
+    def append(self, key: str, result, digest: str = None):
+        """追加一条完成记录并立即落盘"""
+        record = {'key': key, 'digest': digest, 'result': result, 'ts': time.time()}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, 'a+b') as f:
+                # 上次崩溃留下的末行没有换行符时先补上，避免与本行粘连
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                f.write(line.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            self._records[key] = record
+
+    def results(self, keys: list) -> list:
+        """按keys的顺序汇总已完成条目的结果，未完成的条目跳过"""
+        return [self._records[key]['result'] for key in keys if key in self._records]
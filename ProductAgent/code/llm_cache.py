@@ -0,0 +1,234 @@
+"""
+Function: LLM响应的持久化缓存
+以(模型, 温度, 调用参数+prompt哈希)为key把响应存入SQLite，重复运行同一阶段时相同prompt不再消耗token；
+支持过期时间、按最近访问时间的LRU淘汰、跳过读取缓存（bypass）以及命中/未命中统计
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+20261018    HongfengAi  key加入llm_string（含response_format、max_tokens等调用参数）；支持记录并淘汰调用方判定为无效的响应
+"""
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from configs import LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES
+
+
+class LLMCacheStore:
+    """
+    SQLite缓存存储，进程内共享一个连接
+    - ttl: 缓存有效秒数，None表示永不过期
+    - max_entries: 最多保留的条目数，超出后淘汰最久未访问的条目
+    - bypass: 全局跳过读取缓存（如pipeline的--refresh_llm_cache），对所有LLMCache生效
+    """
+
+    def __init__(self,
+                 db_path: str = LLM_CACHE_PATH,
+                 ttl: int = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.bypass = False
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'bypassed': 0, 'writes': 0, 'evicted': 0}
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        # WAL模式允许多个Agent进程同时读写
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                temperature REAL,
+                value TEXT,
+                created_at REAL,
+                accessed_at REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, prompt: str, llm_string: str = "") -> str:
+        # llm_string包含bind的调用参数，同一prompt以不同response_format/max_tokens调用时互不复用
+        prompt_hash = hashlib.sha256(f"{llm_string}\0{prompt}".encode('utf-8')).hexdigest()
+        return f"{model}|{temperature}|{prompt_hash}"
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+
+            value, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats['hits'] += 1
+            return value
+
+    def put(self, key: str, model: str, temperature: float, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, temperature, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, temperature, value, now, now)
+            )
+            self.stats['writes'] += 1
+            self._evict()
+            self._conn.commit()
+
+    def delete(self, keys: Sequence[str]):
+        """删除指定条目（如未通过调用方校验的响应）"""
+        if not keys:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", [(key,) for key in keys])
+            self._conn.commit()
+
+    def _evict(self):
+        """LRU淘汰：超出max_entries时删除最久未访问的条目（调用方持有锁）"""
+        if not self.max_entries:
+            return
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.stats['evicted'] += overflow
+
+    def clear(self, model: str = None):
+        with self._lock:
+            if model is None:
+                self._conn.execute("DELETE FROM llm_cache")
+            else:
+                self._conn.execute("DELETE FROM llm_cache WHERE model = ?", (model,))
+            self._conn.commit()
+
+
+class LLMCache(BaseCache):
+    """
+    LangChain缓存适配层，通过init_llm的cache参数挂到ChatOpenAI上
+    - bypass: True时不读缓存（强制重新请求），但仍会用新响应刷新缓存
+    """
+
+    def __init__(self, store: LLMCacheStore, model: str, temperature: float, bypass: bool = False):
+        self.store = store
+        self.model = model
+        self.temperature = temperature
+        self.bypass = bypass
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        if self.bypass or self.store.bypass:
+            self.store.stats['bypassed'] += 1
+            return None
+        key = self.store.make_key(self.model, self.temperature, prompt, llm_string)
+        _track_key(key)
+        value = self.store.get(key)
+        if value is None:
+            return None
+        try:
+            return [loads(gen) for gen in json.loads(value)]
+        except Exception as e:
+            print(f"LLM缓存反序列化失败，重新请求: {e}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        value = json.dumps([dumps(gen) for gen in return_val], ensure_ascii=False)
+        key = self.store.make_key(self.model, self.temperature, prompt, llm_string)
+        _track_key(key)
+        self.store.put(key, self.model, self.temperature, value)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear(model=self.model)
+
+
+_LLM_CACHE_STORE = None
+_LLM_CACHE_STORE_LOCK = threading.Lock()
+
+# 当前上下文中LLM调用读写过的缓存key（contextvar，多线程/协程互不干扰）
+_TRACKED_KEYS = contextvars.ContextVar('llm_cache_tracked_keys', default=None)
+
+
+def _track_key(key: str):
+    keys = _TRACKED_KEYS.get()
+    if keys is not None:
+        keys.append(key)
+
+
+@contextmanager
+def track_cache_keys():
+    """
+    记录上下文内LLM调用读写的缓存key，调用方判定响应无效时用evict_cache_keys淘汰，
+    避免下次运行从缓存重放同一个无效响应
+
+    Example:
+        with track_cache_keys() as keys:
+            content = llm.invoke(messages).content
+        if not is_valid(content):
+            evict_cache_keys(keys)
+    """
+    keys = []
+    token = _TRACKED_KEYS.set(keys)
+    try:
+        yield keys
+    finally:
+        _TRACKED_KEYS.reset(token)
+
+
+def evict_cache_keys(keys: Sequence[str]):
+    """淘汰指定的缓存条目，本进程未启用缓存时跳过"""
+    if keys and _LLM_CACHE_STORE is not None:
+        _LLM_CACHE_STORE.delete(keys)
+
+
+def get_llm_cache_store() -> LLMCacheStore:
+    """获取进程内共享的缓存存储"""
+    global _LLM_CACHE_STORE
+    if _LLM_CACHE_STORE is None:
+        with _LLM_CACHE_STORE_LOCK:
+            if _LLM_CACHE_STORE is None:
+                _LLM_CACHE_STORE = LLMCacheStore()
+    return _LLM_CACHE_STORE
+
+
+def report_llm_cache_stats():
+    """打印本进程的缓存命中统计"""
+    if _LLM_CACHE_STORE is None:
+        return
+    stats = _LLM_CACHE_STORE.stats
+    total = stats['hits'] + stats['misses']
+    hit_rate = stats['hits'] / total * 100 if total else 0
+    print(f"📦 LLM缓存: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次 (命中率 {hit_rate:.1f}%)，"
+          f"跳过 {stats['bypassed']} 次，写入 {stats['writes']} 次，淘汰 {stats['evicted']} 条")
@@ -0,0 +1,120 @@
+"""
+Function: pipeline启动耗时基准
+用 python -X importtime 运行 pipeline --help，统计模块导入总耗时和耗时最多的模块；
+超过阈值或启动时加载了重依赖（torch、PyMuPDF、langchain、win32com等）时返回非0，用于发现启动耗时回退
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+
+AGENT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 需要检测的pipeline入口（相对Agent根目录）
+PIPELINES = ['code/app_express/pipeline.py']
+
+# 这些库只应在对应阶段执行时才导入，pipeline启动时出现即视为回退
+FORBIDDEN_MODULES = ('torch', 'transformers', 'fitz', 'PIL', 'pdf2image', 'PyPDF2',
+                     'win32com', 'pythoncom', 'pptx', 'langchain_openai', 'langchain_core',
+                     'openai', 'selenium', 'pydantic')
+
+# 形如 "import time:       532 |       1110 |   lzma"
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+
+def parse_importtime(stderr: str):
+    """
+    解析 -X importtime 的输出
+
+    Returns:
+        tuple: (顶层模块累计耗时总和ms, {模块名: 累计耗时ms})
+    """
+    cumulative = {}
+    total_us = 0
+    for line in stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        cum_us, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        cumulative[name] = cum_us / 1000
+        # 缩进为1个空格的是顶层导入，其累计耗时已包含子模块
+        if len(indent) == 1:
+            total_us += cum_us
+    return total_us / 1000, cumulative
+
+
+def measure(script: str, repeat: int = 5):
+    """
+    多次运行 pipeline --help，取导入耗时中位数
+
+    Returns:
+        dict: {'import_ms', 'wall_ms', 'modules'}，modules为中位数那次运行的各模块耗时
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', script, '--help'],
+                                cwd=AGENT_ROOT, capture_output=True, text=True)
+        wall_ms = (time.perf_counter() - start) * 1000
+        if result.returncode != 0:
+            raise RuntimeError(f"{script} --help 运行失败:\n{result.stderr[-2000:]}")
+        import_ms, modules = parse_importtime(result.stderr)
+        runs.append({'import_ms': import_ms, 'wall_ms': wall_ms, 'modules': modules})
+
+    runs.sort(key=lambda run: run['import_ms'])
+    median_run = runs[len(runs) // 2]
+    return {
+        'import_ms': median_run['import_ms'],
+        'wall_ms': statistics.median(run['wall_ms'] for run in runs),
+        'modules': median_run['modules'],
+    }
+
+
+def find_forbidden(modules: dict) -> list:
+    """返回启动时被加载的重依赖"""
+    return sorted({name.split('.')[0] for name in modules if name.split('.')[0] in FORBIDDEN_MODULES})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='pipeline启动耗时基准')
+    parser.add_argument('--max_ms', type=float, default=500, help='导入耗时上限(ms)，超过则返回非0')
+    parser.add_argument('--repeat', type=int, default=5, help='每个pipeline运行次数，取中位数')
+    parser.add_argument('--top', type=int, default=10, help='打印累计耗时最多的模块数')
+    args = parser.parse_args()
+
+    failed = False
+    for script in PIPELINES:
+        print(f"\n⏱️ {script}")
+        stats = measure(script, repeat=args.repeat)
+        print(f"  导入耗时: {stats['import_ms']:.1f} ms（阈值 {args.max_ms:.0f} ms），进程总耗时: {stats['wall_ms']:.1f} ms")
+
+        top_modules = sorted(stats['modules'].items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for name, cum_ms in top_modules:
+            print(f"    {cum_ms:8.1f} ms  {name}")
+
+        passed = True
+        if stats['import_ms'] > args.max_ms:
+            print(f"  ❌ 导入耗时超过阈值")
+            passed = False
+        forbidden = find_forbidden(stats['modules'])
+        if forbidden:
+            print(f"  ❌ 启动时加载了重依赖: {', '.join(forbidden)}")
+            passed = False
+        if passed:
+            print(f"  ✅ 通过")
+        failed = failed or not passed
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
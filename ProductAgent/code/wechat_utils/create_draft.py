@@ -9,6 +9,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 from configs import SOFTWARE_EXPRESS_ROOT_PATH, WECHAT_APP_ID, WECHAT_APP_SECRET
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import safe_title_func, get_previous_week
+from http_client import get_http_client
+from wechat_utils.access_token import get_access_token_provider, TOKEN_INVALID_ERRCODES
 
 
 class WeChatDraftCreator:
@@ -17,39 +19,32 @@ class WeChatDraftCreator:
     def __init__(self):
         self.appid = WECHAT_APP_ID
         self.secret = WECHAT_APP_SECRET
-        self.access_token = ""
-
-        token_result = self.get_access_token(self.appid, self.secret)
-        if token_result['success']:
-            self.access_token = token_result['access_token']
-
+        # access_token由进程内共享的提供者管理，首次访问时获取，过期前自动刷新
         if not self.access_token:
             print("警告: 未提供access_token，请确保已配置")
-        
-        self.api_url = f"https://api.weixin.qq.com/cgi-bin/draft/add?access_token={self.access_token}"
 
 
+    @property
+    def access_token(self) -> str:
+        """当前有效的access_token（共享缓存，不会每次都向微信申请新token）"""
+        return get_access_token_provider(self.appid, self.secret).get_token()
+
     def get_access_token(self, appid: str, appsecret: str) -> Dict[str, Any]:
         """
         获取微信公众号Access Token
         """
-        url = f"https://api.weixin.qq.com/cgi-bin/token?grant_type=client_credential&appid={appid}&secret={appsecret}"
-        
-        # 创建不使用代理的session
-        session = requests.Session()
-        session.trust_env = False  # 禁用环境变量中的代理设置
-        
-        response = session.get(url)
-        result = response.json()
-
-        print(f"✅ Access Token获取成功")
-        print(f"⏰ 有效期: {result.get('expires_in', 0)}秒 ({result.get('expires_in', 0) // 60}分钟)")
+        provider = get_access_token_provider(appid, appsecret)
+        access_token = provider.get_token()
         return {
-            'success': True,
-            'access_token': result['access_token'],
-            'expires_in': result.get('expires_in', 7200)
+            'success': bool(access_token),
+            'access_token': access_token,
+            'expires_in': provider.expires_in()
         }
 
+    @property
+    def api_url(self) -> str:
+        return f"https://api.weixin.qq.com/cgi-bin/draft/add?access_token={self.access_token}"
+
     
     def create_draft(self, 
                      comp_type: str,
@@ -105,9 +100,8 @@ class WeChatDraftCreator:
         headers = {
             'Content-Type': 'application/json; charset=utf-8'
         }
-        # 创建不使用代理的session
-        session = requests.Session()
-        session.trust_env = False  # 禁用环境变量中的代理设置
+        # 共享HTTP客户端（连接复用，直连不走代理）
+        session = get_http_client()
 
         response = session.post(
             self.api_url,
@@ -123,6 +117,8 @@ class WeChatDraftCreator:
             print(f"媒体ID: {result.get('media_id')}")
             return result
         else:
+            if result.get('errcode') in TOKEN_INVALID_ERRCODES:
+                get_access_token_provider(self.appid, self.secret).invalidate()
             print(f"草稿创建失败: {result.get('errcode')}: {result.get('errmsg')}")
             return result
     
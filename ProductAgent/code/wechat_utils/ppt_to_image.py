@@ -2,14 +2,12 @@
 Function: 替换PPT中的文本素材后，将PPT转换为图片
 History:
 20250616    HongfengAi
+20261018    HongfengAi  pptx/win32com改为使用时才导入，pipeline启动时不再加载
 """
 import sys
 from pathlib import Path
 import argparse
-from pptx import Presentation
 import os
-import win32com.client
-import pythoncom
 
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -75,6 +73,8 @@ class PPTToImage:
                         year: str,
                         week: str):
         """高级替换方法，完美保持格式"""
+        from pptx import Presentation
+
         ppt_path = f"./code/wechat_utils/cover_template/app_express_cover.pptx"
         prs = Presentation(ppt_path)
 
@@ -173,6 +173,10 @@ class PPTToImage:
         # 创建输出目录
         Path(image_path).parent.mkdir(exist_ok=True)
         
+        # win32com仅Windows可用，且加载较慢，转换时才导入
+        import win32com.client
+        import pythoncom
+
         # 初始化COM
         pythoncom.CoInitialize()
 
@@ -0,0 +1,198 @@
+"""
+Function: 微信永久素材上传去重索引
+按文件内容的SHA-256记录已上传素材的media_id和url，同一文件再次上传时直接复用；
+定期用batchget_material核对素材库，已在后台删除的素材会从索引中移除
+
+CreateDay: 20261018
+Author: HongfengAi
+History:
+20261018    HongfengAi  第一版
+20261018    HongfengAi  保存时加文件锁并与磁盘上其他进程写入的条目合并，避免相互覆盖
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from configs import OUTPUT_ROOT_PATH
+
+
+# 索引文件（同一公众号的各个Agent共用）
+UPLOAD_INDEX_PATH = os.path.join(OUTPUT_ROOT_PATH, "wechat_upload_index.json")
+
+
+class _IndexFileLock:
+    """
+    跨进程文件锁：以O_EXCL创建.lock文件，创建成功即持有锁（Windows/Linux通用）
+    持锁进程崩溃留下的锁文件超过stale_seconds后视为失效
+    """
+
+    def __init__(self, path: str, timeout: float = 30, stale_seconds: float = 60):
+        self.lock_path = path + ".lock"
+        self.timeout = timeout
+        self.stale_seconds = stale_seconds
+
+    def __enter__(self):
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.lock_path) > self.stale_seconds:
+                        os.remove(self.lock_path)
+                        continue
+                except OSError:
+                    # 锁文件刚被释放
+                    continue
+                if time.time() > deadline:
+                    raise TimeoutError(f"等待上传索引文件锁超时: {self.lock_path}")
+                time.sleep(0.05)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+
+
+def file_sha256(file_path: str) -> str:
+    """计算文件内容的SHA-256"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class UploadIndex:
+    """
+    上传索引，文件格式：
+    {
+        "entries": {sha256: {"media_type", "media_id", "url", "file_name", "uploaded_at"}},
+        "synced_at": {media_type: 上次与素材库核对的时间}
+    }
+    """
+
+    def __init__(self, index_path: str = UPLOAD_INDEX_PATH):
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        data = self._load()
+        self._entries = data.get("entries", {})
+        self._synced_at = data.get("synced_at", {})
+        # 上次保存后本进程新增/移除的条目，保存时只把这些改动合并到磁盘上的最新索引
+        self._dirty = set()
+        self._removed = set()
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"读取上传索引失败，将重新建立: {e}")
+            return {}
+
+    def _save(self):
+        """
+        持文件锁重新读取磁盘索引（可能已被其他进程/Agent更新），合并本进程的改动后原子替换，
+        合并结果同时作为新的内存索引
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        with _IndexFileLock(self.index_path):
+            data = self._load()
+            entries = data.get("entries", {})
+            synced_at = data.get("synced_at", {})
+            for sha256 in self._removed:
+                entries.pop(sha256, None)
+            for sha256 in self._dirty:
+                if sha256 in self._entries:
+                    entries[sha256] = self._entries[sha256]
+            for media_type, ts in self._synced_at.items():
+                synced_at[media_type] = max(ts, synced_at.get(media_type, 0))
+
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"entries": entries, "synced_at": synced_at}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.index_path)
+
+        self._entries = entries
+        self._synced_at = synced_at
+        self._dirty.clear()
+        self._removed.clear()
+
+    def get(self, sha256: str, media_type: str):
+        """查询已上传的素材，未命中返回None"""
+        entry = self._entries.get(sha256)
+        if entry and entry.get("media_type") == media_type:
+            return entry
+        return None
+
+    def put(self, sha256: str, media_type: str, media_id: str, url: str, file_name: str = ""):
+        """记录一次成功的上传"""
+        with self._lock:
+            self._entries[sha256] = {
+                "media_type": media_type,
+                "media_id": media_id,
+                "url": url,
+                "file_name": file_name,
+                "uploaded_at": time.time(),
+            }
+            self._dirty.add(sha256)
+            self._removed.discard(sha256)
+            self._save()
+
+    def remove(self, sha256: str):
+        with self._lock:
+            if self._entries.pop(sha256, None) is not None:
+                self._removed.add(sha256)
+                self._dirty.discard(sha256)
+                self._save()
+
+    def media_ids(self, media_type: str) -> set:
+        return {entry["media_id"] for entry in self._entries.values() if entry.get("media_type") == media_type}
+
+    def needs_sync(self, media_type: str, interval: float) -> bool:
+        """距离上次核对素材库是否已超过interval秒"""
+        return time.time() - self._synced_at.get(media_type, 0) > interval
+
+    def evict_missing(self, media_type: str, remote_media_ids: set) -> int:
+        """
+        移除素材库中已不存在的条目
+
+        Args:
+            media_type: 素材类型
+            remote_media_ids: 素材库中该类型的全部media_id
+        Returns:
+            int: 移除的条目数
+        """
+        with self._lock:
+            stale = [sha256 for sha256, entry in self._entries.items()
+                     if entry.get("media_type") == media_type and entry["media_id"] not in remote_media_ids]
+            for sha256 in stale:
+                del self._entries[sha256]
+                self._removed.add(sha256)
+                self._dirty.discard(sha256)
+            self._synced_at[media_type] = time.time()
+            self._save()
+        return len(stale)
+
+
+_UPLOAD_INDEX = None
+_UPLOAD_INDEX_LOCK = threading.Lock()
+
+
+def get_upload_index() -> UploadIndex:
+    """获取进程内共享的上传索引"""
+    global _UPLOAD_INDEX
+    if _UPLOAD_INDEX is None:
+        with _UPLOAD_INDEX_LOCK:
+            if _UPLOAD_INDEX is None:
+                _UPLOAD_INDEX = UploadIndex()
+    return _UPLOAD_INDEX
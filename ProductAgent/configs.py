@@ -21,12 +21,36 @@ os.makedirs(OUTPUT_ROOT_PATH, exist_ok=True)
 SOFTWARE_EXPRESS_ROOT_PATH = os.path.join(OUTPUT_ROOT_PATH, "software_express")
 os.makedirs(SOFTWARE_EXPRESS_ROOT_PATH, exist_ok=True)
 
+# 结构化产物库（产品、总结、素材等），各阶段按字段查询，不再遍历目录读取JSON
+ARTIFACT_DB_PATH = os.path.join(SOFTWARE_EXPRESS_ROOT_PATH, "artifacts.sqlite")
+
+
+##################
+# 代理配置
+##################
+# 需要代理访问的请求（OpenAI、HuggingFace、arXiv等）统一走该地址，设为None则全部直连
+PROXY_URL = "http://127.0.0.1:7890"
+
 
 ##################
 # LLM配置
 ##################
 OPENAI_API_KEY = ""
 
+# LLM响应缓存（按模型、温度和prompt哈希索引，重复运行时相同prompt不再消耗token）
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = os.path.join(OUTPUT_ROOT_PATH, "llm_cache.sqlite")
+# 缓存有效期（秒），None表示永不过期
+LLM_CACHE_TTL = 30 * 24 * 3600
+# 最多保留的缓存条目数，超出后淘汰最久未使用的条目
+LLM_CACHE_MAX_ENTRIES = 20000
+
+# 自定义LLM服务地址（OpenAI兼容），如本地回放服务 "http://127.0.0.1:8765/v1"；None表示使用OpenAI官方接口
+LLM_BASE_URL = None
+# 录制真实LLM请求的(prompt, 响应, 耗时)，供code/llm_replay.py离线回放压测
+LLM_REPLAY_RECORD = False
+LLM_REPLAY_PATH = os.path.join(OUTPUT_ROOT_PATH, "llm_replay", "llm_replay.jsonl")
+
 
 ##################
 # Wechat配置